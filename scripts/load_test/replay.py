@@ -0,0 +1,534 @@
+"""In-process load test replaying recorded API traffic
+
+Replays a JSON-lines request log against the users, orders and cart FastAPI
+apps through httpx's ``ASGITransport``, so the full request path (middleware,
+validation, SQLAlchemy, boto3) runs with no server or network in between.
+All three services are the top-level ``app`` package, so each one runs in
+its own worker process with local stand-in backends:
+
+- users and orders: a throwaway SQLite file each, or ``--database-url``
+- the cart DynamoDB table and the orders SNS topic: moto
+
+Requests go out open-loop at ``--rate`` per second across all services, in
+log order, and latency is measured from each request's scheduled send time,
+so a service that falls behind shows up as latency rather than as a lower
+send rate.
+
+    python scripts/load_test/replay.py --rate 100 --duration 30
+    python scripts/load_test/replay.py --save-baseline baseline.json
+    python scripts/load_test/replay.py --baseline baseline.json --tolerance 0.25
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[2]
+SERVICES = {
+    "users": ROOT / "services" / "users_service",
+    "orders": ROOT / "services" / "orders_service",
+    "cart": ROOT / "services" / "cart_service",
+}
+# First path segment -> service
+PATH_PREFIXES = {"users": "users", "orders": "orders", "cart": "cart"}
+DEFAULT_LOG = Path(__file__).resolve().parent / "traffic.jsonl"
+
+SEED_PASSWORD = "load-test-password"
+CART_TABLE = "load-test-carts"
+PERCENTILES = (50, 90, 95, 99)
+
+# {n} is the request's position in the run, {i:A-B} a pseudo-random integer
+# and {c:A-B} one that is the same for every request in a pass over the log
+_PLACEHOLDER = re.compile(r"\{(?:n|([ic]):(\d+)-(\d+))\}")
+
+
+# --- Request log -----------------------------------------------------------
+
+def service_for_path(path: str) -> Optional[str]:
+    return PATH_PREFIXES.get(path.lstrip("/").split("/", 1)[0].split("?", 1)[0])
+
+
+def from_api_gateway_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert an API Gateway REST proxy event into a log entry"""
+    body = event.get("body")
+    if body is not None and event.get("isBase64Encoded"):
+        body = base64.b64decode(body).decode()
+    entry = {
+        "method": event["httpMethod"],
+        "path": event["path"],
+        "params": event.get("queryStringParameters") or {},
+        "headers": event.get("headers") or {},
+    }
+    if body is not None:
+        entry["body"] = body
+    return entry
+
+
+def load_log(path: Path) -> List[Dict[str, Any]]:
+    """Read the request log, one JSON request or API Gateway event per line"""
+    entries = []
+    with open(path) as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if "httpMethod" in entry:
+                entry = from_api_gateway_event(entry)
+            entry["method"] = entry["method"].upper()
+            entry.setdefault("service", service_for_path(entry["path"]))
+            if entry["service"] not in SERVICES:
+                raise ValueError(f"{path}:{line_no}: no service handles {entry['path']}")
+            entries.append(entry)
+    if not entries:
+        raise ValueError(f"{path} has no requests")
+    return entries
+
+
+def build_plan(entries: List[Dict[str, Any]], total: int) -> Iterator[Tuple[int, int, Dict[str, Any]]]:
+    """The run's requests in send order as (n, pass over the log, entry), cycling through the log"""
+    for n in range(total):
+        yield n, n // len(entries), entries[n % len(entries)]
+
+
+def expand(value: Any, n: int, rng: random.Random, pass_seed: str = "") -> Any:
+    """Fill in placeholders; a string that is only one ``{i:A-B}`` or ``{c:A-B}`` becomes an int"""
+    if isinstance(value, str):
+        whole = _PLACEHOLDER.fullmatch(value)
+        if whole:
+            return _placeholder_value(whole, n, rng, pass_seed)
+        return _PLACEHOLDER.sub(lambda match: str(_placeholder_value(match, n, rng, pass_seed)), value)
+    if isinstance(value, dict):
+        return {key: expand(item, n, rng, pass_seed) for key, item in value.items()}
+    if isinstance(value, list):
+        return [expand(item, n, rng, pass_seed) for item in value]
+    return value
+
+
+def _placeholder_value(match: re.Match, n: int, rng: random.Random, pass_seed: str) -> int:
+    if match.group(1) is None:
+        return n
+    low, high = int(match.group(2)), int(match.group(3))
+    if match.group(1) == "c":
+        # Drawn from the pass and the range only, so another line of the same
+        # pass with the same range gets the same value
+        return random.Random(f"{pass_seed}:{low}-{high}").randint(low, high)
+    return rng.randint(low, high)
+
+
+def build_request(entry: Dict[str, Any], n: int, seed: int, log_pass: int = 0) -> Dict[str, Any]:
+    """httpx request arguments for one planned request"""
+    # Seeded per request so the values do not depend on how the log is split
+    rng = random.Random(seed * 1_000_003 + n)
+    pass_seed = f"{seed}:{log_pass}"
+    request = {
+        "method": entry["method"],
+        "url": expand(entry["path"], n, rng, pass_seed),
+        "params": {key: str(value) for key, value in expand(entry.get("params", {}), n, rng, pass_seed).items()},
+        "headers": {key: str(value) for key, value in expand(entry.get("headers", {}), n, rng, pass_seed).items()},
+    }
+    if "json" in entry:
+        request["json"] = expand(entry["json"], n, rng, pass_seed)
+    elif "body" in entry:
+        request["content"] = expand(entry["body"], n, rng, pass_seed)
+    return request
+
+
+# --- Worker (one per service) ----------------------------------------------
+
+def setup_environment(service: str, args):
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("ENVIRONMENT", "dev")
+    # moto accepts any credentials; never let a real profile leak in
+    os.environ.update(
+        AWS_ACCESS_KEY_ID="testing",
+        AWS_SECRET_ACCESS_KEY="testing",
+        AWS_SESSION_TOKEN="testing",
+        AWS_DEFAULT_REGION="us-east-1",
+        AWS_REGION="us-east-1",
+        METRICS_EMF_ENABLED="false",
+    )
+    if service in ("users", "orders"):
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{args.db_dir}/{service}.db"
+    if service == "cart":
+        os.environ["DYNAMODB_TABLE_NAME"] = CART_TABLE
+        os.environ.pop("DYNAMODB_ENDPOINT_URL", None)
+
+
+def create_aws_resources(service: str):
+    import boto3
+
+    if service == "orders":
+        topic = boto3.client("sns").create_topic(Name="load-test-order-events")
+        os.environ["SNS_TOPIC_ARN"] = topic["TopicArn"]
+    if service == "cart":
+        # Same keys as terraform/modules/dynamodb
+        boto3.client("dynamodb").create_table(
+            TableName=CART_TABLE,
+            KeySchema=[
+                {"AttributeName": "user_id", "KeyType": "HASH"},
+                {"AttributeName": "item_id", "KeyType": "RANGE"},
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "user_id", "AttributeType": "S"},
+                {"AttributeName": "item_id", "AttributeType": "S"},
+            ],
+            BillingMode="PAY_PER_REQUEST",
+        )
+
+
+def seed_users(count: int):
+    from sqlalchemy import func, insert, select
+
+    from app.models.base import Base, engine
+    from app.models.user import User
+
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        if conn.execute(select(func.count()).select_from(User)).scalar():
+            return
+        hashed_password = User.hash_password(SEED_PASSWORD)
+        conn.execute(insert(User), [
+            {
+                "user_id": user_id,
+                "name": f"Load Test User {user_id}",
+                "email": f"user{user_id}@example.com",
+                "hashed_password": hashed_password,
+                "phone_number": f"+1-555-{user_id:07d}",
+                "address": f"{user_id} Main Street",
+            }
+            for user_id in range(1, count + 1)
+        ])
+
+
+def seed_orders(users: int, products: int, orders: int):
+    from sqlalchemy import Column, Integer, Table, func, insert, select
+
+    from app.models.base import Base, engine
+    from app.models.order import Order
+    from app.models.order_item import OrderItem
+    from app.models.product import Product
+
+    # users belong to the users service; stub the table so the foreign key resolves
+    if "users" not in Base.metadata.tables:
+        Table("users", Base.metadata, Column("user_id", Integer, primary_key=True))
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        if conn.execute(select(func.count()).select_from(Product)).scalar():
+            return
+        if engine.dialect.name == "sqlite":
+            conn.execute(insert(Base.metadata.tables["users"]), [{"user_id": i} for i in range(1, users + 1)])
+        conn.execute(insert(Product), [
+            {"product_id": i, "sku": f"LOAD-{i}", "name": f"Product {i}", "price": Decimal("19.99")}
+            for i in range(1, products + 1)
+        ])
+        conn.execute(insert(Order), [
+            {"order_id": i, "user_id": i % users + 1, "status": "PENDING", "order_total": Decimal("39.98")}
+            for i in range(1, orders + 1)
+        ])
+        conn.execute(insert(OrderItem), [
+            {"order_id": i, "product_id": (i * 7 + k) % products + 1, "quantity": 1, "price_at_order": Decimal("19.99")}
+            for i in range(1, orders + 1)
+            for k in range(2)
+        ])
+
+
+def route_name(app, method: str, path: str) -> str:
+    """``METHOD /route/{template}`` for a concrete path"""
+    for route in app.routes:
+        regex = getattr(route, "path_regex", None)
+        methods = getattr(route, "methods", None)
+        if regex is not None and regex.match(path) and (not methods or method in methods):
+            return f"{method} {route.path_format}"
+    return f"{method} {path}"
+
+
+async def replay(app, plan: List[Tuple[int, int, Dict[str, Any]]], start_at: float, args) -> Dict[str, Any]:
+    import httpx
+
+    # start_at is wall-clock time shared with the other workers; schedule on
+    # the monotonic clock from here on
+    start = time.perf_counter() + (start_at - time.time())
+    recorded: Dict[str, Dict[str, Any]] = {}
+    in_flight = asyncio.Semaphore(args.max_in_flight)
+    errors_logged = [0]
+    last_done = [start]
+
+    async def send(n: int, log_pass: int, entry: Dict[str, Any], client: httpx.AsyncClient):
+        scheduled = start + n / args.rate
+        request = build_request(entry, n, args.seed, log_pass)
+        async with in_flight:
+            try:
+                response = await client.request(**request)
+                status = str(response.status_code)
+            except Exception as e:
+                status = "exception"
+                if errors_logged[0] < 5:
+                    errors_logged[0] += 1
+                    print(f"{request['method']} {request['url']} raised {e!r}", file=sys.stderr)
+        done = time.perf_counter()
+        last_done[0] = max(last_done[0], done)
+        if n / args.rate < args.warmup:
+            return
+        route = recorded.setdefault(
+            route_name(app, request["method"], request["url"].split("?", 1)[0]),
+            {"latencies_ms": [], "statuses": Counter()},
+        )
+        route["latencies_ms"].append((done - scheduled) * 1000)
+        route["statuses"][status] += 1
+
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load-test") as client:
+            tasks = []
+            for n, log_pass, entry in plan:
+                delay = start + n / args.rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.create_task(send(n, log_pass, entry, client)))
+            await asyncio.gather(*tasks)
+
+    return {
+        "routes": recorded,
+        # Seconds from the end of the warm-up to the last response
+        "elapsed": last_done[0] - start - args.warmup,
+    }
+
+
+def run_worker(args) -> int:
+    from moto import mock_aws
+
+    # The protocol with the parent runs over the original stdout; anything
+    # the app prints goes to stderr
+    channel = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    service = args.worker
+    setup_environment(service, args)
+    with mock_aws():
+        create_aws_resources(service)
+        sys.path.insert(0, str(SERVICES[service]))
+        from app.main import app
+
+        if service == "users":
+            seed_users(args.seed_users)
+        elif service == "orders":
+            seed_orders(args.seed_users, args.seed_products, args.seed_orders)
+
+        entries = load_log(args.log)
+        total = int(args.rate * (args.duration + args.warmup))
+        plan = [planned for planned in build_plan(entries, total) if planned[2]["service"] == service]
+
+        channel.write("ready\n")
+        channel.flush()
+        start_at = float(sys.stdin.readline())
+        result = asyncio.run(replay(app, plan, start_at, args))
+
+    channel.write(json.dumps(result) + "\n")
+    channel.flush()
+    return 0
+
+
+# --- Parent: run workers, report, compare ----------------------------------
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(results: List[Dict[str, Any]], args) -> Dict[str, Any]:
+    elapsed = max(max(result["elapsed"] for result in results), 1e-9)
+    routes = {}
+    all_latencies: List[float] = []
+    all_statuses: Counter = Counter()
+    for result in results:
+        for name, route in result["routes"].items():
+            latencies = route["latencies_ms"]
+            statuses = Counter(route["statuses"])
+            all_latencies.extend(latencies)
+            all_statuses.update(statuses)
+            routes[name] = _stats(latencies, statuses, elapsed)
+    return {
+        "rate": args.rate,
+        "duration": args.duration,
+        "total": _stats(all_latencies, all_statuses, elapsed) if all_latencies else {},
+        "routes": dict(sorted(routes.items())),
+    }
+
+
+def _stats(latencies: List[float], statuses: Counter, elapsed: float) -> Dict[str, Any]:
+    errors = sum(count for status, count in statuses.items() if status == "exception" or status.startswith("5"))
+    stats = {
+        "requests": len(latencies),
+        "throughput_rps": len(latencies) / elapsed,
+        "errors": errors,
+        "statuses": dict(sorted(statuses.items())),
+    }
+    for pct in PERCENTILES:
+        stats[f"p{pct}_ms"] = percentile(latencies, pct)
+    stats["max_ms"] = max(latencies)
+    return stats
+
+
+def print_report(report: Dict[str, Any]):
+    header = f"{'Route':<44}{'reqs':>7}{'req/s':>8}" + "".join(f"{f'p{p}':>9}" for p in PERCENTILES)
+    print(header + f"{'max':>9}{'5xx':>6}  statuses (latency in ms)")
+    rows = list(report["routes"].items()) + [("TOTAL", report["total"])]
+    for name, stats in rows:
+        print(
+            f"{name:<44}{stats['requests']:>7}{stats['throughput_rps']:>8.1f}"
+            + "".join(f"{stats[f'p{p}_ms']:>9.2f}" for p in PERCENTILES)
+            + f"{stats['max_ms']:>9.2f}{stats['errors']:>6}  "
+            + " ".join(f"{status}x{count}" for status, count in stats["statuses"].items())
+        )
+
+
+def compare(
+    report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float, slack_ms: float, min_samples: int
+) -> List[str]:
+    """Regressions against a baseline report, as human-readable lines
+
+    Routes with fewer than ``min_samples`` requests in either run are
+    skipped, their p95 is mostly noise.
+    """
+    problems = []
+    for name, base in baseline["routes"].items():
+        current = report["routes"].get(name)
+        if current is None or min(current["requests"], base["requests"]) < min_samples:
+            continue
+        for key in ("p50_ms", "p95_ms"):
+            limit = base[key] * (1 + tolerance) + slack_ms
+            if current[key] > limit:
+                problems.append(
+                    f"{name}: {key} {current[key]:.2f} > {limit:.2f} (baseline {base[key]:.2f})"
+                )
+    base_rps = baseline["total"]["throughput_rps"]
+    if report["total"]["throughput_rps"] < base_rps * (1 - tolerance):
+        problems.append(
+            f"throughput {report['total']['throughput_rps']:.1f} req/s < "
+            f"{base_rps * (1 - tolerance):.1f} (baseline {base_rps:.1f})"
+        )
+    return problems
+
+
+def worker_command(service: str, args, db_dir: str) -> List[str]:
+    command = [
+        sys.executable, str(Path(__file__).resolve()), "--worker", service,
+        "--log", str(args.log),
+        "--rate", str(args.rate),
+        "--duration", str(args.duration),
+        "--warmup", str(args.warmup),
+        "--seed", str(args.seed),
+        "--max-in-flight", str(args.max_in_flight),
+        "--seed-users", str(args.seed_users),
+        "--seed-products", str(args.seed_products),
+        "--seed-orders", str(args.seed_orders),
+        "--db-dir", db_dir,
+    ]
+    if args.database_url:
+        command += ["--database-url", args.database_url]
+    return command
+
+
+def run(args) -> int:
+    entries = load_log(args.log)
+    # users first: on a shared database it owns the users table orders refers to
+    services = [service for service in SERVICES if any(entry["service"] == service for entry in entries)]
+    db_dir = args.db_dir or tempfile.mkdtemp(prefix="load-test-")
+
+    # Started one at a time so schema creation on a shared database does not race
+    workers = {}
+    for service in services:
+        worker = subprocess.Popen(worker_command(service, args, db_dir), stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        if worker.stdout.readline().strip() != "ready":
+            for started in [*workers.values(), worker]:
+                started.kill()
+            print(f"{service} worker failed to start", file=sys.stderr)
+            return 2
+        workers[service] = worker
+
+    start_at = time.time() + 0.5
+    for worker in workers.values():
+        worker.stdin.write(f"{start_at}\n")
+        worker.stdin.flush()
+    results = []
+    for service, worker in workers.items():
+        line = worker.stdout.readline()
+        if worker.wait() != 0 or not line:
+            print(f"{service} worker failed", file=sys.stderr)
+            return 2
+        results.append(json.loads(line))
+
+    report = summarize(results, args)
+    if not report["total"]:
+        print("No requests recorded; is --duration longer than zero?", file=sys.stderr)
+        return 2
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    failed = False
+    total = report["total"]
+    if total["errors"] > args.max_error_rate * total["requests"]:
+        print(f"\nFAIL: {total['errors']} of {total['requests']} requests failed", file=sys.stderr)
+        failed = True
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline written to {args.save_baseline}", file=sys.stderr)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["rate"] != args.rate:
+            print(f"\nWarning: baseline was recorded at {baseline['rate']} req/s", file=sys.stderr)
+        problems = compare(report, baseline, args.tolerance, args.slack_ms, args.min_samples)
+        for problem in problems:
+            print(f"REGRESSION {problem}", file=sys.stderr)
+        if problems:
+            print(f"\nFAIL: slower than baseline {args.baseline}", file=sys.stderr)
+            failed = True
+        else:
+            print(f"\nWithin {args.tolerance:.0%} of baseline {args.baseline}", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Replay a request log against the services in-process")
+    parser.add_argument("--log", type=Path, default=DEFAULT_LOG, help="JSON-lines request log (default: traffic.jsonl)")
+    parser.add_argument("--rate", type=float, default=50, help="Requests per second across all services (default: 50)")
+    parser.add_argument("--duration", type=float, default=20, help="Measured seconds (default: 20)")
+    parser.add_argument("--warmup", type=float, default=2, help="Seconds sent first and not measured (default: 2)")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for {i:A-B} placeholders")
+    parser.add_argument("--max-in-flight", type=int, default=200, help="Concurrent requests per service")
+    parser.add_argument("--database-url", help="Use this database for users and orders instead of SQLite")
+    parser.add_argument("--db-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--seed-users", type=int, default=1000)
+    parser.add_argument("--seed-products", type=int, default=500)
+    parser.add_argument("--seed-orders", type=int, default=2000)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--save-baseline", help="Write this run's report as a baseline file")
+    parser.add_argument("--baseline", help="Fail if p50/p95 or throughput regress against this baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression (default: 0.2 = 20%%)")
+    parser.add_argument("--slack-ms", type=float, default=1.0, help="Extra latency allowed per route (default: 1ms)")
+    parser.add_argument("--min-samples", type=int, default=50, help="Skip routes with fewer requests when comparing")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="Allowed share of 5xx responses")
+    parser.add_argument("--worker", choices=sorted(SERVICES), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        return run_worker(args)
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
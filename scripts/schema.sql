@@ -5,6 +5,8 @@ CREATE TABLE users (
     email           VARCHAR(255) NOT NULL UNIQUE,
     hashed_password TEXT NOT NULL,
     address         TEXT,
+    version         INT NOT NULL DEFAULT 1,        -- Bumped on every update; ETag "v{version}"
+    role            VARCHAR(20) NOT NULL DEFAULT 'customer',  -- Token role: customer, service, admin
     created_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -37,6 +39,9 @@ CREATE TABLE orders (
     user_id         BIGINT NOT NULL,
     status          VARCHAR(50) NOT NULL DEFAULT 'PENDING',  -- PENDING, PAID, SHIPPED
     order_total     DECIMAL(10,2) NOT NULL,
+    version         INT NOT NULL DEFAULT 1,        -- Bumped on every update; ETag "v{version}"
+    claimed_by      VARCHAR(100),                  -- Worker holding the POST /orders/claim lease
+    claimed_until   TIMESTAMP NULL,                -- Lease expiry; claimable again after it
     created_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
 
     CONSTRAINT fk_order_user
@@ -44,6 +49,9 @@ CREATE TABLE orders (
         ON DELETE CASCADE
 );
 
+-- Status-filtered queues, oldest first (POST /orders/claim)
+CREATE INDEX idx_status_created_at ON orders (status, created_at);
+
 -- OrderItems Table
 CREATE TABLE order_items (
     order_item_id   BIGSERIAL PRIMARY KEY,
@@ -59,6 +67,22 @@ CREATE TABLE order_items (
         FOREIGN KEY (product_id) REFERENCES products(product_id)
 );
 
+-- Stored responses for POST /orders requests sent with an Idempotency-Key
+CREATE TABLE idempotency_keys (
+    user_id         BIGINT NOT NULL,
+    idempotency_key VARCHAR(255) NOT NULL,
+    request_hash    CHAR(64) NOT NULL,
+    order_id        BIGINT NOT NULL,
+    status_code     INT NOT NULL,
+    response_body   TEXT NOT NULL,
+    created_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at      TIMESTAMP NOT NULL,
+
+    PRIMARY KEY (user_id, idempotency_key)
+);
+
+CREATE INDEX idx_idempotency_keys_expires_at ON idempotency_keys (expires_at);
+
 -- Shipments Table
 CREATE TABLE shipments (
     shipment_id     BIGSERIAL PRIMARY KEY,
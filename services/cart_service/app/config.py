@@ -18,6 +18,26 @@ class Config:
         self.dynamodb_table_name = os.getenv('DYNAMODB_TABLE_NAME', 'dev-carts')
         self.cart_ttl_days = int(os.getenv('CART_TTL_DAYS', '30'))
         
+        # Per-request Server-Timing header and timing log line
+        self.server_timing_enabled = os.getenv('SERVER_TIMING_ENABLED', 'false').lower() == 'true'
+        
+        # GET /metrics (Prometheus text format); on Lambda, where nothing scrapes
+        # containers, set METRICS_EMF_ENABLED to log metrics in CloudWatch EMF instead
+        self.metrics_enabled = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+        self.metrics_emf_enabled = os.getenv('METRICS_EMF_ENABLED', 'false').lower() == 'true'
+        self.metrics_namespace = os.getenv('METRICS_NAMESPACE', 'ECommerce/Cart')
+        # Seconds between EMF flushes (0 = after every request)
+        self.metrics_emf_interval = float(os.getenv('METRICS_EMF_INTERVAL', '0'))
+        
+        # Access token verification (tokens issued by POST /users/authenticate)
+        self.auth_enabled = os.getenv('AUTH_ENABLED', 'false').lower() == 'true'
+        self.auth_jwks = os.getenv('AUTH_JWKS', '')
+        self.auth_jwks_file = os.getenv('AUTH_JWKS_FILE', '')
+        self.auth_jwks_url = os.getenv('AUTH_JWKS_URL', '')
+        self.auth_issuer = os.getenv('AUTH_ISSUER', 'users-service')
+        self.auth_audience = os.getenv('AUTH_AUDIENCE', 'ecommerce')
+        self.auth_keys_cache_ttl = int(os.getenv('AUTH_KEYS_CACHE_TTL', '3600'))
+        
         # Set log level
         logging.getLogger().setLevel(getattr(logging, self.log_level))
     
@@ -1,8 +1,20 @@
 from fastapi import FastAPI
 import logging
 
+from app import metrics
 from app.config import config
-from app.routers import cart
+from app.middleware.timing import TimingMiddleware, instrument_botocore, instrument_fastapi_serialization
+
+# The DynamoDB client is created when the router is imported and copies the
+# session's hooks at that point, so instrument first
+if config.metrics_enabled:
+    metrics.instrument_botocore()
+if config.server_timing_enabled:
+    instrument_botocore()
+    instrument_fastapi_serialization()
+
+from app.routers import cart  # noqa: E402
+from app.middleware.auth import AuthMiddleware, TokenVerifier  # noqa: E402
 
 # Configure logging
 logging.basicConfig(
@@ -19,6 +31,32 @@ app = FastAPI(
     version="1.0.0"
 )
 
+if config.auth_enabled:
+    app.add_middleware(
+        AuthMiddleware,
+        verifier=TokenVerifier(
+            jwks=config.auth_jwks,
+            jwks_file=config.auth_jwks_file,
+            jwks_url=config.auth_jwks_url,
+            issuer=config.auth_issuer,
+            audience=config.auth_audience,
+            cache_ttl=config.auth_keys_cache_ttl,
+        ),
+        exempt_paths={"/", "/health", "/docs", "/openapi.json", "/metrics"},
+    )
+
+if config.metrics_enabled:
+    app.add_middleware(
+        metrics.MetricsMiddleware,
+        emf_namespace=config.metrics_namespace if config.metrics_emf_enabled else None,
+        emf_interval=config.metrics_emf_interval,
+    )
+    app.add_api_route("/metrics", metrics.metrics_endpoint, methods=["GET"], include_in_schema=False)
+
+# Added last so it runs outermost and its timing covers authentication too
+if config.server_timing_enabled:
+    app.add_middleware(TimingMiddleware)
+
 # Include routers
 app.include_router(cart.router)
 
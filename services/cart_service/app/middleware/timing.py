@@ -0,0 +1,222 @@
+"""Per-request timing breakdown shared by the orders, users and cart services
+
+When enabled, each request gets a ``RequestTimings`` in a context variable
+and the instrumented layers add to it:
+
+- ``db``: SQLAlchemy cursor executions (``instrument_sqlalchemy``)
+- one phase per AWS service, e.g. ``sns`` or ``dynamodb``: botocore API
+  calls including retries (``instrument_botocore``)
+- ``serialize``: FastAPI response validation and encoding, plus any
+  ``timed("serialize")`` block (``instrument_fastapi_serialization``)
+- ``app``: the whole ASGI application
+- ``adapter``: Mangum's event translation on Lambda (``time_lambda_handler``)
+
+The phases go out in a ``Server-Timing`` header (without ``adapter``, which
+is only known once the response is built) and in one JSON log line per
+request. When disabled none of the hooks are installed, and ``record`` and
+``timed`` cost a context variable lookup.
+"""
+import json
+import logging
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import boto3
+import fastapi.routing
+from starlette.datastructures import MutableHeaders
+
+logger = logging.getLogger(__name__)
+
+_current: ContextVar[Optional["RequestTimings"]] = ContextVar("request_timings", default=None)
+
+
+class RequestTimings:
+    """Accumulated seconds and call counts per phase for one request"""
+
+    __slots__ = ("phases", "fields")
+
+    def __init__(self):
+        self.phases: Dict[str, List[float]] = {}
+        # method, path and status, for the log line
+        self.fields: Dict[str, Any] = {}
+
+    def add(self, phase: str, seconds: float):
+        entry = self.phases.get(phase)
+        if entry is None:
+            self.phases[phase] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+    def seconds(self, phase: str) -> float:
+        entry = self.phases.get(phase)
+        return entry[0] if entry else 0.0
+
+    def server_timing(self) -> str:
+        """Header value, e.g. ``db;dur=4.21;desc="3 calls", sns;dur=38.02``"""
+        parts = []
+        for phase, (seconds, count) in self.phases.items():
+            part = f"{phase};dur={seconds * 1000:.2f}"
+            if count > 1:
+                part += f';desc="{count} calls"'
+            parts.append(part)
+        return ", ".join(parts)
+
+    def log(self):
+        phases = {
+            phase: {"ms": round(seconds * 1000, 3), "count": count}
+            for phase, (seconds, count) in self.phases.items()
+        }
+        logger.info(json.dumps({"event": "request_timing", **self.fields, "phases": phases}))
+
+
+def record(phase: str, seconds: float):
+    """Add time to a phase of the current request, if it is being timed"""
+    timings = _current.get()
+    if timings is not None:
+        timings.add(phase, seconds)
+
+
+class timed:
+    """Context manager adding the time spent in a block to a phase"""
+
+    __slots__ = ("phase", "start")
+
+    def __init__(self, phase: str):
+        self.phase = phase
+        self.start = None
+
+    def __enter__(self):
+        if _current.get() is not None:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.start is not None:
+            record(self.phase, time.perf_counter() - self.start)
+
+
+class TimingMiddleware:
+    """ASGI middleware that times requests and adds a Server-Timing header"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        # On Lambda, time_lambda_handler has already started the timings
+        timings = _current.get()
+        owner = timings is None
+        if owner:
+            timings = RequestTimings()
+            token = _current.set(timings)
+        timings.fields.update(method=scope["method"], path=scope["path"])
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                timings.fields["status"] = message["status"]
+                phases = timings.server_timing()
+                app_so_far = f"app;dur={(time.perf_counter() - start) * 1000:.2f}"
+                MutableHeaders(scope=message).append(
+                    "Server-Timing", f"{phases}, {app_so_far}" if phases else app_so_far
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            timings.add("app", time.perf_counter() - start)
+            if owner:
+                timings.log()
+                _current.reset(token)
+
+
+def time_lambda_handler(handler: Callable) -> Callable:
+    """Wrap a Mangum handler so the adapter's own time is logged too"""
+
+    def timed_handler(event, context):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            return handler(event, context)
+        finally:
+            total = time.perf_counter() - start
+            timings.add("adapter", max(0.0, total - timings.seconds("app")))
+            timings.fields["total_ms"] = round(total * 1000, 3)
+            timings.log()
+            _current.reset(token)
+
+    return timed_handler
+
+
+def instrument_sqlalchemy(engines: Iterable[Any]):
+    """Time every cursor execution on the given engines as ``db``"""
+    # Imported here because the cart service does not use SQLAlchemy
+    from sqlalchemy import event
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if _current.get() is not None:
+            conn.info.setdefault("timing_start", []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("timing_start")
+        if starts:
+            record("db", time.perf_counter() - starts.pop())
+
+    def handle_error(exception_context):
+        starts = exception_context.connection.info.get("timing_start") if exception_context.connection else None
+        if starts:
+            record("db", time.perf_counter() - starts.pop())
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", after_cursor_execute)
+        event.listen(engine, "handle_error", handle_error)
+
+
+def instrument_botocore(session=None):
+    """Time AWS API calls made by clients of a boto3 session, per service
+
+    Clients copy their session's event hooks when they are created, so call
+    this before any client is built. Defaults to boto3's default session.
+    """
+    if session is None:
+        if boto3.DEFAULT_SESSION is None:
+            boto3.setup_default_session()
+        session = boto3.DEFAULT_SESSION
+
+    def before_call(model, context, **kwargs):
+        if _current.get() is not None:
+            context["timing_call"] = (model.service_model.endpoint_prefix, time.perf_counter())
+
+    # after-call-error (connection failures) is emitted without the model,
+    # so the phase name travels in the request context
+    def after_call(context, **kwargs):
+        call = context.pop("timing_call", None)
+        if call is not None:
+            record(call[0], time.perf_counter() - call[1])
+
+    # First, so the clock starts even if a later handler short-circuits the call
+    session.events.register_first("before-call.*.*", before_call)
+    session.events.register("after-call.*.*", after_call)
+    session.events.register("after-call-error.*.*", after_call)
+
+
+def instrument_fastapi_serialization():
+    """Time FastAPI's response_model validation and encoding as ``serialize``"""
+    serialize_response = fastapi.routing.serialize_response
+    if getattr(serialize_response, "timed", False):
+        return
+
+    async def timed_serialize_response(*args, **kwargs):
+        with timed("serialize"):
+            return await serialize_response(*args, **kwargs)
+
+    timed_serialize_response.timed = True
+    fastapi.routing.serialize_response = timed_serialize_response
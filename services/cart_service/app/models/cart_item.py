@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Set
 
 
 @dataclass
@@ -15,6 +15,21 @@ class CartItem:
     price: float
     added_at: str
     ttl: Optional[int] = None
+    updated_at: Optional[str] = None
+    
+    @property
+    def version(self) -> str:
+        """Timestamp of the last write; items written before updated_at existed use added_at"""
+        return self.updated_at or self.added_at
+    
+    @property
+    def etag(self) -> str:
+        return f'"{self.version}"'
+    
+    @staticmethod
+    def versions_from_etags(etags: Set[str]) -> Set[str]:
+        """Item versions named by a set of If-Match ETags"""
+        return {etag.strip('"') for etag in etags}
     
     @staticmethod
     def create_item_id(product_id: int) -> str:
@@ -42,7 +57,8 @@ class CartItem:
             'quantity': {'N': str(self.quantity)},
             'price': {'N': str(self.price)},
             'added_at': {'S': self.added_at},
-            'ttl': {'N': str(self.ttl)} if self.ttl else {'NULL': True}
+            'ttl': {'N': str(self.ttl)} if self.ttl else {'NULL': True},
+            'updated_at': {'S': self.updated_at} if self.updated_at else {'NULL': True}
         }
     
     @staticmethod
@@ -56,5 +72,6 @@ class CartItem:
             quantity=int(item['quantity']['N']),
             price=float(item['price']['N']),
             added_at=item['added_at']['S'],
-            ttl=int(item['ttl']['N']) if 'ttl' in item and 'N' in item['ttl'] else None
+            ttl=int(item['ttl']['N']) if 'ttl' in item and 'N' in item['ttl'] else None,
+            updated_at=item['updated_at']['S'] if 'updated_at' in item and 'S' in item['updated_at'] else None
         )
@@ -1,14 +1,52 @@
 import boto3
+import hashlib
 import logging
 from datetime import datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
 from botocore.exceptions import ClientError
 
 from app.models.cart_item import CartItem
+from app.conditional import PreconditionFailedError
 from app.config import config
+from app.metrics import record_consumed_capacity
 
 logger = logging.getLogger(__name__)
 
+# Most actions DynamoDB accepts in one TransactWriteItems call
+TRANSACT_MAX_ITEMS = 100
+
+
+def version_condition(expected_versions: Set[str]) -> Tuple[str, Dict[str, Any]]:
+    """ConditionExpression matching items at one of expected_versions
+    
+    An item's version is updated_at, or added_at for items never updated
+    since updated_at was introduced. A missing item never matches.
+    """
+    # An empty set (If-Match named no usable ETag) still needs a value to compare against
+    versions = sorted(expected_versions) or ['']
+    names = [f':v{i}' for i in range(len(versions))]
+    values = {name: {'S': version} for name, version in zip(names, versions)}
+    in_list = ', '.join(names)
+    expression = (
+        f'(updated_at IN ({in_list})) OR '
+        f'(attribute_not_exists(updated_at) AND added_at IN ({in_list}))'
+    )
+    return expression, values
+
+
+def cart_etag(items: List[CartItem]) -> str:
+    """ETag for a whole cart, from each item's id, version and quantity"""
+    digest = hashlib.blake2b(digest_size=8)
+    for item in sorted(items, key=lambda item: item.item_id):
+        digest.update(f"{item.item_id}|{item.version}|{item.quantity}\n".encode())
+    return f'"c{digest.hexdigest()}"'
+
+
+def precondition_failed_from(e: ClientError) -> PreconditionFailedError:
+    """412 error carrying the current item's ETag, from ReturnValuesOnConditionCheckFailure"""
+    item = e.response.get('Item')
+    return PreconditionFailedError(CartItem.from_dynamodb_item(item).etag if item else None)
+
 
 class CartRepository:
     """Repository for cart operations with DynamoDB"""
@@ -30,8 +68,10 @@ class CartRepository:
                 KeyConditionExpression='user_id = :user_id',
                 ExpressionAttributeValues={
                     ':user_id': {'S': user_id}
-                }
+                },
+                ReturnConsumedCapacity='TOTAL'
             )
+            record_consumed_capacity(response, 'Query')
             
             items = []
             for item in response.get('Items', []):
@@ -54,8 +94,9 @@ class CartRepository:
             # Set added_at if not set
             if not cart_item.added_at:
                 cart_item.added_at = datetime.utcnow().isoformat()
+            cart_item.updated_at = datetime.utcnow().isoformat()
             
-            self.dynamodb.put_item(
+            response = self.dynamodb.put_item(
                 TableName=self.table_name,
                 Item={
                     'user_id': {'S': cart_item.user_id},
@@ -65,9 +106,12 @@ class CartRepository:
                     'quantity': {'N': str(cart_item.quantity)},
                     'price': {'N': str(cart_item.price)},
                     'added_at': {'S': cart_item.added_at},
+                    'updated_at': {'S': cart_item.updated_at},
                     'ttl': {'N': str(cart_item.ttl)}
-                }
+                },
+                ReturnConsumedCapacity='TOTAL'
             )
+            record_consumed_capacity(response, 'PutItem')
             
             logger.info(f"Added item {cart_item.item_id} to cart for user {cart_item.user_id}")
             return cart_item
@@ -76,23 +120,45 @@ class CartRepository:
             logger.error(f"Error adding item to cart: {e}")
             raise
     
-    def update_quantity(self, user_id: str, product_id: int, quantity: int) -> Optional[CartItem]:
-        """Update item quantity"""
+    def update_quantity(
+        self,
+        user_id: str,
+        product_id: int,
+        quantity: int,
+        expected_versions: Optional[Set[str]] = None
+    ) -> Optional[CartItem]:
+        """Update item quantity
+        
+        With expected_versions (from If-Match) it raises PreconditionFailedError
+        unless the item exists and is at one of them.
+        """
         try:
             item_id = CartItem.create_item_id(product_id)
             
+            # Without it a missing item is upserted as a row with only a quantity
+            condition = 'attribute_exists(item_id)'
+            values = {
+                ':quantity': {'N': str(quantity)},
+                ':updated_at': {'S': datetime.utcnow().isoformat()}
+            }
+            if expected_versions is not None:
+                condition, version_values = version_condition(expected_versions)
+                values.update(version_values)
+            
             response = self.dynamodb.update_item(
                 TableName=self.table_name,
                 Key={
                     'user_id': {'S': user_id},
                     'item_id': {'S': item_id}
                 },
-                UpdateExpression='SET quantity = :quantity',
-                ExpressionAttributeValues={
-                    ':quantity': {'N': str(quantity)}
-                },
-                ReturnValues='ALL_NEW'
+                UpdateExpression='SET quantity = :quantity, updated_at = :updated_at',
+                ConditionExpression=condition,
+                ExpressionAttributeValues=values,
+                ReturnValues='ALL_NEW',
+                ReturnValuesOnConditionCheckFailure='ALL_OLD',
+                ReturnConsumedCapacity='TOTAL'
             )
+            record_consumed_capacity(response, 'UpdateItem')
             
             if 'Attributes' in response:
                 updated_item = CartItem.from_dynamodb_item(response['Attributes'])
@@ -102,50 +168,120 @@ class CartRepository:
             return None
             
         except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                # With If-Match a missing item is a failed precondition, as in remove_item
+                if expected_versions is not None:
+                    raise precondition_failed_from(e)
+                return None
             logger.error(f"Error updating item quantity: {e}")
             raise
     
-    def remove_item(self, user_id: str, product_id: int) -> None:
-        """Remove item from cart"""
+    def remove_item(self, user_id: str, product_id: int, expected_versions: Optional[Set[str]] = None) -> None:
+        """Remove item from cart
+        
+        With expected_versions (from If-Match) it raises PreconditionFailedError
+        unless the item exists and is at one of them.
+        """
         try:
             item_id = CartItem.create_item_id(product_id)
             
-            self.dynamodb.delete_item(
+            conditional = {}
+            if expected_versions is not None:
+                condition, values = version_condition(expected_versions)
+                conditional = {
+                    'ConditionExpression': condition,
+                    'ExpressionAttributeValues': values,
+                    'ReturnValuesOnConditionCheckFailure': 'ALL_OLD'
+                }
+            
+            response = self.dynamodb.delete_item(
                 TableName=self.table_name,
                 Key={
                     'user_id': {'S': user_id},
                     'item_id': {'S': item_id}
-                }
+                },
+                ReturnConsumedCapacity='TOTAL',
+                **conditional
             )
+            record_consumed_capacity(response, 'DeleteItem')
             
             logger.info(f"Removed item {item_id} from cart for user {user_id}")
             
         except ClientError as e:
+            if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+                raise precondition_failed_from(e)
             logger.error(f"Error removing item from cart: {e}")
             raise
     
-    def clear_cart(self, user_id: str) -> None:
-        """Remove all items from user's cart"""
+    def clear_cart(self, user_id: str, expected_etags: Optional[Set[str]] = None) -> None:
+        """Remove all items from user's cart
+        
+        With expected_etags (from If-Match) it raises PreconditionFailedError
+        unless the cart's ETag is one of them. The items read to compute it
+        are then deleted in one transaction, each conditioned on its version
+        and quantity, so a change after the read fails the whole clear
+        instead of being deleted. An item added after the read is not part
+        of the transaction and survives; carts over TRANSACT_MAX_ITEMS items
+        are cleared in several transactions.
+        """
         try:
             # First, get all items
             items = self.get_user_cart(user_id)
             
+            if expected_etags is not None:
+                etag = cart_etag(items)
+                if etag not in expected_etags:
+                    raise PreconditionFailedError(etag)
+            
             if not items:
                 logger.info(f"Cart already empty for user {user_id}")
                 return
             
-            # Delete each item
-            for item in items:
-                self.dynamodb.delete_item(
-                    TableName=self.table_name,
-                    Key={
-                        'user_id': {'S': user_id},
-                        'item_id': {'S': item.item_id}
-                    }
-                )
+            if expected_etags is not None:
+                self._delete_unchanged(user_id, items)
+            else:
+                # Delete each item
+                for item in items:
+                    response = self.dynamodb.delete_item(
+                        TableName=self.table_name,
+                        Key={
+                            'user_id': {'S': user_id},
+                            'item_id': {'S': item.item_id}
+                        },
+                        ReturnConsumedCapacity='TOTAL'
+                    )
+                    record_consumed_capacity(response, 'DeleteItem')
             
             logger.info(f"Cleared {len(items)} items from cart for user {user_id}")
             
         except ClientError as e:
             logger.error(f"Error clearing cart: {e}")
             raise
+    
+    def _delete_unchanged(self, user_id: str, items: List[CartItem]) -> None:
+        """Delete items in transactions that fail if any of them changed since read"""
+        for start in range(0, len(items), TRANSACT_MAX_ITEMS):
+            deletes = []
+            for item in items[start:start + TRANSACT_MAX_ITEMS]:
+                condition, values = version_condition({item.version})
+                values[':quantity'] = {'N': str(item.quantity)}
+                deletes.append({'Delete': {
+                    'TableName': self.table_name,
+                    'Key': {
+                        'user_id': {'S': user_id},
+                        'item_id': {'S': item.item_id}
+                    },
+                    'ConditionExpression': f'({condition}) AND quantity = :quantity',
+                    'ExpressionAttributeValues': values
+                }})
+            try:
+                response = self.dynamodb.transact_write_items(
+                    TransactItems=deletes,
+                    ReturnConsumedCapacity='TOTAL'
+                )
+            except ClientError as e:
+                # A failed condition or a concurrent write to one of the items
+                if e.response['Error']['Code'] == 'TransactionCanceledException':
+                    raise PreconditionFailedError(cart_etag(self.get_user_cart(user_id)))
+                raise
+            record_consumed_capacity(response, 'TransactWriteItems')
@@ -1,13 +1,17 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from typing import Optional
 import logging
 
 from app.schemas.cart import CartItemCreate, CartItemUpdate, CartItemResponse, CartResponse
 from app.services.cart_service import CartService
 from app.repositories.cart_repository import CartRepository
+from app.middleware.auth import authorize_path_user
+from app.conditional import PreconditionFailedError, if_match_etags, not_modified, precondition_failed
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/cart", tags=["cart"])
+# Every cart route is keyed by {user_id}; callers may only touch their own cart
+router = APIRouter(prefix="/cart", tags=["cart"], dependencies=[Depends(authorize_path_user)])
 
 # Initialize repository and service
 cart_repository = CartRepository()
@@ -15,24 +19,29 @@ cart_service = CartService(cart_repository)
 
 
 @router.get("/{user_id}", response_model=CartResponse, status_code=status.HTTP_200_OK)
-async def get_cart(user_id: str):
+async def get_cart(user_id: str, response: Response, if_none_match: Optional[str] = Header(None)):
     """
     Get user's shopping cart
     
     - **user_id**: User identifier
+    - **If-None-Match**: Cart ETag from an earlier response; 304 if unchanged
     """
     try:
-        return cart_service.get_cart(user_id)
+        cart, etag = cart_service.get_cart(user_id, if_none_match)
     except Exception as e:
         logger.error(f"Error getting cart for user {user_id}: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to retrieve cart: {str(e)}"
         )
+    if cart is None:
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    return cart
 
 
 @router.post("/{user_id}/items", response_model=CartItemResponse, status_code=status.HTTP_201_CREATED)
-async def add_item_to_cart(user_id: str, item: CartItemCreate):
+async def add_item_to_cart(user_id: str, item: CartItemCreate, response: Response):
     """
     Add item to cart
     
@@ -40,26 +49,37 @@ async def add_item_to_cart(user_id: str, item: CartItemCreate):
     - **item**: Item details (product_id, product_name, quantity, price)
     """
     try:
-        return cart_service.add_item(user_id, item)
+        added_item = cart_service.add_item(user_id, item)
     except Exception as e:
         logger.error(f"Error adding item to cart for user {user_id}: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to add item to cart: {str(e)}"
         )
+    response.headers["ETag"] = added_item.etag
+    return added_item
 
 
 @router.put("/{user_id}/items/{product_id}", response_model=CartItemResponse, status_code=status.HTTP_200_OK)
-async def update_cart_item(user_id: str, product_id: int, item_update: CartItemUpdate):
+async def update_cart_item(
+    user_id: str,
+    product_id: int,
+    item_update: CartItemUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None)
+):
     """
     Update item quantity in cart
     
     - **user_id**: User identifier
     - **product_id**: Product identifier
     - **item_update**: Updated quantity
+    - **If-Match**: Item ETag; 412 if the item has changed since
     """
     try:
-        return cart_service.update_item(user_id, product_id, item_update)
+        updated_item = cart_service.update_item(user_id, product_id, item_update, if_match_etags(if_match))
+    except PreconditionFailedError as e:
+        raise precondition_failed(e)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -71,18 +91,23 @@ async def update_cart_item(user_id: str, product_id: int, item_update: CartItemU
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to update item: {str(e)}"
         )
+    response.headers["ETag"] = updated_item.etag
+    return updated_item
 
 
 @router.delete("/{user_id}/items/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def remove_item_from_cart(user_id: str, product_id: int):
+async def remove_item_from_cart(user_id: str, product_id: int, if_match: Optional[str] = Header(None)):
     """
     Remove item from cart
     
     - **user_id**: User identifier
     - **product_id**: Product identifier
+    - **If-Match**: Item ETag; 412 if the item has changed or is gone
     """
     try:
-        cart_service.remove_item(user_id, product_id)
+        cart_service.remove_item(user_id, product_id, if_match_etags(if_match))
+    except PreconditionFailedError as e:
+        raise precondition_failed(e)
     except Exception as e:
         logger.error(f"Error removing item from cart: {e}")
         raise HTTPException(
@@ -92,14 +117,17 @@ async def remove_item_from_cart(user_id: str, product_id: int):
 
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def clear_cart(user_id: str):
+async def clear_cart(user_id: str, if_match: Optional[str] = Header(None)):
     """
     Clear all items from cart
     
     - **user_id**: User identifier
+    - **If-Match**: Cart ETag; 412 if the cart has changed since
     """
     try:
-        cart_service.clear_cart(user_id)
+        cart_service.clear_cart(user_id, if_match_etags(if_match))
+    except PreconditionFailedError as e:
+        raise precondition_failed(e)
     except Exception as e:
         logger.error(f"Error clearing cart: {e}")
         raise HTTPException(
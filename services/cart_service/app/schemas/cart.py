@@ -23,6 +23,8 @@ class CartItemResponse(BaseModel):
     price: float
     subtotal: float
     added_at: str
+    # Send as If-Match to update or remove the item only if it is unchanged
+    etag: str
     
     class Config:
         from_attributes = True
@@ -1,9 +1,10 @@
 import logging
 from datetime import datetime
-from typing import List
+from typing import List, Optional, Set, Tuple
 
 from app.models.cart_item import CartItem
-from app.repositories.cart_repository import CartRepository
+from app.repositories.cart_repository import CartRepository, cart_etag
+from app.conditional import is_not_modified
 from app.schemas.cart import CartItemCreate, CartItemUpdate, CartItemResponse, CartResponse
 
 logger = logging.getLogger(__name__)
@@ -15,9 +16,16 @@ class CartService:
     def __init__(self, cart_repository: CartRepository):
         self.cart_repo = cart_repository
     
-    def get_cart(self, user_id: str) -> CartResponse:
-        """Get user's cart with calculated totals"""
+    def get_cart(self, user_id: str, if_none_match: Optional[str] = None) -> Tuple[Optional[CartResponse], str]:
+        """Get user's cart with calculated totals, and its ETag
+        
+        The cart is None when if_none_match already names the ETag, so a
+        304 skips building the response.
+        """
         items = self.cart_repo.get_user_cart(user_id)
+        etag = cart_etag(items)
+        if is_not_modified(if_none_match, etag):
+            return None, etag
         
         # Convert to response DTOs
         item_responses = []
@@ -35,7 +43,8 @@ class CartService:
                 quantity=item.quantity,
                 price=item.price,
                 subtotal=subtotal,
-                added_at=item.added_at
+                added_at=item.added_at,
+                etag=item.etag
             ))
         
         return CartResponse(
@@ -43,7 +52,7 @@ class CartService:
             items=item_responses,
             total_items=total_items,
             total_price=round(total_price, 2)
-        )
+        ), etag
     
     def add_item(self, user_id: str, item_create: CartItemCreate) -> CartItemResponse:
         """Add item to cart"""
@@ -69,12 +78,24 @@ class CartService:
             quantity=saved_item.quantity,
             price=saved_item.price,
             subtotal=saved_item.price * saved_item.quantity,
-            added_at=saved_item.added_at
+            added_at=saved_item.added_at,
+            etag=saved_item.etag
         )
     
-    def update_item(self, user_id: str, product_id: int, item_update: CartItemUpdate) -> CartItemResponse:
-        """Update item quantity"""
-        updated_item = self.cart_repo.update_quantity(user_id, product_id, item_update.quantity)
+    def update_item(
+        self,
+        user_id: str,
+        product_id: int,
+        item_update: CartItemUpdate,
+        if_match: Optional[Set[str]] = None
+    ) -> CartItemResponse:
+        """Update item quantity, only if the item has one of the if_match ETags when given"""
+        updated_item = self.cart_repo.update_quantity(
+            user_id,
+            product_id,
+            item_update.quantity,
+            CartItem.versions_from_etags(if_match) if if_match is not None else None
+        )
         
         if not updated_item:
             raise ValueError(f"Item with product_id {product_id} not found in cart")
@@ -85,15 +106,20 @@ class CartService:
             quantity=updated_item.quantity,
             price=updated_item.price,
             subtotal=updated_item.price * updated_item.quantity,
-            added_at=updated_item.added_at
+            added_at=updated_item.added_at,
+            etag=updated_item.etag
         )
     
-    def remove_item(self, user_id: str, product_id: int) -> None:
-        """Remove item from cart"""
-        self.cart_repo.remove_item(user_id, product_id)
+    def remove_item(self, user_id: str, product_id: int, if_match: Optional[Set[str]] = None) -> None:
+        """Remove item from cart, only if it has one of the if_match ETags when given"""
+        self.cart_repo.remove_item(
+            user_id,
+            product_id,
+            CartItem.versions_from_etags(if_match) if if_match is not None else None
+        )
         logger.info(f"Removed product {product_id} from cart for user {user_id}")
     
-    def clear_cart(self, user_id: str) -> None:
-        """Clear all items from cart"""
-        self.cart_repo.clear_cart(user_id)
+    def clear_cart(self, user_id: str, if_match: Optional[Set[str]] = None) -> None:
+        """Clear all items from cart, only if the cart has one of the if_match ETags when given"""
+        self.cart_repo.clear_cart(user_id, if_match)
         logger.info(f"Cleared cart for user {user_id}")
@@ -1,4 +1,8 @@
 from mangum import Mangum
+from app.config import config
 from app.main import app
+from app.middleware.timing import time_lambda_handler
 
 handler = Mangum(app)
+if config.server_timing_enabled:
+    handler = time_lambda_handler(handler)
@@ -0,0 +1,62 @@
+"""Shared fixtures: a moto DynamoDB carts table and a test client
+
+Configuration is read and the DynamoDB client created when ``app`` is first
+imported, so the environment is set (and moto imported, so it can hook the
+client) here before any test module imports it.
+"""
+import os
+
+import boto3
+import pytest
+from moto import mock_aws
+
+for _name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_SESSION_TOKEN"):
+    os.environ[_name] = "testing"
+os.environ["AWS_REGION"] = "us-east-1"
+os.environ["DYNAMODB_TABLE_NAME"] = "test-carts"
+os.environ.pop("DYNAMODB_ENDPOINT_URL", None)
+os.environ["METRICS_ENABLED"] = "false"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+
+USER = "user-1"
+
+
+@pytest.fixture(autouse=True)
+def carts_table():
+    with mock_aws():
+        dynamodb = boto3.client("dynamodb", region_name="us-east-1")
+        dynamodb.create_table(
+            TableName="test-carts",
+            KeySchema=[
+                {"AttributeName": "user_id", "KeyType": "HASH"},
+                {"AttributeName": "item_id", "KeyType": "RANGE"},
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "user_id", "AttributeType": "S"},
+                {"AttributeName": "item_id", "AttributeType": "S"},
+            ],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        yield dynamodb
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def add_item(client):
+    def add(product_id: int = 1, quantity: int = 1, user_id: str = USER) -> dict:
+        response = client.post(
+            f"/cart/{user_id}/items",
+            json={"product_id": product_id, "product_name": f"Product {product_id}", "quantity": quantity, "price": 9.99},
+        )
+        assert response.status_code == 201, response.text
+        assert response.headers["ETag"] == response.json()["etag"]
+        return response.json()
+    return add
@@ -0,0 +1,127 @@
+from app.repositories.cart_repository import cart_etag, version_condition
+from app.routers.cart import cart_service
+from tests.conftest import USER
+
+
+def test_version_condition_matches_updated_at_or_legacy_added_at():
+    expression, values = version_condition({"2026-01-02", "2026-01-01"})
+    assert expression == (
+        "(updated_at IN (:v0, :v1)) OR "
+        "(attribute_not_exists(updated_at) AND added_at IN (:v0, :v1))"
+    )
+    assert values == {":v0": {"S": "2026-01-01"}, ":v1": {"S": "2026-01-02"}}
+
+
+def test_version_condition_without_usable_etags_never_matches_a_real_version():
+    expression, values = version_condition(set())
+    assert expression.count(":v0") == 2
+    assert values == {":v0": {"S": ""}}
+
+
+def test_get_with_current_etag_is_not_modified(client, add_item):
+    add_item()
+    first = client.get(f"/cart/{USER}")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+
+    second = client.get(f"/cart/{USER}", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.headers["ETag"] == etag
+    assert second.content == b""
+
+
+def test_cart_etag_changes_with_the_cart(client, add_item):
+    item = add_item(quantity=1)
+    etag = client.get(f"/cart/{USER}").headers["ETag"]
+
+    client.put(f"/cart/{USER}/items/1", json={"quantity": 3}, headers={"If-Match": item["etag"]})
+
+    response = client.get(f"/cart/{USER}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["total_items"] == 3
+
+
+def test_put_with_current_if_match_updates_the_item(client, add_item):
+    item = add_item(quantity=1)
+    response = client.put(f"/cart/{USER}/items/1", json={"quantity": 2}, headers={"If-Match": item["etag"]})
+    assert response.status_code == 200
+    assert response.json()["quantity"] == 2
+    assert response.headers["ETag"] == response.json()["etag"] != item["etag"]
+
+
+def test_put_with_stale_if_match_is_412_with_current_etag(client, add_item):
+    stale = add_item(quantity=1)
+    current = client.put(f"/cart/{USER}/items/1", json={"quantity": 2}).json()
+
+    response = client.put(f"/cart/{USER}/items/1", json={"quantity": 5}, headers={"If-Match": stale["etag"]})
+    assert response.status_code == 412
+    assert response.headers["ETag"] == current["etag"]
+    assert client.get(f"/cart/{USER}").json()["items"][0]["quantity"] == 2
+
+
+def test_put_on_missing_item_is_404_not_an_upsert(client):
+    response = client.put(f"/cart/{USER}/items/42", json={"quantity": 2})
+    assert response.status_code == 404
+    assert client.get(f"/cart/{USER}").json()["items"] == []
+
+
+def test_put_on_missing_item_with_if_match_is_412_without_etag(client):
+    response = client.put(f"/cart/{USER}/items/42", json={"quantity": 2}, headers={"If-Match": '"2026-01-01"'})
+    assert response.status_code == 412
+    assert "ETag" not in response.headers
+    assert client.get(f"/cart/{USER}").json()["items"] == []
+
+
+def test_delete_item_with_stale_if_match_is_412(client, add_item):
+    stale = add_item()
+    current = client.put(f"/cart/{USER}/items/1", json={"quantity": 2}).json()
+
+    response = client.delete(f"/cart/{USER}/items/1", headers={"If-Match": stale["etag"]})
+    assert response.status_code == 412
+    assert response.headers["ETag"] == current["etag"]
+
+    response = client.delete(f"/cart/{USER}/items/1", headers={"If-Match": current["etag"]})
+    assert response.status_code == 204
+    assert client.get(f"/cart/{USER}").json()["items"] == []
+
+
+def test_delete_missing_item_with_if_match_is_412_without_etag(client):
+    response = client.delete(f"/cart/{USER}/items/42", headers={"If-Match": '"2026-01-01"'})
+    assert response.status_code == 412
+    assert "ETag" not in response.headers
+
+
+def test_clear_cart_with_stale_etag_is_412(client, add_item):
+    add_item(product_id=1)
+    stale = client.get(f"/cart/{USER}").headers["ETag"]
+    add_item(product_id=2)
+    current = client.get(f"/cart/{USER}").headers["ETag"]
+
+    response = client.delete(f"/cart/{USER}", headers={"If-Match": stale})
+    assert response.status_code == 412
+    assert response.headers["ETag"] == current
+    assert len(client.get(f"/cart/{USER}").json()["items"]) == 2
+
+    assert client.delete(f"/cart/{USER}", headers={"If-Match": current}).status_code == 204
+    assert client.get(f"/cart/{USER}").json()["items"] == []
+
+
+def test_clear_cart_deletes_nothing_if_an_item_changes_after_the_etag_check(client, add_item, monkeypatch):
+    add_item(product_id=1)
+    add_item(product_id=2)
+    repository = cart_service.cart_repo
+    read = repository.get_user_cart(USER)
+    etag = cart_etag(read)
+
+    # Another writer changes an item between clear_cart's read and its deletes
+    current = client.put(f"/cart/{USER}/items/2", json={"quantity": 5}).json()
+    reads = iter([read])
+    get_user_cart = repository.get_user_cart
+    monkeypatch.setattr(repository, "get_user_cart", lambda user_id: next(reads, None) or get_user_cart(user_id))
+
+    response = client.delete(f"/cart/{USER}", headers={"If-Match": etag})
+    assert response.status_code == 412
+    items = client.get(f"/cart/{USER}").json()["items"]
+    assert response.headers["ETag"] == client.get(f"/cart/{USER}").headers["ETag"] != etag
+    assert {(item["product_id"], item["quantity"]) for item in items} == {(1, 1), (2, current["quantity"])}
@@ -10,6 +10,19 @@ class Settings:
     LOG_LEVEL: str = os.environ.get("LOG_LEVEL", "INFO")
     SES_SENDER_EMAIL: str = os.environ.get("SES_SENDER_EMAIL", "noreply@example.com")
     SES_REGION: str = os.environ.get("SES_REGION", "us-east-1")
+    METRICS_ENABLED: bool = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_NAMESPACE: str = os.environ.get("METRICS_NAMESPACE", "ECommerce/EmailNotifier")
+
+    # Standalone SQS worker settings (worker.py)
+    SQS_QUEUE_URL: str = os.environ.get("SQS_QUEUE_URL", "")
+    SQS_REGION: str = os.environ.get("SQS_REGION", os.environ.get("AWS_REGION", "us-east-1"))
+    # Point at a local SQS stand-in (ElasticMQ, LocalStack) during development
+    SQS_ENDPOINT_URL: str = os.environ.get("SQS_ENDPOINT_URL", "")
+    WORKER_WAIT_TIME_SECONDS: int = int(os.environ.get("WORKER_WAIT_TIME_SECONDS", "20"))
+    WORKER_MAX_MESSAGES: int = int(os.environ.get("WORKER_MAX_MESSAGES", "10"))
+    WORKER_CONCURRENCY: int = int(os.environ.get("WORKER_CONCURRENCY", "10"))
+    WORKER_VISIBILITY_TIMEOUT: int = int(os.environ.get("WORKER_VISIBILITY_TIMEOUT", "300"))
+    WORKER_HEARTBEAT_SECONDS: int = int(os.environ.get("WORKER_HEARTBEAT_SECONDS", "30"))
 
 
 # Create a global settings object
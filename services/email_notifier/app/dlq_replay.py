@@ -0,0 +1,297 @@
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Set, TextIO
+
+from app.email_service import EmailService
+from app.sqs_worker import SQS_BATCH_LIMIT, delete_messages, to_lambda_record
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    """Thread-safe limiter that spaces calls evenly at a fixed rate"""
+
+    def __init__(self, rate_per_second: float):
+        if rate_per_second <= 0:
+            raise ValueError("Rate must be greater than 0")
+        self.interval = 1.0 / rate_per_second
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until the caller's slot comes up"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_slot, now)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+class ReplayStats:
+    """Counters shared by the replay threads"""
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.processed = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.skipped = 0
+        self.deleted = 0
+        self.redelivered = 0
+        self._lock = threading.Lock()
+
+    def record(self, outcome: str):
+        with self._lock:
+            self.processed += 1
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def add_deleted(self, count: int):
+        with self._lock:
+            self.deleted += count
+
+    def add_redelivered(self, count: int):
+        with self._lock:
+            self.redelivered += count
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        return self.processed / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"processed={self.processed} succeeded={self.succeeded} "
+            f"failed={self.failed} skipped={self.skipped} deleted={self.deleted} "
+            f"redelivered={self.redelivered} "
+            f"elapsed={self.elapsed:.1f}s throughput={self.throughput:.1f} msg/s"
+        )
+
+
+def iter_ndjson_records(stream: TextIO) -> Iterator[Dict[str, Any]]:
+    """Yield Lambda-shaped SQS records from an NDJSON dump
+
+    Each line may be a Lambda record (``body``), a ReceiveMessage entry
+    (``Body``) or a whole Lambda event with a ``Records`` list.
+    """
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError as e:
+            logger.error(f"Skipping invalid JSON on line {line_number}: {e}")
+            continue
+        if not isinstance(data, dict):
+            logger.error(f"Skipping line {line_number}: expected a JSON object, got {type(data).__name__}")
+            continue
+
+        records = data.get('Records', [data])
+        if not isinstance(records, list):
+            logger.error(f"Skipping line {line_number}: Records is not a list")
+            continue
+
+        for record in records:
+            if not isinstance(record, dict):
+                logger.error(f"Skipping record on line {line_number}: expected a JSON object, got {type(record).__name__}")
+            elif 'body' in record:
+                yield record
+            elif 'Body' in record:
+                yield {
+                    'messageId': record.get('MessageId', f"line-{line_number}"),
+                    'body': record['Body'],
+                }
+            else:
+                logger.error(f"Skipping record without a body on line {line_number}")
+
+
+def approximate_queue_size(sqs_client, queue_url: str) -> int:
+    """ApproximateNumberOfMessages, or 0 if it cannot be read"""
+    try:
+        attributes = sqs_client.get_queue_attributes(
+            QueueUrl=queue_url,
+            AttributeNames=['ApproximateNumberOfMessages'],
+        )['Attributes']
+        return int(attributes.get('ApproximateNumberOfMessages', 0))
+    except Exception as e:
+        logger.warning(f"Could not read the queue size: {e}")
+        return 0
+
+
+class DLQReplayer:
+    """Replays failed order notifications through EmailService"""
+
+    def __init__(
+        self,
+        email_service: EmailService,
+        concurrency: int = 8,
+        rate_per_second: Optional[float] = None,
+        dry_run: bool = False,
+        report_interval: float = 5.0,
+        failed_output: Optional[TextIO] = None,
+    ):
+        self.email_service = email_service
+        self.concurrency = concurrency
+        self.rate_limiter = RateLimiter(rate_per_second) if rate_per_second else None
+        self.dry_run = dry_run
+        self.report_interval = report_interval
+        self.failed_output = failed_output
+        self.stats = ReplayStats()
+        self._failed_lock = threading.Lock()
+
+    def replay_records(self, records: Iterable[Dict[str, Any]]) -> ReplayStats:
+        """Replay records from an iterable, e.g. an NDJSON dump"""
+        # Bound the number of queued records so large dumps are streamed
+        in_flight = threading.BoundedSemaphore(self.concurrency * 2)
+
+        def _run(record):
+            try:
+                self._handle(record)
+            finally:
+                in_flight.release()
+
+        with self._reporter(), ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for record in records:
+                in_flight.acquire()
+                executor.submit(_run, record)
+        return self.stats
+
+    def drain_queue(
+        self,
+        sqs_client,
+        queue_url: str,
+        max_messages: Optional[int] = None,
+        wait_time_seconds: int = 2,
+        visibility_timeout: int = 300,
+    ) -> ReplayStats:
+        """Receive messages from a DLQ until it is empty, deleting successes
+
+        A receive returns at most 10 messages, so enough receive loops run
+        side by side to keep all ``concurrency`` senders busy.
+
+        Messages that are not deleted (every message in dry-run mode, and
+        those that still fail) become visible again once the visibility
+        timeout expires. Each message is handled at most once per run: a
+        redelivered message is skipped, and once the run has seen as many
+        messages as the queue held when it started, a receive loop stops as
+        soon as a receive brings back nothing new.
+        """
+        initial_size = approximate_queue_size(sqs_client, queue_url)
+        receivers = max(1, -(-self.concurrency // SQS_BATCH_LIMIT))
+        budget = [max_messages]
+        budget_lock = threading.Lock()
+        seen: Set[str] = set()
+        seen_lock = threading.Lock()
+
+        def _first_deliveries(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            """Messages this run has not handled yet, remembering them as handled"""
+            with seen_lock:
+                fresh = [message for message in messages if message['MessageId'] not in seen]
+                seen.update(message['MessageId'] for message in fresh)
+            return fresh
+
+        def _reserve() -> int:
+            """Take up to one batch from the max_messages budget"""
+            with budget_lock:
+                if budget[0] is None:
+                    return SQS_BATCH_LIMIT
+                batch_size = min(SQS_BATCH_LIMIT, budget[0])
+                budget[0] -= batch_size
+                return batch_size
+
+        def _release(count: int):
+            with budget_lock:
+                if budget[0] is not None:
+                    budget[0] += count
+
+        def _receive_loop(executor: ThreadPoolExecutor):
+            while True:
+                batch_size = _reserve()
+                if batch_size == 0:
+                    break
+                response = sqs_client.receive_message(
+                    QueueUrl=queue_url,
+                    MaxNumberOfMessages=batch_size,
+                    WaitTimeSeconds=wait_time_seconds,
+                    VisibilityTimeout=visibility_timeout,
+                )
+                received = response.get('Messages', [])
+                messages = _first_deliveries(received)
+                _release(batch_size - len(messages))
+                if len(messages) < len(received):
+                    self.stats.add_redelivered(len(received) - len(messages))
+                if not received:
+                    logger.info("Queue drained")
+                    break
+                if not messages:
+                    with seen_lock:
+                        handled = len(seen)
+                    if handled >= initial_size:
+                        logger.info("Only messages already handled in this run are left")
+                        break
+                    continue
+
+                records = [to_lambda_record(message) for message in messages]
+                results = list(executor.map(self._handle, records))
+
+                if not self.dry_run:
+                    succeeded = [
+                        message for message, ok in zip(messages, results) if ok
+                    ]
+                    self.stats.add_deleted(delete_messages(sqs_client, queue_url, succeeded))
+
+        with self._reporter(), ThreadPoolExecutor(max_workers=self.concurrency) as executor, \
+                ThreadPoolExecutor(max_workers=receivers) as receiver_pool:
+            loops = [receiver_pool.submit(_receive_loop, executor) for _ in range(receivers)]
+            for loop in loops:
+                loop.result()
+        return self.stats
+
+    def _handle(self, record: Dict[str, Any]) -> bool:
+        """Process one record, returning True when it can be discarded"""
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        try:
+            message_data = self.email_service.parse_sns_message(record)
+            email = self.email_service.prepare_email(message_data)
+            if email is not None and not self.dry_run:
+                self.email_service.send_email(*email)
+            self.stats.record('succeeded' if email is not None else 'skipped')
+            return True
+        except Exception as e:
+            logger.error(f"Failed to replay message {record.get('messageId')}: {e}")
+            self.stats.record('failed')
+            self._write_failed(record)
+            return False
+
+    def _write_failed(self, record: Dict[str, Any]):
+        if not self.failed_output:
+            return
+        with self._failed_lock:
+            self.failed_output.write(json.dumps(record) + "\n")
+
+    @contextmanager
+    def _reporter(self):
+        """Log progress on an interval while the replay runs"""
+        stop = threading.Event()
+
+        def _loop():
+            while not stop.wait(self.report_interval):
+                logger.info(f"Progress: {self.stats.summary()}")
+
+        thread = threading.Thread(target=_loop, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
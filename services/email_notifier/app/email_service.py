@@ -1,11 +1,12 @@
 import json
 import logging
 import boto3
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
 from jinja2 import Environment, FileSystemLoader, select_autoescape
 import os
 
 from app.config import settings
+from app.metrics import MetricsLogger
 
 logger = logging.getLogger(__name__)
 
@@ -13,8 +14,8 @@ logger = logging.getLogger(__name__)
 class EmailService:
     """Service for sending order notification emails"""
     
-    def __init__(self):
-        self.ses_client = boto3.client('ses', region_name=settings.SES_REGION)
+    def __init__(self, ses_client=None):
+        self.ses_client = ses_client or boto3.client('ses', region_name=settings.SES_REGION)
         self.sender_email = settings.SES_SENDER_EMAIL
         
         # Setup Jinja2 template environment
@@ -88,44 +89,61 @@ class EmailService:
             logger.error(f"Error sending email to {recipient_email}: {e}")
             raise
     
-    def process_order_event(self, event_data: Dict[str, Any]):
+    def prepare_email(self, event_data: Dict[str, Any]) -> Optional[Tuple[str, str, str]]:
+        """Render the notification email for an order event without sending it
+
+        Returns (recipient, subject, html_body), or None when the event has
+        no recipient.
+        """
+        # Extract order details
+        order_id = event_data.get('order_id')
+        user_email = event_data.get('user_email')
+        status = event_data.get('status', 'CREATED')
+        order_total = event_data.get('order_total')
+        items = event_data.get('items', [])
+        created_at = event_data.get('created_at')
+        
+        if not user_email:
+            logger.warning(f"No user email found for order {order_id}")
+            return None
+        
+        # Get appropriate template
+        template_name = self.get_template_name(status)
+        
+        # Prepare template context
+        context = {
+            'order_id': order_id,
+            'status': status,
+            'order_total': order_total,
+            'items': items,
+            'created_at': created_at,
+            'user_email': user_email
+        }
+        
+        # Render email
+        html_body = self.render_email_template(template_name, context)
+        
+        # Prepare subject
+        subject = f"Order #{order_id} - {status.title()}"
+        
+        return user_email, subject, html_body
+    
+    def process_order_event(self, event_data: Dict[str, Any], metrics: Optional[MetricsLogger] = None):
         """Process order event and send notification email"""
+        metrics = metrics or MetricsLogger(enabled=False)
         try:
-            # Extract order details
-            order_id = event_data.get('order_id')
-            user_email = event_data.get('user_email')
-            status = event_data.get('status', 'CREATED')
-            order_total = event_data.get('order_total')
-            items = event_data.get('items', [])
-            created_at = event_data.get('created_at')
-            
-            if not user_email:
-                logger.warning(f"No user email found for order {order_id}")
+            with metrics.timer('RenderTime'):
+                email = self.prepare_email(event_data)
+            if email is None:
+                metrics.increment('Skipped')
                 return
             
-            # Get appropriate template
-            template_name = self.get_template_name(status)
-            
-            # Prepare template context
-            context = {
-                'order_id': order_id,
-                'status': status,
-                'order_total': order_total,
-                'items': items,
-                'created_at': created_at,
-                'user_email': user_email
-            }
-            
-            # Render email
-            html_body = self.render_email_template(template_name, context)
-            
-            # Prepare subject
-            subject = f"Order #{order_id} - {status.title()}"
-            
             # Send email
-            self.send_email(user_email, subject, html_body)
+            user_email, subject, html_body = email
+            with metrics.timer('SendTime'):
+                self.send_email(user_email, subject, html_body)
             
-            logger.info(f"Successfully processed order event for order {order_id}")
+            logger.info(f"Successfully processed order event for order {event_data.get('order_id')}")
             
         except Exception as e:
             logger.error(f"Error processing order event: {e}")
@@ -0,0 +1,148 @@
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# CloudWatch EMF accepts at most 100 values per metric in one document
+EMF_MAX_VALUES = 100
+
+
+class StdoutSink:
+    """Writes EMF documents to stdout, which Lambda forwards to CloudWatch Logs"""
+
+    def write(self, line: str):
+        sys.stdout.write(line + "\n")
+        sys.stdout.flush()
+
+
+class MemorySink:
+    """Keeps EMF documents in memory so tests and benchmarks can inspect them"""
+
+    def __init__(self):
+        self.lines: List[str] = []
+
+    def write(self, line: str):
+        self.lines.append(line)
+
+    @property
+    def documents(self) -> List[Dict[str, Any]]:
+        return [json.loads(line) for line in self.lines]
+
+    def clear(self):
+        self.lines.clear()
+
+
+_default_sink = StdoutSink()
+
+
+def set_default_sink(sink):
+    """Replace the sink used by MetricsLogger instances created afterwards"""
+    global _default_sink
+    _default_sink = sink
+
+
+def get_default_sink():
+    return _default_sink
+
+
+class MetricsLogger:
+    """Collects timers and counters for one invocation and emits them as EMF
+
+    Values are buffered in memory and written as a single Embedded Metric
+    Format document by flush(), so per-record instrumentation costs a list
+    append rather than a log write.
+    """
+
+    def __init__(
+        self,
+        namespace: str = settings.METRICS_NAMESPACE,
+        dimensions: Optional[Dict[str, str]] = None,
+        sink=None,
+        enabled: bool = settings.METRICS_ENABLED,
+    ):
+        self.namespace = namespace
+        self.dimensions = dimensions or {"Service": "email-notifier"}
+        self.sink = sink or get_default_sink()
+        self.enabled = enabled
+        self._values: Dict[str, List[float]] = {}
+        self._units: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def put_metric(self, name: str, value: float, unit: str = "Count"):
+        """Record a single value"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._values.setdefault(name, []).append(value)
+            self._units[name] = unit
+
+    def increment(self, name: str, value: int = 1):
+        """Add to a counter, emitted as one summed value"""
+        if not self.enabled:
+            return
+        with self._lock:
+            values = self._values.setdefault(name, [0])
+            values[0] += value
+            self._units[name] = "Count"
+
+    @contextmanager
+    def timer(self, name: str):
+        """Time a block in milliseconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.put_metric(name, round((time.perf_counter() - start) * 1000, 3), "Milliseconds")
+
+    def flush(self):
+        """Write buffered metrics as EMF and reset the buffer"""
+        if not self.enabled:
+            return
+        with self._lock:
+            values, units = self._values, self._units
+            self._values, self._units = {}, {}
+        if not values:
+            return
+
+        # Split large buffers across documents to respect the EMF value limit
+        offset = 0
+        while True:
+            chunk = {
+                name: metric_values[offset:offset + EMF_MAX_VALUES]
+                for name, metric_values in values.items()
+                if len(metric_values) > offset
+            }
+            if not chunk:
+                break
+            try:
+                self.sink.write(self._serialize(chunk, units))
+            except Exception as e:
+                logger.error(f"Error writing metrics: {e}")
+            offset += EMF_MAX_VALUES
+
+    def _serialize(self, values: Dict[str, List[float]], units: Dict[str, str]) -> str:
+        document: Dict[str, Any] = {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": self.namespace,
+                        "Dimensions": [list(self.dimensions.keys())],
+                        "Metrics": [
+                            {"Name": name, "Unit": units[name]} for name in values
+                        ],
+                    }
+                ],
+            },
+            **self.dimensions,
+        }
+        for name, metric_values in values.items():
+            document[name] = metric_values[0] if len(metric_values) == 1 else metric_values
+        return json.dumps(document, separators=(",", ":"))
@@ -0,0 +1,316 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+import boto3
+
+from app.config import settings
+from app.email_service import EmailService
+from app.metrics import MetricsLogger
+
+logger = logging.getLogger(__name__)
+
+# SQS batch APIs accept at most 10 entries per call
+SQS_BATCH_LIMIT = 10
+
+# Successful messages are deleted in batches of 10, or after this long
+DELETE_FLUSH_SECONDS = 1.0
+
+
+def to_lambda_record(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a ReceiveMessage entry into the record shape Lambda delivers"""
+    return {
+        'messageId': message['MessageId'],
+        'receiptHandle': message['ReceiptHandle'],
+        'body': message['Body'],
+        'attributes': message.get('Attributes', {}),
+        'messageAttributes': message.get('MessageAttributes', {}),
+    }
+
+
+def delete_messages(sqs_client, queue_url: str, messages: List[Dict[str, Any]]) -> int:
+    """Delete messages in DeleteMessageBatch chunks, returning how many were deleted"""
+    deleted = 0
+    for start in range(0, len(messages), SQS_BATCH_LIMIT):
+        chunk = messages[start:start + SQS_BATCH_LIMIT]
+        entries = [
+            {'Id': str(index), 'ReceiptHandle': message['ReceiptHandle']}
+            for index, message in enumerate(chunk)
+        ]
+        try:
+            response = sqs_client.delete_message_batch(
+                QueueUrl=queue_url,
+                Entries=entries
+            )
+            deleted += len(response.get('Successful', []))
+            for failure in response.get('Failed', []):
+                message_id = chunk[int(failure['Id'])]['MessageId']
+                logger.error(f"Failed to delete message {message_id}: {failure.get('Message')}")
+        except Exception as e:
+            logger.error(f"Error deleting message batch: {e}")
+    return deleted
+
+
+def create_sqs_client():
+    """Create an SQS client, honouring SQS_ENDPOINT_URL for local stand-ins"""
+    return boto3.client(
+        'sqs',
+        region_name=settings.SQS_REGION,
+        endpoint_url=settings.SQS_ENDPOINT_URL or None
+    )
+
+
+class _ReceivedBatch:
+    """Metrics for one receive, flushed when its last message finishes"""
+
+    def __init__(self, size: int):
+        self.metrics = MetricsLogger()
+        self.metrics.put_metric('BatchSize', size)
+        self._remaining = size
+        self._lock = threading.Lock()
+
+    def message_done(self):
+        with self._lock:
+            self._remaining -= 1
+            finished = self._remaining == 0
+        if finished:
+            self.metrics.flush()
+
+
+class SQSWorker:
+    """Long-polling SQS consumer that feeds order events to EmailService
+
+    A receive returns at most 10 messages, so one receive loop runs per 10
+    units of ``concurrency`` and each loop only asks for as many messages as
+    there are free workers. Messages are deleted and their visibility
+    extended individually, so a slow send never holds up the rest of the
+    batch it arrived in.
+    """
+
+    def __init__(
+        self,
+        email_service: EmailService,
+        queue_url: str,
+        sqs_client=None,
+        wait_time_seconds: int = settings.WORKER_WAIT_TIME_SECONDS,
+        max_messages: int = settings.WORKER_MAX_MESSAGES,
+        concurrency: int = settings.WORKER_CONCURRENCY,
+        visibility_timeout: int = settings.WORKER_VISIBILITY_TIMEOUT,
+        heartbeat_seconds: int = settings.WORKER_HEARTBEAT_SECONDS,
+        delete_flush_seconds: float = DELETE_FLUSH_SECONDS,
+    ):
+        if not queue_url:
+            raise ValueError("SQS queue URL is required to run the worker")
+        if concurrency < 1:
+            raise ValueError("Worker concurrency must be at least 1")
+
+        self.email_service = email_service
+        self.queue_url = queue_url
+        self.sqs_client = sqs_client or create_sqs_client()
+        self.wait_time_seconds = wait_time_seconds
+        self.max_messages = min(max_messages, SQS_BATCH_LIMIT)
+        self.concurrency = concurrency
+        self.receivers = -(-concurrency // SQS_BATCH_LIMIT)
+        self.visibility_timeout = visibility_timeout
+        self.heartbeat_seconds = heartbeat_seconds
+        self.delete_flush_seconds = delete_flush_seconds
+        self.executor = ThreadPoolExecutor(
+            max_workers=concurrency,
+            thread_name_prefix="email-worker"
+        )
+        self._stop_event = threading.Event()
+        self._free_slots = concurrency
+        self._slots_changed = threading.Condition()
+        # MessageId -> (message, monotonic time of the last visibility change)
+        self._in_flight: Dict[str, Tuple[Dict[str, Any], float]] = {}
+        self._pending_deletes: List[Dict[str, Any]] = []
+        self._state_lock = threading.Lock()
+
+    def stop(self):
+        """Ask the worker to finish in-flight messages and exit"""
+        if not self._stop_event.is_set():
+            logger.info("Shutdown requested, finishing in-flight messages")
+        self._stop_event.set()
+        with self._slots_changed:
+            self._slots_changed.notify_all()
+
+    @property
+    def stopping(self) -> bool:
+        return self._stop_event.is_set()
+
+    def run(self):
+        """Poll the queue until stop() is called"""
+        logger.info(
+            f"SQS worker started for queue {self.queue_url} "
+            f"({self.concurrency} workers, {self.receivers} receive loops)"
+        )
+        maintenance_done = threading.Event()
+        maintenance = threading.Thread(
+            target=self._maintenance_loop,
+            args=(maintenance_done,),
+            name="email-worker-maintenance",
+            daemon=True,
+        )
+        maintenance.start()
+        receivers = [
+            threading.Thread(target=self._receive_loop, name=f"email-worker-receiver-{index}")
+            for index in range(self.receivers)
+        ]
+        try:
+            for receiver in receivers:
+                receiver.start()
+            for receiver in receivers:
+                receiver.join()
+        finally:
+            self.executor.shutdown(wait=True)
+            maintenance_done.set()
+            maintenance.join()
+            self._flush_deletes()
+            logger.info("SQS worker stopped")
+
+    def _receive_loop(self):
+        """Receive as many messages as there are free workers until stopped"""
+        while not self.stopping:
+            batch_size = self._reserve_slots()
+            if not batch_size:
+                break
+            try:
+                messages = self._receive(batch_size)
+            except Exception as e:
+                self._release_slots(batch_size)
+                logger.error(f"Error polling SQS: {e}")
+                # Back off briefly so a persistent error does not spin
+                self._stop_event.wait(1)
+                continue
+
+            self._release_slots(batch_size - len(messages))
+            if not messages:
+                continue
+
+            logger.info(f"Received {len(messages)} messages from SQS")
+            batch = _ReceivedBatch(len(messages))
+            now = time.monotonic()
+            with self._state_lock:
+                for message in messages:
+                    self._in_flight[message['MessageId']] = (message, now)
+            for message in messages:
+                self.executor.submit(self._handle_message, message, batch)
+
+    def _receive(self, batch_size: int) -> List[Dict[str, Any]]:
+        response = self.sqs_client.receive_message(
+            QueueUrl=self.queue_url,
+            MaxNumberOfMessages=batch_size,
+            WaitTimeSeconds=self.wait_time_seconds,
+            VisibilityTimeout=self.visibility_timeout,
+            AttributeNames=['ApproximateReceiveCount'],
+        )
+        return response.get('Messages', [])
+
+    def _reserve_slots(self) -> int:
+        """Wait for free workers and claim up to one receive's worth of them"""
+        with self._slots_changed:
+            while not self._free_slots and not self.stopping:
+                self._slots_changed.wait()
+            if self.stopping:
+                return 0
+            batch_size = min(self.max_messages, self._free_slots)
+            self._free_slots -= batch_size
+            return batch_size
+
+    def _release_slots(self, count: int):
+        if count:
+            with self._slots_changed:
+                self._free_slots += count
+                self._slots_changed.notify_all()
+
+    def _handle_message(self, message: Dict[str, Any], batch: _ReceivedBatch):
+        """Process one message and queue it for deletion if it succeeded"""
+        try:
+            succeeded = self._process_message(message, batch.metrics)
+            with self._state_lock:
+                self._in_flight.pop(message['MessageId'], None)
+                if succeeded:
+                    self._pending_deletes.append(message)
+                    full = len(self._pending_deletes) >= SQS_BATCH_LIMIT
+            if not succeeded:
+                logger.warning(
+                    f"Message {message.get('MessageId')} failed and will be retried "
+                    "after the visibility timeout"
+                )
+            elif full:
+                self._flush_deletes()
+        finally:
+            self._release_slots(1)
+            batch.message_done()
+
+    def _process_message(self, message: Dict[str, Any], metrics: MetricsLogger) -> bool:
+        """Run a single message through the same path as the Lambda handler"""
+        try:
+            record = to_lambda_record(message)
+            with metrics.timer('ParseTime'):
+                message_data = self.email_service.parse_sns_message(record)
+            self.email_service.process_order_event(message_data, metrics)
+            metrics.increment('Processed')
+            return True
+        except Exception as e:
+            logger.error(f"Error processing message {message.get('MessageId')}: {e}")
+            metrics.increment('Failures')
+            return False
+
+    def _maintenance_loop(self, done: threading.Event):
+        """Flush pending deletes and extend visibility of slow messages"""
+        while not done.wait(self.delete_flush_seconds):
+            self._flush_deletes()
+            self._extend_slow_messages()
+
+    def _flush_deletes(self):
+        """Delete processed messages with DeleteMessageBatch"""
+        with self._state_lock:
+            messages, self._pending_deletes = self._pending_deletes, []
+        if messages:
+            delete_messages(self.sqs_client, self.queue_url, messages)
+
+    def _extend_slow_messages(self):
+        """Extend messages that have been running for a heartbeat interval"""
+        now = time.monotonic()
+        with self._state_lock:
+            slow = [
+                message for message, since in self._in_flight.values()
+                if now - since >= self.heartbeat_seconds
+            ]
+            for message in slow:
+                self._in_flight[message['MessageId']] = (message, now)
+        if slow:
+            self._extend_visibility(slow)
+
+    def _extend_visibility(self, messages: List[Dict[str, Any]]):
+        """Push back the visibility timeout of messages still being processed"""
+        for start in range(0, len(messages), SQS_BATCH_LIMIT):
+            chunk = messages[start:start + SQS_BATCH_LIMIT]
+            entries = [
+                {
+                    'Id': str(index),
+                    'ReceiptHandle': message['ReceiptHandle'],
+                    'VisibilityTimeout': self.visibility_timeout,
+                }
+                for index, message in enumerate(chunk)
+            ]
+            try:
+                self.sqs_client.change_message_visibility_batch(
+                    QueueUrl=self.queue_url,
+                    Entries=entries
+                )
+                logger.info(f"Extended visibility for {len(chunk)} slow messages")
+            except Exception as e:
+                logger.error(f"Error extending message visibility: {e}")
+
+
+def build_worker(sqs_client=None, email_service: Optional[EmailService] = None) -> SQSWorker:
+    """Build a worker from settings"""
+    return SQSWorker(
+        email_service=email_service or EmailService(),
+        queue_url=settings.SQS_QUEUE_URL,
+        sqs_client=sqs_client,
+    )
@@ -0,0 +1,307 @@
+"""Synthetic load benchmark for the email notifier Lambda handler
+
+Generates SQS batches wrapping SNS order events, runs them through
+``lambda_handler.handler`` in-process with SES replaced by a fake client (or
+a botocore Stubber) and reports throughput, per-stage timings taken from the
+handler's EMF metrics, and peak memory.
+
+    python benchmarks/bench_handler.py --batch-size 10 --batches 200
+    python benchmarks/bench_handler.py --ses-latency-ms 40 --concurrency 8
+    python benchmarks/bench_handler.py --save-baseline baseline.json
+    python benchmarks/bench_handler.py --baseline baseline.json --max-regression 0.2
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Any, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "benchmark")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from botocore.stub import Stubber  # noqa: E402
+
+import lambda_handler  # noqa: E402
+from app.metrics import MemorySink, set_default_sink  # noqa: E402
+
+STAGES = ["ParseTime", "RenderTime", "SendTime"]
+DEFAULT_STATUS_MIX = "PENDING=4,PAID=3,SHIPPED=2,COMPLETED=1"
+
+
+class FakeSESClient:
+    """Stand-in for the SES client with a configurable per-call latency"""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def send_email(self, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+        return {"MessageId": str(uuid.uuid4())}
+
+
+def parse_status_mix(value: str) -> Dict[str, int]:
+    mix = {}
+    for part in value.split(","):
+        status, _, weight = part.partition("=")
+        mix[status.strip().upper()] = int(weight or 1)
+    return mix
+
+
+def generate_order_event(rng: random.Random, order_id: int, status: str, item_count: int) -> Dict[str, Any]:
+    """Build an order event shaped like NotificationService.publish_order_event"""
+    items = [
+        {
+            "product_id": rng.randint(1, 5000),
+            "quantity": rng.randint(1, 5),
+            "price_at_order": f"{rng.uniform(2, 500):.2f}",
+        }
+        for _ in range(item_count)
+    ]
+    total = sum(float(item["price_at_order"]) * item["quantity"] for item in items)
+    created_at = datetime.utcnow() - timedelta(minutes=rng.randint(0, 10_000))
+    return {
+        "order_id": order_id,
+        "user_id": rng.randint(1, 100_000),
+        "user_email": f"customer{order_id}@example.com",
+        "status": status,
+        "order_total": f"{total:.2f}",
+        "items": items,
+        "created_at": created_at.isoformat(),
+        "event_type": f"order.{status.lower()}",
+    }
+
+
+def build_sqs_event(
+    rng: random.Random,
+    batch_size: int,
+    status_mix: Dict[str, int],
+    item_count: int,
+    first_order_id: int = 1,
+) -> Dict[str, Any]:
+    """Wrap order events in SNS notifications inside an SQS Lambda event"""
+    statuses = list(status_mix)
+    weights = list(status_mix.values())
+    records = []
+    for offset in range(batch_size):
+        order_event = generate_order_event(
+            rng,
+            first_order_id + offset,
+            rng.choices(statuses, weights)[0],
+            item_count,
+        )
+        sns_envelope = {
+            "Type": "Notification",
+            "MessageId": str(uuid.uuid4()),
+            "TopicArn": "arn:aws:sns:us-east-1:000000000000:dev-order-events-topic",
+            "Subject": f"Order {order_event['order_id']} - {order_event['status']}",
+            "Message": json.dumps(order_event),
+            "Timestamp": datetime.utcnow().isoformat() + "Z",
+        }
+        records.append({
+            "messageId": str(uuid.uuid4()),
+            "receiptHandle": uuid.uuid4().hex,
+            "body": json.dumps(sns_envelope),
+            "attributes": {"ApproximateReceiveCount": "1"},
+            "messageAttributes": {},
+            "eventSource": "aws:sqs",
+        })
+    return {"Records": records}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def collect_stage_timings(sink: MemorySink) -> Dict[str, Dict[str, float]]:
+    samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    for document in sink.documents:
+        for stage in STAGES:
+            value = document.get(stage)
+            if value is None:
+                continue
+            samples[stage].extend(value if isinstance(value, list) else [value])
+    return {
+        stage: {
+            "mean_ms": statistics.fmean(values) if values else 0.0,
+            "p50_ms": percentile(values, 50),
+            "p95_ms": percentile(values, 95),
+            "p99_ms": percentile(values, 99),
+        }
+        for stage, values in samples.items()
+    }
+
+
+def install_ses(mode: str, latency_ms: float, expected_calls: int):
+    """Swap the handler's SES client for a fake or a Stubber-backed client"""
+    email_service = lambda_handler.email_service
+    if mode == "stubber":
+        stubber = Stubber(email_service.ses_client)
+        for _ in range(expected_calls):
+            stubber.add_response("send_email", {"MessageId": str(uuid.uuid4())})
+        stubber.activate()
+        return stubber
+    email_service.ses_client = FakeSESClient(latency_ms)
+    return email_service.ses_client
+
+
+def run_benchmark(args) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    status_mix = parse_status_mix(args.status_mix)
+    events = [
+        build_sqs_event(rng, args.batch_size, status_mix, args.items, batch * args.batch_size + 1)
+        for batch in range(args.batches)
+    ]
+    total_records = args.batches * args.batch_size
+    warmup = build_sqs_event(rng, args.batch_size, status_mix, args.items)
+
+    # Warm-up batch, the timed run and the memory pass each send every record
+    install_ses(args.ses, args.ses_latency_ms, total_records * 2 + args.batch_size)
+
+    sink = MemorySink()
+    set_default_sink(sink)
+
+    lambda_handler.handler(warmup, None)
+    sink.clear()
+
+    failures = 0
+
+    def _invoke(event):
+        return len(lambda_handler.handler(event, None)["batchItemFailures"])
+
+    start = time.perf_counter()
+    if args.concurrency > 1:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            failures = sum(executor.map(_invoke, events))
+    else:
+        for event in events:
+            failures += _invoke(event)
+    elapsed = time.perf_counter() - start
+
+    stages = collect_stage_timings(sink)
+
+    # Separate pass for memory so tracemalloc overhead does not skew timings
+    tracemalloc.start()
+    for event in events:
+        lambda_handler.handler(event, None)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "config": {
+            "batch_size": args.batch_size,
+            "batches": args.batches,
+            "items": args.items,
+            "status_mix": args.status_mix,
+            "ses": args.ses,
+            "ses_latency_ms": args.ses_latency_ms,
+            "concurrency": args.concurrency,
+        },
+        "records": total_records,
+        "failures": failures,
+        "elapsed_s": elapsed,
+        "records_per_sec": total_records / elapsed if elapsed else 0.0,
+        "stages": stages,
+        "peak_memory_mb": peak / (1024 * 1024),
+    }
+
+
+def print_report(result: Dict[str, Any]):
+    print(f"Records:        {result['records']} ({result['failures']} failures)")
+    print(f"Elapsed:        {result['elapsed_s']:.3f}s")
+    print(f"Throughput:     {result['records_per_sec']:.1f} records/sec")
+    print(f"Peak memory:    {result['peak_memory_mb']:.2f} MiB")
+    print(f"{'Stage':<12}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}  (ms)")
+    for stage, timing in result["stages"].items():
+        print(
+            f"{stage:<12}{timing['mean_ms']:>10.3f}{timing['p50_ms']:>10.3f}"
+            f"{timing['p95_ms']:>10.3f}{timing['p99_ms']:>10.3f}"
+        )
+
+
+def compare_to_baseline(result: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Return a description of every metric that regressed beyond the threshold"""
+    regressions = []
+    base_rate = baseline["records_per_sec"]
+    if base_rate and result["records_per_sec"] < base_rate * (1 - max_regression):
+        regressions.append(
+            f"throughput {result['records_per_sec']:.1f}/s vs baseline {base_rate:.1f}/s"
+        )
+    for stage in ("ParseTime", "RenderTime"):
+        base_p95 = baseline["stages"].get(stage, {}).get("p95_ms")
+        current_p95 = result["stages"][stage]["p95_ms"]
+        if base_p95 and current_p95 > base_p95 * (1 + max_regression):
+            regressions.append(f"{stage} p95 {current_p95:.3f}ms vs baseline {base_p95:.3f}ms")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the email notifier Lambda handler")
+    parser.add_argument("--batch-size", type=int, default=10, help="Records per SQS event (default: 10)")
+    parser.add_argument("--batches", type=int, default=100, help="Number of events to invoke (default: 100)")
+    parser.add_argument("--items", type=int, default=3, help="Items per order (default: 3)")
+    parser.add_argument("--status-mix", default=DEFAULT_STATUS_MIX,
+                        help=f"Weighted statuses (default: {DEFAULT_STATUS_MIX})")
+    parser.add_argument("--ses", choices=["fake", "stubber"], default="fake",
+                        help="SES replacement: fake client with latency, or botocore Stubber")
+    parser.add_argument("--ses-latency-ms", type=float, default=0.0,
+                        help="Simulated SES latency for the fake client")
+    parser.add_argument("--concurrency", type=int, default=1,
+                        help="Invoke the handler from this many threads at once")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--save-baseline", help="Write results to this file")
+    parser.add_argument("--baseline", help="Compare against a saved baseline")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Allowed slowdown vs the baseline as a fraction (default: 0.2)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    if args.ses == "stubber" and args.ses_latency_ms:
+        print("--ses-latency-ms only applies to the fake SES client", file=sys.stderr)
+
+    result = run_benchmark(args)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(result, baseline, args.max_regression)
+        if regressions:
+            for regression in regressions:
+                print(f"REGRESSION: {regression}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,9 @@
-import json
 import logging
 from typing import Dict, Any
 
 from app.email_service import EmailService
 from app.config import settings
+from app.metrics import MetricsLogger
 
 # Configure logging
 logging.basicConfig(
@@ -20,28 +20,41 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     """
     Lambda handler for processing SQS messages containing order events
     """
-    logger.info(f"Received event with {len(event.get('Records', []))} records")
+    records = event.get('Records', [])
+    logger.info(f"Received event with {len(records)} records")
+    
+    # Metrics are buffered per invocation and written once as EMF
+    metrics = MetricsLogger()
+    metrics.put_metric('BatchSize', len(records))
     
     # Track failed messages for partial batch response
     batch_item_failures = []
     
-    for record in event.get('Records', []):
+    for record in records:
         try:
             # Parse SNS message from SQS
-            message_data = email_service.parse_sns_message(record)
+            with metrics.timer('ParseTime'):
+                message_data = email_service.parse_sns_message(record)
             
-            logger.info(f"Processing order event: {json.dumps(message_data)}")
+            logger.info(
+                f"Processing order event {message_data.get('event_type')} "
+                f"for order {message_data.get('order_id')}"
+            )
             
             # Process the order event and send email
-            email_service.process_order_event(message_data)
+            email_service.process_order_event(message_data, metrics)
+            metrics.increment('Processed')
             
         except Exception as e:
             logger.error(f"Error processing record: {e}")
+            metrics.increment('Failures')
             # Add failed message to batch item failures
             batch_item_failures.append({
                 "itemIdentifier": record['messageId']
             })
     
+    metrics.flush()
+    
     # Return partial batch response
     return {
         "batchItemFailures": batch_item_failures
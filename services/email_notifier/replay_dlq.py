@@ -0,0 +1,78 @@
+import argparse
+import logging
+import sys
+
+from app.config import settings
+from app.dlq_replay import DLQReplayer, iter_ndjson_records
+from app.email_service import EmailService
+from app.sqs_worker import create_sqs_client
+
+# Configure logging
+logging.basicConfig(
+    level=getattr(logging, settings.LOG_LEVEL),
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Replay failed order notifications from a DLQ or an NDJSON dump"
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--queue-url", help="Dead letter queue to drain")
+    source.add_argument("--input", help="NDJSON file of SQS records ('-' for stdin)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Parallel senders; queue drains run one receive loop per 10 (default: 8)")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="Maximum messages per second, e.g. your SES sending rate")
+    parser.add_argument("--max-messages", type=int, default=None,
+                        help="Stop after receiving this many messages from the queue")
+    parser.add_argument("--visibility-timeout", type=int, default=300,
+                        help="Seconds received messages stay hidden; each is handled once per run "
+                             "even if it reappears (default: 300)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Parse and render emails without sending or deleting anything")
+    parser.add_argument("--failed-output", default=None,
+                        help="Write records that still fail to this NDJSON file")
+    parser.add_argument("--report-interval", type=float, default=5.0,
+                        help="Seconds between progress reports (default: 5)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    failed_output = open(args.failed_output, "w") if args.failed_output else None
+    try:
+        replayer = DLQReplayer(
+            email_service=EmailService(),
+            concurrency=args.concurrency,
+            rate_per_second=args.rate,
+            dry_run=args.dry_run,
+            report_interval=args.report_interval,
+            failed_output=failed_output,
+        )
+
+        if args.queue_url:
+            stats = replayer.drain_queue(
+                create_sqs_client(),
+                args.queue_url,
+                max_messages=args.max_messages,
+                visibility_timeout=args.visibility_timeout,
+            )
+        elif args.input == "-":
+            stats = replayer.replay_records(iter_ndjson_records(sys.stdin))
+        else:
+            with open(args.input) as stream:
+                stats = replayer.replay_records(iter_ndjson_records(stream))
+    finally:
+        if failed_output:
+            failed_output.close()
+
+    mode = "Dry run" if args.dry_run else "Replay"
+    logger.info(f"{mode} finished: {stats.summary()}")
+    return 1 if stats.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
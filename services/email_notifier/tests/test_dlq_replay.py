@@ -0,0 +1,153 @@
+import io
+import json
+import logging
+import threading
+import time
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from app.dlq_replay import DLQReplayer, iter_ndjson_records
+
+
+def dump(*lines) -> io.StringIO:
+    return io.StringIO("\n".join(lines) + "\n")
+
+
+def test_reads_each_supported_record_shape():
+    stream = dump(
+        json.dumps({"messageId": "m-1", "body": "one"}),
+        json.dumps({"MessageId": "m-2", "Body": "two"}),
+        json.dumps({"Records": [{"messageId": "m-3", "body": "three"}]}),
+    )
+
+    records = list(iter_ndjson_records(stream))
+
+    assert [r["messageId"] for r in records] == ["m-1", "m-2", "m-3"]
+    assert [r["body"] for r in records] == ["one", "two", "three"]
+
+
+def test_skips_lines_that_are_not_json_objects(caplog):
+    stream = dump(
+        "not json",
+        json.dumps([{"messageId": "in-a-list", "body": "x"}]),
+        json.dumps("a string"),
+        "42",
+        "null",
+        json.dumps({"Records": "not a list"}),
+        json.dumps({"Records": ["a string", {"messageId": "m-1", "body": "kept"}]}),
+    )
+
+    with caplog.at_level(logging.ERROR, logger="app.dlq_replay"):
+        records = list(iter_ndjson_records(stream))
+
+    assert records == [{"messageId": "m-1", "body": "kept"}]
+    skipped = [r.getMessage() for r in caplog.records]
+    assert len(skipped) == 7
+    assert any("line 2" in message and "list" in message for message in skipped)
+
+
+class SlowEmailService:
+    """Stands in for EmailService, recording how many sends overlap"""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.in_flight = self.peak = self.sent = 0
+        self._lock = threading.Lock()
+
+    def parse_sns_message(self, record):
+        return json.loads(record["body"])
+
+    def prepare_email(self, message_data):
+        return (message_data["to"], "subject", "body")
+
+    def send_email(self, *email):
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+            self.sent += 1
+
+
+class SlowRenderEmailService(SlowEmailService):
+    """Spends its delay rendering, which dry runs still do"""
+
+    def prepare_email(self, message_data):
+        time.sleep(self.delay)
+        return super().prepare_email(message_data)
+
+
+@pytest.fixture
+def dlq(monkeypatch):
+    for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_SESSION_TOKEN"):
+        monkeypatch.setenv(name, "testing")
+    with mock_aws():
+        sqs = boto3.client("sqs", region_name="us-east-1")
+        queue_url = sqs.create_queue(QueueName="order-email-dlq")["QueueUrl"]
+        for start in range(0, 60, 10):
+            sqs.send_message_batch(QueueUrl=queue_url, Entries=[
+                {"Id": str(i), "MessageBody": json.dumps({"to": f"user{i}@example.com"})}
+                for i in range(start, start + 10)
+            ])
+        yield sqs, queue_url
+
+
+def queue_size(sqs, queue_url) -> int:
+    attributes = sqs.get_queue_attributes(
+        QueueUrl=queue_url,
+        AttributeNames=["ApproximateNumberOfMessages", "ApproximateNumberOfMessagesNotVisible"],
+    )["Attributes"]
+    return sum(int(value) for value in attributes.values())
+
+
+def test_drain_keeps_more_than_one_batch_of_senders_busy(dlq):
+    sqs, queue_url = dlq
+    email_service = SlowEmailService()
+    replayer = DLQReplayer(email_service, concurrency=30, report_interval=60)
+
+    stats = replayer.drain_queue(sqs, queue_url, wait_time_seconds=0)
+
+    # moto can hand one message to two concurrent receives; SQS is at-least-once too
+    assert stats.succeeded == stats.deleted == email_service.sent >= 60
+    assert email_service.peak > 10
+    assert queue_size(sqs, queue_url) == 0
+
+
+def test_drain_stops_at_max_messages(dlq):
+    sqs, queue_url = dlq
+    replayer = DLQReplayer(SlowEmailService(delay=0), concurrency=30, report_interval=60)
+
+    stats = replayer.drain_queue(sqs, queue_url, max_messages=25, wait_time_seconds=0)
+
+    assert stats.processed == stats.deleted == 25
+    assert queue_size(sqs, queue_url) == 35
+
+
+def test_dry_run_handles_redelivered_messages_once(dlq):
+    sqs, queue_url = dlq
+    email_service = SlowRenderEmailService(delay=0.25)
+    replayer = DLQReplayer(email_service, concurrency=10, dry_run=True, report_interval=60)
+
+    # The drain outlasts the visibility timeout, so the first batches come back
+    stats = replayer.drain_queue(sqs, queue_url, wait_time_seconds=0, visibility_timeout=1)
+
+    assert stats.processed == stats.succeeded == 60
+    assert stats.redelivered > 0
+    assert stats.deleted == 0
+    assert queue_size(sqs, queue_url) == 60
+
+
+def test_failing_message_is_replayed_and_written_out_once(dlq):
+    sqs, queue_url = dlq
+    sqs.send_message(QueueUrl=queue_url, MessageBody="not json")
+    failed_output = io.StringIO()
+    replayer = DLQReplayer(SlowEmailService(delay=0.25), concurrency=10, report_interval=60, failed_output=failed_output)
+
+    stats = replayer.drain_queue(sqs, queue_url, wait_time_seconds=0, visibility_timeout=1)
+
+    assert (stats.succeeded, stats.failed, stats.deleted) == (60, 1, 60)
+    assert len(failed_output.getvalue().splitlines()) == 1
+    assert queue_size(sqs, queue_url) == 1
@@ -0,0 +1,97 @@
+import json
+import uuid
+
+import pytest
+
+import lambda_handler
+from app.email_service import EmailService
+from app.metrics import EMF_MAX_VALUES, MemorySink, MetricsLogger, get_default_sink, set_default_sink
+from app.sqs_worker import SQSWorker, _ReceivedBatch
+
+
+class FakeSESClient:
+    def send_email(self, **kwargs):
+        return {"MessageId": str(uuid.uuid4())}
+
+
+@pytest.fixture
+def sink():
+    previous = get_default_sink()
+    sink = MemorySink()
+    set_default_sink(sink)
+    yield sink
+    set_default_sink(previous)
+
+
+@pytest.fixture
+def email_service(monkeypatch):
+    service = EmailService(ses_client=FakeSESClient())
+    monkeypatch.setattr(lambda_handler, "email_service", service)
+    return service
+
+
+def order_event(order_id: int) -> str:
+    """An SNS notification body as delivered through SQS"""
+    message = {"order_id": order_id, "user_email": "customer@example.com", "status": "PAID", "items": []}
+    return json.dumps({"Message": json.dumps(message)})
+
+
+def sqs_event(*bodies) -> dict:
+    return {"Records": [{"messageId": f"m-{i}", "body": body} for i, body in enumerate(bodies)]}
+
+
+def metric_names(document: dict) -> set:
+    return {metric["Name"] for metric in document["_aws"]["CloudWatchMetrics"][0]["Metrics"]}
+
+
+def test_handler_emits_one_document_per_invocation(sink, email_service):
+    result = lambda_handler.handler(sqs_event(order_event(1), order_event(2), "not json"), None)
+
+    assert result["batchItemFailures"] == [{"itemIdentifier": "m-2"}]
+    [document] = sink.documents
+    assert {"ParseTime", "RenderTime", "SendTime", "Failures", "BatchSize", "Processed"} <= metric_names(document)
+    assert document["BatchSize"] == 3
+    assert document["Failures"] == 1
+    assert document["Processed"] == 2
+    # Parsing is timed for the failed record too
+    assert len(document["ParseTime"]) == 3
+    assert len(document["SendTime"]) == 2
+
+    lambda_handler.handler(sqs_event(order_event(3)), None)
+    assert len(sink.documents) == 2
+
+
+def test_more_than_100_values_are_split_across_documents(sink, email_service):
+    records = EMF_MAX_VALUES + 50
+    lambda_handler.handler(sqs_event(*[order_event(i) for i in range(records)]), None)
+
+    first, second = sink.documents
+    assert len(first["ParseTime"]) == EMF_MAX_VALUES
+    assert len(second["ParseTime"]) == 50
+    assert first["BatchSize"] == records and "BatchSize" not in second
+    assert metric_names(second) == {"ParseTime", "RenderTime", "SendTime"}
+
+
+def test_worker_records_the_same_stages(sink, email_service):
+    worker = SQSWorker(email_service, "https://sqs.example/queue", sqs_client=object())
+    messages = [
+        {"MessageId": f"m-{i}", "ReceiptHandle": f"r-{i}", "Body": body}
+        for i, body in enumerate([order_event(1), "not json"])
+    ]
+    try:
+        metrics = MetricsLogger()
+        assert [worker._process_message(message, metrics) for message in messages] == [True, False]
+        metrics.flush()
+        [document] = sink.documents
+        assert {"ParseTime", "RenderTime", "SendTime", "Failures", "Processed"} <= metric_names(document)
+
+        # Through the worker's own path, each received batch is one document
+        sink.clear()
+        batch = _ReceivedBatch(len(messages))
+        for message in messages:
+            worker._handle_message(message, batch)
+        [document] = sink.documents
+        assert document["BatchSize"] == 2
+        assert document["Failures"] == 1
+    finally:
+        worker.executor.shutdown()
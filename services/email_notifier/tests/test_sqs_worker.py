@@ -0,0 +1,171 @@
+import json
+import threading
+import time
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from app.sqs_worker import SQSWorker
+
+
+class FakeEmailService:
+    """Stands in for EmailService; fails or slows down messages by flag
+
+    SQS delivery is at-least-once (and moto can hand one message to two
+    concurrent receives), so tests compare the set of sent orders.
+    """
+
+    def __init__(self):
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def parse_sns_message(self, record):
+        return json.loads(record["body"])
+
+    def process_order_event(self, message_data, metrics=None):
+        time.sleep(message_data.get("delay", 0))
+        if message_data.get("fail"):
+            raise RuntimeError("SES rejected the message")
+        with self._lock:
+            self.sent.append(message_data["order_id"])
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_SESSION_TOKEN"):
+        monkeypatch.setenv(name, "testing")
+    with mock_aws():
+        sqs = boto3.client("sqs", region_name="us-east-1")
+        queue_url = sqs.create_queue(QueueName="order-email-queue")["QueueUrl"]
+        yield sqs, queue_url
+
+
+def send(sqs, queue_url, *bodies):
+    for start in range(0, len(bodies), 10):
+        sqs.send_message_batch(QueueUrl=queue_url, Entries=[
+            {"Id": str(i), "MessageBody": json.dumps(body)}
+            for i, body in enumerate(bodies[start:start + 10])
+        ])
+
+
+def queue_counts(sqs, queue_url):
+    attributes = sqs.get_queue_attributes(
+        QueueUrl=queue_url,
+        AttributeNames=["ApproximateNumberOfMessages", "ApproximateNumberOfMessagesNotVisible"],
+    )["Attributes"]
+    return (
+        int(attributes["ApproximateNumberOfMessages"]),
+        int(attributes["ApproximateNumberOfMessagesNotVisible"]),
+    )
+
+
+def make_worker(sqs, queue_url, email_service, **overrides) -> SQSWorker:
+    options = dict(
+        wait_time_seconds=0,
+        concurrency=10,
+        visibility_timeout=30,
+        heartbeat_seconds=30,
+        delete_flush_seconds=0.05,
+    )
+    options.update(overrides)
+    return SQSWorker(email_service, queue_url, sqs_client=sqs, **options)
+
+
+def run_until(worker: SQSWorker, condition, timeout: float = 10.0) -> float:
+    """Run the worker on a thread until condition() holds, then stop it"""
+    thread = threading.Thread(target=worker.run)
+    started = time.monotonic()
+    thread.start()
+    try:
+        deadline = started + timeout
+        while not (reached := condition()) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        elapsed = time.monotonic() - started
+    finally:
+        worker.stop()
+        thread.join(timeout=10)
+    assert not thread.is_alive()
+    assert reached, "worker did not reach the expected state in time"
+    return elapsed
+
+
+def test_processes_and_deletes_messages(queue):
+    sqs, queue_url = queue
+    send(sqs, queue_url, *[{"order_id": i} for i in range(25)])
+    email_service = FakeEmailService()
+    worker = make_worker(sqs, queue_url, email_service)
+
+    run_until(worker, lambda: queue_counts(sqs, queue_url) == (0, 0))
+
+    assert set(email_service.sent) == set(range(25))
+
+
+def test_failed_messages_stay_on_the_queue(queue):
+    sqs, queue_url = queue
+    send(sqs, queue_url, {"order_id": 1}, {"order_id": 2, "fail": True}, {"order_id": 3})
+    email_service = FakeEmailService()
+    worker = make_worker(sqs, queue_url, email_service)
+
+    run_until(worker, lambda: set(email_service.sent) == {1, 3} and queue_counts(sqs, queue_url) == (0, 1))
+
+    assert set(email_service.sent) == {1, 3}
+
+
+def test_slow_message_does_not_hold_up_its_batch(queue):
+    sqs, queue_url = queue
+    send(sqs, queue_url, {"order_id": 0, "delay": 1.0}, *[{"order_id": i} for i in range(1, 10)])
+    email_service = FakeEmailService()
+    worker = make_worker(sqs, queue_url, email_service)
+
+    # Everything but the slow message is sent and deleted while it still runs
+    run_until(
+        worker,
+        lambda: set(email_service.sent) == set(range(1, 10)) and queue_counts(sqs, queue_url) == (0, 1),
+    )
+
+
+def test_uses_more_than_one_receive_worth_of_workers(queue):
+    sqs, queue_url = queue
+    slow = [{"order_id": i, "delay": 1.0} for i in range(3)]
+    send(sqs, queue_url, *slow, *[{"order_id": i} for i in range(3, 25)])
+    email_service = FakeEmailService()
+    worker = make_worker(sqs, queue_url, email_service, concurrency=50)
+
+    elapsed = run_until(worker, lambda: queue_counts(sqs, queue_url) == (0, 0))
+
+    assert worker.receivers == 5
+    assert set(email_service.sent) == set(range(25))
+    assert elapsed < 2.0
+
+
+def test_extends_visibility_of_slow_messages(queue, monkeypatch):
+    sqs, queue_url = queue
+    send(sqs, queue_url, {"order_id": 1, "delay": 0.5})
+    extended = []
+    worker = make_worker(sqs, queue_url, FakeEmailService(), heartbeat_seconds=0.1)
+    original = worker._extend_visibility
+    monkeypatch.setattr(worker, "_extend_visibility", lambda messages: (extended.append(len(messages)), original(messages)))
+
+    run_until(worker, lambda: queue_counts(sqs, queue_url) == (0, 0))
+
+    assert extended and all(count == 1 for count in extended)
+
+
+def test_stop_finishes_in_flight_messages(queue):
+    sqs, queue_url = queue
+    send(sqs, queue_url, {"order_id": 1, "delay": 0.3})
+    email_service = FakeEmailService()
+    worker = make_worker(sqs, queue_url, email_service)
+    thread = threading.Thread(target=worker.run)
+    thread.start()
+
+    deadline = time.monotonic() + 5
+    while queue_counts(sqs, queue_url) != (0, 1) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    worker.stop()
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert email_service.sent == [1]
+    assert queue_counts(sqs, queue_url) == (0, 0)
@@ -0,0 +1,30 @@
+import logging
+import signal
+
+from app.config import settings
+from app.sqs_worker import build_worker
+
+# Configure logging
+logging.basicConfig(
+    level=getattr(logging, settings.LOG_LEVEL),
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    """Run the email notifier as a long-lived SQS worker"""
+    worker = build_worker()
+
+    def _handle_signal(signum, frame):
+        logger.info(f"Received signal {signum}")
+        worker.stop()
+
+    signal.signal(signal.SIGTERM, _handle_signal)
+    signal.signal(signal.SIGINT, _handle_signal)
+
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Retention job: archive old orders to NDJSON.gz and delete them
+
+Walks orders created before the cutoff in ``order_id`` order, one chunk at a
+time. Each chunk is read with three queries (orders, then their items and
+their shipments with one ``IN`` each), appended to a gzip-compressed NDJSON
+file (one order with its items and shipments per line) and flushed to disk,
+and only then deleted with a single ``DELETE ... WHERE order_id IN (...)``;
+the database's ``ON DELETE CASCADE`` removes the items and shipments. Chunks are committed separately with a pause in between,
+so locks are held briefly and replicas can keep up.
+
+If the job stops between writing and deleting a chunk, the next run archives
+those orders again, so an order can appear in more than one archive file.
+
+    python app/archive_orders.py --older-than-days 730
+    python app/archive_orders.py --older-than-days 365 --chunk-size 500 --pause 1 --dry-run
+"""
+import argparse
+import gzip
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.config import settings
+from app.models.base import SessionLocal
+from app.repositories.order_repository import OrderRepository
+from app.schemas.order import ArchivedOrder
+from app.services.order_service import build_order_responses
+
+logger = logging.getLogger(__name__)
+
+
+def archive_orders(
+    cutoff: datetime,
+    output_dir: str,
+    chunk_size: int = settings.ORDER_ARCHIVE_CHUNK_SIZE,
+    pause: float = settings.ORDER_ARCHIVE_PAUSE_SECONDS,
+    dry_run: bool = False,
+    max_chunks: Optional[int] = None,
+) -> Dict[str, object]:
+    """Archive and delete orders created before cutoff, returning run statistics"""
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(
+        output_dir, f"orders-before-{cutoff:%Y%m%d}-{datetime.utcnow():%Y%m%dT%H%M%S}.ndjson.gz"
+    )
+    stats = {"file": path, "orders": 0, "items": 0, "shipments": 0, "chunks": 0}
+    start = time.perf_counter()
+    last_id = 0
+    
+    with SessionLocal() as db, gzip.open(path, "wb") as archive:
+        repository = OrderRepository(db)
+        while max_chunks is None or stats["chunks"] < max_chunks:
+            rows = repository.get_older_than(cutoff, last_id, chunk_size)
+            if not rows:
+                break
+            order_ids = [order.order_id for order, _ in rows]
+            shipments = repository.get_shipments(order_ids)
+            # The reads opened a transaction; end it so the pause holds no snapshot
+            db.rollback()
+            
+            for order in build_order_responses(rows):
+                archived = ArchivedOrder.model_validate({
+                    **order,
+                    "shipments": [dict(s._mapping) for s in shipments[order["order_id"]]],
+                })
+                archive.write(archived.model_dump_json().encode() + b"\n")
+            # Make sure the chunk is on disk before its rows are deleted
+            archive.flush()
+            os.fsync(archive.fileobj.fileno())
+            
+            last_id = order_ids[-1]
+            if not dry_run:
+                repository.delete_by_ids(order_ids)
+            
+            stats["chunks"] += 1
+            stats["orders"] += len(rows)
+            stats["items"] += sum(len(items) for _, items in rows)
+            stats["shipments"] += sum(len(order_shipments) for order_shipments in shipments.values())
+            elapsed = time.perf_counter() - start
+            logger.info(
+                f"Archived {stats['orders']} orders, {stats['items']} items, {stats['shipments']} shipments "
+                f"({(stats['orders'] + stats['items'] + stats['shipments']) / elapsed:.0f} rows/sec)"
+            )
+            if len(rows) < chunk_size:
+                break
+            time.sleep(pause)
+    
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    rows = stats["orders"] + stats["items"] + stats["shipments"]
+    stats["rows_per_sec"] = round(rows / max(stats["seconds"], 1e-9))
+    if stats["orders"] == 0:
+        os.remove(path)
+        stats["file"] = None
+    return stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Archive orders older than a cutoff and delete them")
+    parser.add_argument("--older-than-days", type=int, default=settings.ORDER_RETENTION_DAYS)
+    parser.add_argument("--output-dir", default=settings.ORDER_ARCHIVE_DIR)
+    parser.add_argument("--chunk-size", type=int, default=settings.ORDER_ARCHIVE_CHUNK_SIZE)
+    parser.add_argument("--pause", type=float, default=settings.ORDER_ARCHIVE_PAUSE_SECONDS,
+                        help="Seconds to sleep between chunks")
+    parser.add_argument("--max-chunks", type=int, default=None, help="Stop after this many chunks")
+    parser.add_argument("--dry-run", action="store_true", help="Write the archive but delete nothing")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=getattr(logging, settings.LOG_LEVEL))
+    cutoff = datetime.utcnow() - timedelta(days=args.older_than_days)
+    stats = archive_orders(
+        cutoff,
+        args.output_dir,
+        chunk_size=args.chunk_size,
+        pause=args.pause,
+        dry_run=args.dry_run,
+        max_chunks=args.max_chunks,
+    )
+    action = "Archived" if args.dry_run else "Archived and deleted"
+    print(
+        f"{action} {stats['orders']} orders, {stats['items']} items and {stats['shipments']} shipments "
+        f"created before {cutoff:%Y-%m-%d} "
+        f"in {stats['seconds']}s ({stats['rows_per_sec']} rows/sec)"
+    )
+    if stats["file"]:
+        print(f"Archive: {stats['file']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""Bulk cleanup of expired Idempotency-Key responses
+
+Deletes expired rows in batches of ``IDEMPOTENCY_CLEANUP_BATCH_SIZE``, each
+in its own short transaction, until none are left. Run it from cron or a
+scheduled Lambda (``app.cleanup_idempotency_keys.handler``):
+
+    python app/cleanup_idempotency_keys.py
+    python app/cleanup_idempotency_keys.py --batch-size 1000
+"""
+import argparse
+import logging
+import os
+import sys
+from datetime import datetime
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.config import settings
+from app.models.base import SessionLocal
+from app.repositories.idempotency_repository import IdempotencyRepository
+
+logger = logging.getLogger(__name__)
+
+
+def cleanup_expired_keys(batch_size: int = settings.IDEMPOTENCY_CLEANUP_BATCH_SIZE) -> int:
+    """Delete all expired keys, returning the number deleted"""
+    now = datetime.utcnow()
+    deleted = 0
+    with SessionLocal() as db:
+        repository = IdempotencyRepository(db)
+        while True:
+            count = repository.delete_expired(now, batch_size)
+            deleted += count
+            if count < batch_size:
+                break
+    logger.info(f"Deleted {deleted} expired idempotency keys")
+    return deleted
+
+
+def handler(event, context):
+    """Scheduled Lambda entry point"""
+    return {"deleted": cleanup_expired_keys()}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Delete expired Idempotency-Key responses")
+    parser.add_argument("--batch-size", type=int, default=settings.IDEMPOTENCY_CLEANUP_BATCH_SIZE)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=getattr(logging, settings.LOG_LEVEL))
+    print(f"Deleted {cleanup_expired_keys(args.batch_size)} expired idempotency keys")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
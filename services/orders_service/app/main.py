@@ -2,10 +2,29 @@ import logging
 from fastapi import FastAPI
 
 from app.config import settings
-from app.models.base import init_db
+from app.models.base import engine, init_db, replica_engines
+from app.query_cache import statement_cache_metrics, warm_statements
 from fastapi.responses import RedirectResponse
 
-from app.routers import orders
+from app import metrics
+from app.db_pool import pool_metrics
+from app.middleware.timing import (
+    TimingMiddleware,
+    instrument_botocore,
+    instrument_fastapi_serialization,
+    instrument_sqlalchemy,
+)
+
+# boto3 clients copy the session's hooks when created, so instrument first
+if settings.METRICS_ENABLED:
+    metrics.instrument_botocore()
+if settings.SERVER_TIMING_ENABLED:
+    instrument_botocore()
+    instrument_sqlalchemy([engine, *replica_engines])
+    instrument_fastapi_serialization()
+
+from app.routers import orders  # noqa: E402
+from app.middleware.auth import AuthMiddleware, TokenVerifier  # noqa: E402
 
 # Configure logging
 logging.basicConfig(
@@ -14,6 +33,11 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Runs once per container during (Lambda) init, before the first request
+if settings.DB_WARM_UP:
+    from app.repositories.order_repository import WARM_UP_STATEMENTS
+    warm_statements([engine, *replica_engines], WARM_UP_STATEMENTS)
+
 # Create FastAPI app
 app = FastAPI(
     title="Orders Service API",
@@ -21,5 +45,36 @@ app = FastAPI(
 )
 
 
+if settings.AUTH_ENABLED:
+    app.add_middleware(
+        AuthMiddleware,
+        verifier=TokenVerifier(
+            jwks=settings.AUTH_JWKS,
+            jwks_file=settings.AUTH_JWKS_FILE,
+            jwks_url=settings.AUTH_JWKS_URL,
+            issuer=settings.AUTH_ISSUER,
+            audience=settings.AUTH_AUDIENCE,
+            cache_ttl=settings.AUTH_KEYS_CACHE_TTL,
+        ),
+        exempt_paths={"/docs", "/openapi.json", "/metrics"},
+    )
+
+if settings.METRICS_ENABLED:
+    metrics.registry.register_collector(lambda: pool_metrics({
+        "primary": engine,
+        **{f"replica{i}": replica for i, replica in enumerate(replica_engines)},
+    }))
+    metrics.registry.register_collector(statement_cache_metrics)
+    app.add_middleware(
+        metrics.MetricsMiddleware,
+        emf_namespace=settings.METRICS_NAMESPACE if settings.METRICS_EMF_ENABLED else None,
+        emf_interval=settings.METRICS_EMF_INTERVAL,
+    )
+    app.add_api_route("/metrics", metrics.metrics_endpoint, methods=["GET"], include_in_schema=False)
+
+# Added last so it runs outermost and its timing covers authentication too
+if settings.SERVER_TIMING_ENABLED:
+    app.add_middleware(TimingMiddleware)
+
 app.include_router(orders.router, prefix="/orders")
 
@@ -0,0 +1,363 @@
+"""Prometheus metrics shared by the orders, users and cart services
+
+Counters and histograms are aggregated per thread: each thread writes to
+its own dict, so recording takes no lock and threads never contend. The
+shards are only merged when ``/metrics`` is scraped (Prometheus text format)
+or, on Lambda where nothing scrapes a container, when the changes since the
+last flush are written to stdout as CloudWatch Embedded Metric Format lines.
+
+Values that already live elsewhere (pool occupancy, statement cache counts)
+are read at collection time by callbacks passed to ``register_collector``.
+"""
+import json
+import sys
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import boto3
+from starlette.responses import Response
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Starlette appends the charset
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+class MetricFamily(NamedTuple):
+    """A collected metric: name, type, help text and (labels, value) samples"""
+    name: str
+    type: str
+    help: str
+    samples: List[Tuple[Dict[str, str], float]]
+
+
+class _Shards:
+    """One dict per thread, plus the list of all of them for collection"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._all: List[dict] = []
+        # Only taken the first time a thread records something
+        self._lock = threading.Lock()
+
+    def mine(self) -> dict:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._all.append(shard)
+        return shard
+
+    def snapshot(self) -> List[list]:
+        with self._lock:
+            shards = list(self._all)
+        # list() copies under the GIL, so writers may keep going meanwhile
+        return [list(shard.items()) for shard in shards]
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, registry: "MetricsRegistry", name: str, help: str, labels: Sequence[str]):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+
+
+class Counter(_Metric):
+    """Monotonic counter, ``inc(amount, *label_values)``"""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, *label_values: str):
+        shard = self.registry._shards.mine()
+        key = (self, label_values)
+        shard[key] = shard.get(key, 0.0) + amount
+
+
+class Histogram(_Metric):
+    """Histogram with fixed buckets, ``observe(value, *label_values)``"""
+
+    type = "histogram"
+
+    def __init__(self, registry, name, help, labels, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(registry, name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *label_values: str):
+        shard = self.registry._shards.mine()
+        key = (self, label_values)
+        # Per-bucket (not cumulative) counts, the +Inf bucket, then the sum
+        data = shard.get(key)
+        if data is None:
+            data = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        data[bisect_left(self.buckets, value)] += 1
+        data[-1] += value
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+class MetricsRegistry:
+    """Holds a service's metrics and collectors"""
+
+    def __init__(self):
+        self._shards = _Shards()
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+        self._last_emf: Dict[tuple, list] = {}
+        self._last_emf_at = 0.0
+        self._emf_lock = threading.Lock()
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        metric = Counter(self, name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(self, name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[MetricFamily]]):
+        self._collectors.append(collector)
+
+    def _merged(self) -> Dict[_Metric, Dict[tuple, object]]:
+        """Sum all thread shards into metric -> label values -> value"""
+        merged: Dict[_Metric, Dict[tuple, object]] = {metric: {} for metric in self._metrics}
+        for items in self._shards.snapshot():
+            for (metric, label_values), value in items:
+                series = merged[metric]
+                if isinstance(metric, Histogram):
+                    total = series.get(label_values)
+                    if total is None:
+                        series[label_values] = list(value)
+                    else:
+                        for i, v in enumerate(value):
+                            total[i] += v
+                else:
+                    series[label_values] = series.get(label_values, 0.0) + value
+        return merged
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        for metric, series in self._merged().items():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for label_values, value in sorted(series.items()):
+                labels = dict(zip(metric.labels, label_values))
+                if isinstance(metric, Histogram):
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets + (float("inf"),), value[:-1]):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{metric.name}_bucket{_format_labels({**labels, 'le': le})} {cumulative}")
+                    lines.append(f"{metric.name}_sum{_format_labels(labels)} {_format_value(value[-1])}")
+                    lines.append(f"{metric.name}_count{_format_labels(labels)} {cumulative}")
+                else:
+                    lines.append(f"{metric.name}{_format_labels(labels)} {_format_value(value)}")
+        for collector in self._collectors:
+            for family in collector():
+                lines.append(f"# HELP {family.name} {family.help}")
+                lines.append(f"# TYPE {family.name} {family.type}")
+                for labels, value in family.samples:
+                    lines.append(f"{family.name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def flush_emf(self, namespace: str, dimensions: Dict[str, str], interval: float = 0, stream=None):
+        """Write what changed since the last flush as CloudWatch EMF lines
+
+        One JSON line per label set, holding every metric with those labels.
+        Histograms are sent as Values/Counts pairs using each bucket's upper
+        bound, which CloudWatch turns into approximate percentiles. Collector
+        values are sent as gauges.
+        """
+        now = time.monotonic()
+        if interval and now - self._last_emf_at < interval:
+            return
+        with self._emf_lock:
+            self._last_emf_at = now
+            lines: Dict[tuple, Dict[str, tuple]] = {}
+
+            def add(labels: Dict[str, str], name: str, value, unit: str):
+                labels = {**dimensions, **labels}
+                lines.setdefault(tuple(labels.items()), {})[name] = (value, unit)
+
+            for metric, series in self._merged().items():
+                for label_values, value in series.items():
+                    key = (metric.name, label_values)
+                    previous = self._last_emf.get(key)
+                    labels = dict(zip(metric.labels, label_values))
+                    if isinstance(metric, Histogram):
+                        counts = [v - p for v, p in zip(value[:-1], previous)] if previous else value[:-1]
+                        if any(counts):
+                            bounds = metric.buckets + (metric.buckets[-1],)
+                            add(labels, metric.name, {
+                                "Values": [bound for bound, count in zip(bounds, counts) if count],
+                                "Counts": [count for count in counts if count],
+                            }, "Seconds")
+                        self._last_emf[key] = list(value)
+                    else:
+                        if value - (previous or 0.0):
+                            add(labels, metric.name, value - (previous or 0.0), "Count")
+                        self._last_emf[key] = value
+            for collector in self._collectors:
+                for family in collector():
+                    for labels, value in family.samples:
+                        add(labels, family.name, value, "None")
+
+            out = stream or sys.stdout
+            timestamp = int(time.time() * 1000)
+            for labels, values in lines.items():
+                out.write(_emf_line(namespace, timestamp, dict(labels), values))
+            out.flush()
+
+
+def _emf_line(namespace: str, timestamp: int, labels: Dict[str, str], values: Dict[str, tuple]) -> str:
+    document = {
+        "_aws": {
+            "Timestamp": timestamp,
+            "CloudWatchMetrics": [{
+                "Namespace": namespace,
+                "Dimensions": [list(labels)],
+                "Metrics": [{"Name": name, "Unit": unit} for name, (_, unit) in values.items()],
+            }],
+        },
+        **labels,
+        **{name: value for name, (value, _) in values.items()},
+    }
+    return json.dumps(document) + "\n"
+
+
+registry = MetricsRegistry()
+
+REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route", "status")
+)
+AWS_CALL_DURATION = registry.histogram(
+    "aws_api_call_duration_seconds", "AWS API call latency including retries", ("aws_service", "operation")
+)
+AWS_CALL_RETRIES = registry.counter(
+    "aws_api_call_retries_total", "Retries made by AWS API calls", ("aws_service", "operation")
+)
+AWS_CALL_ERRORS = registry.counter(
+    "aws_api_call_errors_total", "AWS API calls that failed", ("aws_service", "operation")
+)
+DB_CHECKOUT_WAIT = registry.histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled database connection",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0),
+)
+DYNAMODB_CONSUMED_CAPACITY = registry.counter(
+    "dynamodb_consumed_capacity_units_total", "DynamoDB capacity units consumed", ("table", "operation")
+)
+
+
+def record_consumed_capacity(response: dict, operation: str):
+    """Count the ConsumedCapacity of a DynamoDB response (ReturnConsumedCapacity=TOTAL)"""
+    consumed = response.get("ConsumedCapacity")
+    if not consumed:
+        return
+    for entry in consumed if isinstance(consumed, list) else [consumed]:
+        DYNAMODB_CONSUMED_CAPACITY.inc(entry.get("CapacityUnits", 0.0), entry.get("TableName", ""), operation)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency per route
+
+    With an EMF namespace set, changed metrics are also flushed to stdout at
+    the end of a request, at most once per ``emf_interval`` seconds.
+    """
+
+    def __init__(
+        self,
+        app,
+        emf_namespace: Optional[str] = None,
+        emf_dimensions: Optional[Dict[str, str]] = None,
+        emf_interval: float = 0,
+    ):
+        self.app = app
+        self.emf_namespace = emf_namespace
+        self.emf_dimensions = emf_dimensions or {}
+        self.emf_interval = emf_interval
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status_code[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The route template, not the raw path, keeps label cardinality bounded
+            route = scope.get("route")
+            REQUEST_DURATION.observe(
+                time.perf_counter() - start,
+                scope["method"],
+                getattr(route, "path_format", None) or "unmatched",
+                str(status_code[0]),
+            )
+            if self.emf_namespace:
+                registry.flush_emf(self.emf_namespace, self.emf_dimensions, self.emf_interval)
+
+
+def instrument_botocore(session=None):
+    """Record latency, retries and errors of AWS API calls made by a boto3 session
+
+    Clients copy their session's event hooks when they are created, so call
+    this before any client is built. Defaults to boto3's default session.
+    """
+    if session is None:
+        if boto3.DEFAULT_SESSION is None:
+            boto3.setup_default_session()
+        session = boto3.DEFAULT_SESSION
+
+    def before_call(model, context, **kwargs):
+        context["metrics_call"] = (model.service_model.endpoint_prefix, model.name, time.perf_counter())
+
+    # after-call-error (connection failures) is emitted without the model,
+    # so the call's identity travels in the request context
+    def after_call(context, parsed=None, exception=None, **kwargs):
+        call = context.pop("metrics_call", None)
+        if call is None:
+            return
+        service, operation, start = call
+        AWS_CALL_DURATION.observe(time.perf_counter() - start, service, operation)
+        metadata = (parsed or {}).get("ResponseMetadata") or {}
+        if metadata.get("RetryAttempts"):
+            AWS_CALL_RETRIES.inc(metadata["RetryAttempts"], service, operation)
+        if exception is not None or metadata.get("HTTPStatusCode", 200) >= 300:
+            AWS_CALL_ERRORS.inc(1, service, operation)
+
+    # First, so the clock starts even if a later handler short-circuits the call
+    session.events.register_first("before-call.*.*", before_call)
+    session.events.register("after-call.*.*", after_call)
+    session.events.register("after-call-error.*.*", after_call)
+
+
+def metrics_endpoint() -> Response:
+    """GET /metrics in Prometheus text format"""
+    return Response(registry.render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
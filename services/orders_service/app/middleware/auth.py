@@ -0,0 +1,196 @@
+"""Access token verification shared by the orders and cart services
+
+Tokens are RS256 JWTs issued by ``POST /users/authenticate``. They are
+verified locally against cached public keys, so a request costs no database
+or network call. Keys come from configuration (an inline JWKS or a JWKS
+file) or from the users service JWKS URL, which is fetched on first use and
+again only after the cache TTL expires or an unknown key id shows up.
+"""
+import json
+import logging
+import threading
+import time
+import urllib.request
+from typing import Any, Dict, Iterable, Optional
+
+import jwt
+from fastapi import HTTPException, Request, status
+from starlette.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+ALGORITHMS = ["RS256"]
+
+# Roles allowed to act on any user's resources (payment/shipment workers)
+PRIVILEGED_ROLES = {"service", "admin"}
+
+
+class TokenVerificationError(Exception):
+    """Raised when an access token is missing, malformed or invalid"""
+
+
+class TokenVerifier:
+    """Verifies access tokens against a cache of public keys"""
+
+    def __init__(
+        self,
+        jwks: Optional[str] = None,
+        jwks_file: Optional[str] = None,
+        jwks_url: Optional[str] = None,
+        issuer: Optional[str] = None,
+        audience: Optional[str] = None,
+        cache_ttl: int = 3600,
+        min_refresh_interval: int = 60,
+    ):
+        self.jwks_url = jwks_url
+        self.issuer = issuer
+        self.audience = audience
+        self.cache_ttl = cache_ttl
+        self.min_refresh_interval = min_refresh_interval
+        self._keys: Dict[str, Any] = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+        if jwks:
+            self._store_keys(json.loads(jwks))
+        elif jwks_file:
+            with open(jwks_file) as f:
+                self._store_keys(json.load(f))
+
+    def _store_keys(self, jwks: Dict[str, Any]):
+        keys = {}
+        for jwk in jwks.get("keys", []):
+            keys[jwk.get("kid", "")] = jwt.PyJWK(jwk).key
+        self._keys = keys
+        self._loaded_at = time.monotonic()
+        logger.info(f"Loaded {len(keys)} token verification keys")
+
+    def _refresh_from_url(self):
+        with self._lock:
+            # Another thread may have refreshed while we waited
+            if time.monotonic() - self._loaded_at < self.min_refresh_interval:
+                return
+            try:
+                with urllib.request.urlopen(self.jwks_url, timeout=5) as response:
+                    self._store_keys(json.loads(response.read()))
+            except Exception as e:
+                logger.error(f"Failed to fetch JWKS from {self.jwks_url}: {e}")
+                # Keep serving from the stale cache, retry after the interval
+                self._loaded_at = time.monotonic()
+
+    def get_key(self, kid: str):
+        """Get a verification key by id, refreshing the cache when needed"""
+        if self.jwks_url:
+            age = time.monotonic() - self._loaded_at
+            if age > self.cache_ttl or (kid not in self._keys and age > self.min_refresh_interval):
+                self._refresh_from_url()
+        key = self._keys.get(kid)
+        if key is None:
+            raise TokenVerificationError("Unknown signing key")
+        return key
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """Verify a token and return its claims"""
+        try:
+            header = jwt.get_unverified_header(token)
+            key = self.get_key(header.get("kid", ""))
+            return jwt.decode(
+                token,
+                key,
+                algorithms=ALGORITHMS,
+                issuer=self.issuer,
+                audience=self.audience,
+                options={"require": ["exp", "sub"]},
+            )
+        except jwt.PyJWTError as e:
+            raise TokenVerificationError(str(e))
+
+
+class AuthMiddleware:
+    """ASGI middleware that rejects requests without a valid bearer token
+
+    Verified claims are stored on ``request.state.user``.
+    """
+
+    def __init__(self, app, verifier: TokenVerifier, exempt_paths: Iterable[str] = ()):
+        self.app = app
+        self.verifier = verifier
+        self.exempt_paths = set(exempt_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        token = None
+        for name, value in scope.get("headers", []):
+            if name == b"authorization":
+                scheme, _, credentials = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer":
+                    token = credentials.strip()
+                break
+
+        if not token:
+            await self._reject(scope, receive, send, "Missing bearer token")
+            return
+
+        try:
+            claims = self.verifier.verify(token)
+        except TokenVerificationError as e:
+            logger.info(f"Rejected access token: {e}")
+            await self._reject(scope, receive, send, "Invalid access token")
+            return
+
+        scope.setdefault("state", {})["user"] = claims
+        await self.app(scope, receive, send)
+
+    async def _reject(self, scope, receive, send, detail: str):
+        response = JSONResponse(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            content={"detail": detail},
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+        await response(scope, receive, send)
+
+
+def get_current_user(request: Request) -> Optional[Dict[str, Any]]:
+    """Claims of the authenticated caller, or None when auth is disabled"""
+    return getattr(request.state, "user", None)
+
+
+def authorize_user(request: Request, user_id) -> None:
+    """Ensure the caller may act on behalf of user_id"""
+    claims = get_current_user(request)
+    if claims is None or claims.get("role") in PRIVILEGED_ROLES:
+        return
+    if str(claims.get("sub")) != str(user_id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not allowed to access another user's resources"
+        )
+
+
+def authorize_privileged(request: Request) -> None:
+    """Ensure the caller is a service or admin, for operations spanning every user"""
+    claims = get_current_user(request)
+    if claims is None or claims.get("role") in PRIVILEGED_ROLES:
+        return
+    raise HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail="Requires a service or admin token"
+    )
+
+
+def scoped_user_id(request: Request) -> Optional[str]:
+    """The user whose data a caller is limited to, or None for service, admin or no auth"""
+    claims = get_current_user(request)
+    if claims is None or claims.get("role") in PRIVILEGED_ROLES:
+        return None
+    return str(claims.get("sub"))
+
+
+def authorize_path_user(request: Request) -> None:
+    """Router dependency checking the {user_id} path parameter against the token"""
+    user_id = request.path_params.get("user_id")
+    if user_id is not None:
+        authorize_user(request, user_id)
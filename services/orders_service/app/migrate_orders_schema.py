@@ -0,0 +1,138 @@
+"""Bring an existing orders table up to the current schema
+
+Adds the ``version`` column (ETags), the claim lease columns, the
+``idempotency_keys`` table and the ``idx_status_created_at`` queue index, then
+drops ``idx_status``, which is a prefix of the new index. Every change is
+applied only if the database does not have it yet (checked in ``information_schema`` on MySQL), so the script
+can be re-run safely and is a no-op on a database built from
+``scripts/schema.sql``:
+
+    python app/migrate_orders_schema.py --dry-run
+    python app/migrate_orders_schema.py
+"""
+import argparse
+import logging
+import os
+import sys
+from typing import List, Set, Tuple
+
+from sqlalchemy import bindparam, inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.config import settings
+from app.models.base import engine
+
+logger = logging.getLogger(__name__)
+
+TABLE = "orders"
+
+# (name, definition) of columns added since the original schema, in order
+COLUMNS = [
+    ("version", "INT NOT NULL DEFAULT 1"),
+    ("claimed_by", "VARCHAR(100) NULL"),
+    ("claimed_until", "TIMESTAMP NULL"),
+]
+
+# (name, definition) of tables added since the original schema
+TABLES = [
+    ("idempotency_keys", """CREATE TABLE IF NOT EXISTS idempotency_keys (
+    user_id         BIGINT NOT NULL,
+    idempotency_key VARCHAR(255) NOT NULL,
+    request_hash    CHAR(64) NOT NULL,
+    order_id        BIGINT NOT NULL,
+    status_code     INT NOT NULL,
+    response_body   TEXT NOT NULL,
+    created_at      TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at      TIMESTAMP NOT NULL,
+
+    PRIMARY KEY (user_id, idempotency_key)
+)"""),
+]
+
+# (name, table, columns) of indexes to create
+INDEXES = [
+    ("idx_status_created_at", TABLE, "status, created_at"),
+    ("idx_idempotency_keys_expires_at", "idempotency_keys", "expires_at"),
+]
+
+# Indexes made redundant by INDEXES
+OBSOLETE_INDEXES = ["idx_status"]
+
+
+def existing_schema(conn: Connection) -> Tuple[Set[str], Set[str], Set[str]]:
+    """Column names of the orders table, plus the index and table names the service uses"""
+    tables = [TABLE] + [name for name, _ in TABLES]
+    if conn.dialect.name == "mysql":
+        columns = conn.execute(text(
+            "SELECT COLUMN_NAME FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"
+        ), {"table": TABLE}).scalars()
+        indexes = conn.execute(text(
+            "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN :tables"
+        ).bindparams(bindparam("tables", expanding=True)), {"tables": tables}).scalars()
+        existing = conn.execute(text(
+            "SELECT TABLE_NAME FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN :tables"
+        ).bindparams(bindparam("tables", expanding=True)), {"tables": tables}).scalars()
+        return set(columns), set(indexes), set(existing)
+    inspector = inspect(conn)
+    existing = {name for name in tables if inspector.has_table(name)}
+    return (
+        {column["name"] for column in inspector.get_columns(TABLE)},
+        {index["name"] for name in existing for index in inspector.get_indexes(name)},
+        existing,
+    )
+
+
+def plan(columns: Set[str], indexes: Set[str], tables: Set[str], dialect: str) -> List[str]:
+    """Statements that bring a database with these columns, indexes and tables up to date"""
+    # Index changes on MySQL must not block writes to the table
+    online = " ALGORITHM=INPLACE LOCK=NONE" if dialect == "mysql" else ""
+    statements = [
+        f"ALTER TABLE {TABLE} ADD COLUMN {name} {definition}"
+        for name, definition in COLUMNS if name not in columns
+    ]
+    statements += [definition for name, definition in TABLES if name not in tables]
+    statements += [
+        f"CREATE INDEX {name} ON {table} ({index_columns}){online}"
+        for name, table, index_columns in INDEXES if name not in indexes
+    ]
+    for name in OBSOLETE_INDEXES:
+        if name in indexes:
+            on_table = f" ON {TABLE}" if dialect == "mysql" else ""
+            statements.append(f"DROP INDEX {name}{on_table}{online}")
+    return statements
+
+
+def migrate(db_engine: Engine, dry_run: bool = False) -> List[str]:
+    """Apply the missing changes, returning the statements (not run with dry_run)"""
+    with db_engine.connect() as conn:
+        statements = plan(*existing_schema(conn), conn.dialect.name)
+        for statement in statements:
+            logger.info(f"{'Would run' if dry_run else 'Running'}: {statement}")
+            if not dry_run:
+                # MySQL commits DDL implicitly; commit each change for the others too
+                conn.execute(text(statement))
+                conn.commit()
+    return statements
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Add the columns, tables and indexes the orders service needs")
+    parser.add_argument("--dry-run", action="store_true", help="Print the statements without running them")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=getattr(logging, settings.LOG_LEVEL))
+    statements = migrate(engine, dry_run=args.dry_run)
+    if not statements:
+        print("orders schema is up to date")
+    for statement in statements:
+        print(f"{statement};")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,28 +1,92 @@
-from sqlalchemy import create_engine
+import logging
+
+from fastapi import Request
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from app.config import settings
+from app.db_pool import instrument_engine, pool_options
+from app.db_routing import configure_routing
+from app.query_cache import instrument_statement_cache
 
-# Create SQLAlchemy engine
-engine = create_engine(
-    settings.database_url,
-    pool_pre_ping=True,
-    pool_recycle=300,
-    pool_size=10,
-    max_overflow=20,
-)
+logger = logging.getLogger(__name__)
+
+# MySQL "Access denied" error code, returned after a credential rotation
+MYSQL_ACCESS_DENIED = 1045
+
+
+def connect_with_secret(dialect, conn_rec, cargs, cparams):
+    """Open connections with credentials from the cached secret
+    
+    If the database rejects them the secret was probably rotated, so it
+    is fetched again and the connection retried once. Connections already
+    in the pool stay authenticated and are replaced by pool_recycle.
+    """
+    secret = settings.db_connect_args()
+    # Replica URLs may name their own host; the credentials always come from the secret
+    for key in ("host", "port", "database"):
+        cparams.setdefault(key, secret[key])
+    cparams.update(user=secret["user"], password=secret["password"])
+    try:
+        return dialect.connect(*cargs, **cparams)
+    except dialect.dbapi.OperationalError as e:
+        if not e.args or e.args[0] != MYSQL_ACCESS_DENIED:
+            raise
+        logger.warning("Database rejected cached credentials, refreshing secret")
+        secret = settings.db_connect_args(refresh=True)
+        cparams.update(user=secret["user"], password=secret["password"])
+        return dialect.connect(*cargs, **cparams)
+
+
+def create_db_engine(url: str):
+    """Create an engine with the configured connection mode and instrumentation"""
+    db_engine = create_engine(
+        url,
+        **pool_options(
+            settings.db_connection_mode,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        ),
+    )
+    instrument_engine(
+        db_engine,
+        # The pool mode already pings on every checkout
+        ping_idle_seconds=settings.DB_PING_IDLE_SECONDS if settings.db_connection_mode == "lambda" else 0,
+        stats_interval=settings.DB_POOL_STATS_INTERVAL,
+    )
+    instrument_statement_cache(db_engine, stats_interval=settings.DB_POOL_STATS_INTERVAL)
+    if settings.db_secret is not None:
+        event.listen(db_engine, "do_connect", connect_with_secret)
+    return db_engine
+
+
+# Create SQLAlchemy engines: writes go to the primary, read_only repository
+# methods to the replicas (if any)
+engine = create_db_engine(settings.database_url)
+replica_engines = [create_db_engine(url) for url in settings.DB_REPLICA_URLS]
 
 # Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(
+    class_=configure_routing(replica_engines, settings.DB_READ_STICKINESS_SECONDS),
+    autocommit=False,
+    autoflush=False,
+    bind=engine,
+)
 
 # Create base class for models
 Base = declarative_base()
 
 
-def get_db():
+def get_db(request: Request):
     """Provide a database session"""
     db = SessionLocal()
+    # The authenticated caller, if any, keys read-your-writes stickiness
+    claims = getattr(request.state, "user", None)
+    if claims and claims.get("sub") is not None:
+        db.info["user_id"] = str(claims["sub"])
     try:
         yield db
     finally:
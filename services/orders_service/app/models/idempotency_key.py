@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, func
+
+from app.models.base import Base
+
+
+class IdempotencyKey(Base):
+    """Stored response of a request made with an Idempotency-Key header"""
+    __tablename__ = "idempotency_keys"
+
+    # Keys are scoped to the user placing the order
+    user_id = Column(Integer, primary_key=True, autoincrement=False)
+    idempotency_key = Column(String(255), primary_key=True)
+    request_hash = Column(String(64), nullable=False)
+    order_id = Column(Integer, nullable=False)
+    status_code = Column(Integer, nullable=False)
+    response_body = Column(Text, nullable=False)
+    created_at = Column(TIMESTAMP, server_default=func.current_timestamp())
+    expires_at = Column(TIMESTAMP, nullable=False, index=True)
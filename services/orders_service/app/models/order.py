@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DECIMAL, TIMESTAMP, ForeignKey, func
+from sqlalchemy import Column, Index, Integer, String, DECIMAL, TIMESTAMP, ForeignKey, func
 from sqlalchemy.orm import relationship
 
 from app.models.base import Base
@@ -7,12 +7,20 @@ from app.models.base import Base
 class Order(Base):
     """Order model for database representation"""
     __tablename__ = "orders"
+    # Serves status-filtered queues, oldest first (POST /orders/claim)
+    __table_args__ = (Index("idx_status_created_at", "status", "created_at"),)
 
     order_id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
     status = Column(String(50), nullable=False, default="PENDING")  # PENDING, PAID, SHIPPED
     order_total = Column(DECIMAL(10, 2), nullable=False)
     created_at = Column(TIMESTAMP, server_default=func.current_timestamp())
+    # Bumped on every change; the ETag of GET /orders/{order_id}
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Lease taken by a fulfilment worker through POST /orders/claim
+    claimed_by = Column(String(100), nullable=True)
+    claimed_until = Column(TIMESTAMP, nullable=True)
 
-    # Relationship to order items
-    items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
+    # Relationship to order items; the database's ON DELETE CASCADE removes
+    # them, so deleting an order never loads its items
+    items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan", passive_deletes=True)
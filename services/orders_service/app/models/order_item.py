@@ -9,7 +9,7 @@ class OrderItem(Base):
     __tablename__ = "order_items"
 
     order_item_id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(Integer, ForeignKey("orders.order_id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.order_id", ondelete="CASCADE"), nullable=False)
     product_id = Column(Integer, ForeignKey("products.product_id"), nullable=False)
     quantity = Column(Integer, nullable=False, default=1)
     price_at_order = Column(DECIMAL(10, 2), nullable=False)
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, String, DECIMAL
+
+from app.models.base import Base
+
+
+class Product(Base):
+    """Read-only view of the products table, owned by the products service"""
+    __tablename__ = "products"
+
+    product_id = Column(Integer, primary_key=True)
+    sku = Column(String(100), nullable=False, unique=True)
+    name = Column(String(255), nullable=False)
+    price = Column(DECIMAL(10, 2), nullable=False)
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, TIMESTAMP, ForeignKey
+
+from app.models.base import Base
+
+
+class Shipment(Base):
+    """Read-only view of the shipments table, written by the shipment workers
+
+    Deleting an order cascades to its shipments, so the retention job
+    archives them with the order.
+    """
+    __tablename__ = "shipments"
+
+    shipment_id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey("orders.order_id", ondelete="CASCADE"), nullable=False)
+    carrier = Column(String(100))
+    tracking_number = Column(String(255))
+    status = Column(String(50), default="PROCESSING")  # PROCESSING, IN_TRANSIT, DELIVERED
+    shipped_at = Column(TIMESTAMP)
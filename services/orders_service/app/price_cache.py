@@ -0,0 +1,74 @@
+"""Per-container cache of product prices for order creation
+
+Checkout resolves every line's price server-side. Hot products are served
+from this cache; the misses of an order are fetched together with a single
+``IN`` query, however many lines it has. Entries expire after ``ttl``
+seconds. The products service owns prices and publishes no change events,
+so a client-supplied price that differs from the cached one is treated as a
+sign of a price change and the entry is refetched (see
+``OrderService.resolve_prices``); ``invalidate`` drops entries explicitly.
+"""
+import threading
+import time
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from app.config import settings
+
+
+class ProductPriceCache:
+    """TTL cache of product_id -> price"""
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 10_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._prices: Dict[int, Tuple[Decimal, float]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, product_ids: Iterable[int]) -> Tuple[Dict[int, Decimal], Set[int]]:
+        """Split product_ids into cached prices and ids that must be fetched"""
+        now = time.monotonic()
+        prices: Dict[int, Decimal] = {}
+        missing: Set[int] = set()
+        with self._lock:
+            for product_id in product_ids:
+                entry = self._prices.get(product_id)
+                if entry is not None and now - entry[1] < self.ttl:
+                    prices[product_id] = entry[0]
+                else:
+                    missing.add(product_id)
+            self.hits += len(prices)
+            self.misses += len(missing)
+        return prices, missing
+
+    def set_many(self, prices: Dict[int, Decimal]):
+        now = time.monotonic()
+        with self._lock:
+            for product_id, price in prices.items():
+                # Re-inserting keeps the dict in age order for eviction
+                self._prices.pop(product_id, None)
+                self._prices[product_id] = (price, now)
+            if len(self._prices) > self.max_entries:
+                self._prices = {
+                    product_id: entry for product_id, entry in self._prices.items()
+                    if now - entry[1] < self.ttl
+                }
+                for product_id in list(self._prices)[:len(self._prices) - self.max_entries]:
+                    del self._prices[product_id]
+
+    def invalidate(self, product_ids: Optional[List[int]] = None):
+        """Drop the given products, or everything"""
+        with self._lock:
+            if product_ids is None:
+                self._prices.clear()
+                return
+            for product_id in product_ids:
+                self._prices.pop(product_id, None)
+
+
+product_price_cache = ProductPriceCache(
+    ttl=settings.PRODUCT_PRICE_CACHE_TTL,
+    max_entries=settings.PRODUCT_PRICE_CACHE_MAX_ENTRIES,
+)
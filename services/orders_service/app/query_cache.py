@@ -0,0 +1,112 @@
+"""Pre-built statements for hot queries and compiled-cache statistics
+
+Hot repository queries are built once at import as ``select()`` objects with
+bound parameters and tagged with a ``query_name`` execution option. SQLAlchemy
+then only has to look up their compiled form in the engine's cache, and each
+execution records whether that lookup hit, so a short-lived Lambda container
+can show whether its cache ever got warm.
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+from sqlalchemy.orm import Session
+
+from app.metrics import MetricFamily
+
+logger = logging.getLogger(__name__)
+
+QUERY_NAME_OPTION = "query_name"
+
+
+def named(statement, name: str):
+    """Tag a statement so its executions are counted under ``name``"""
+    return statement.execution_options(**{QUERY_NAME_OPTION: name})
+
+
+class StatementCacheStats:
+    """Per-query counts of compiled cache hits and misses"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def record(self, name: str, hit: bool):
+        with self._lock:
+            counts = self._counts.setdefault(name, {"hits": 0, "misses": 0})
+            counts["hits" if hit else "misses"] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                name: {
+                    **counts,
+                    "hit_ratio": counts["hits"] / (counts["hits"] + counts["misses"]),
+                }
+                for name, counts in self._counts.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+statement_cache_stats = StatementCacheStats()
+
+
+def instrument_statement_cache(engine: Engine, stats_interval: float = 0):
+    """Count compiled cache hits for named statements and log them periodically"""
+    last_report = [time.monotonic()]
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def record_cache_hit(conn, cursor, statement, parameters, context, executemany):
+        name = context.execution_options.get(QUERY_NAME_OPTION)
+        if name is None or context.cache_hit not in (CACHE_HIT, CACHE_MISS):
+            return
+        statement_cache_stats.record(name, context.cache_hit == CACHE_HIT)
+        now = time.monotonic()
+        if stats_interval and now - last_report[0] >= stats_interval:
+            last_report[0] = now
+            logger.info(f"Statement cache stats: {statement_cache_stats.snapshot()}")
+
+
+def warm_statements(engines: Iterable[Engine], statements: List[Tuple[Any, Dict[str, Any]]]):
+    """Execute each statement once per engine so its compiled form is cached
+
+    Meant for container init, with parameters that match no rows; it also
+    opens the first connection while init still has CPU to spare. Failures
+    are logged rather than raised and only skip that engine (an unreachable
+    replica, say); its cache then warms on first use.
+    """
+    start = time.perf_counter()
+    warmed = 0
+    for engine in engines:
+        try:
+            with Session(engine) as session:
+                for statement, params in statements:
+                    session.execute(statement, params).all()
+            warmed += 1
+        except Exception as e:
+            logger.warning(f"Statement cache warm-up failed for {engine.url.host or engine.url.database}: {e}")
+    if warmed:
+        logger.info(
+            f"Warmed statement cache on {warmed} engine(s) in {(time.perf_counter() - start) * 1000:.0f}ms"
+        )
+
+
+def statement_cache_metrics() -> List[MetricFamily]:
+    """Compiled cache hits and misses per named statement, for /metrics"""
+    snapshot = statement_cache_stats.snapshot()
+    return [
+        MetricFamily(
+            f"db_statement_cache_{kind}_total",
+            "counter",
+            f"Compiled statement cache {kind} per named query",
+            [({"query": name}, counts[kind]) for name, counts in snapshot.items()],
+        )
+        for kind in ("hits", "misses")
+    ]
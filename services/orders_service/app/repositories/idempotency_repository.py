@@ -0,0 +1,57 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.idempotency_key import IdempotencyKey
+
+
+class IdempotencyRepository:
+    """Repository for stored Idempotency-Key responses"""
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def get_active(self, user_id: int, key: str, now: datetime) -> Optional[IdempotencyKey]:
+        """Get an unexpired stored response from the primary
+        
+        Never read from a replica: a retry usually arrives right after the
+        original request, before its key has replicated.
+        """
+        statement = select(IdempotencyKey).where(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.idempotency_key == key,
+            IdempotencyKey.expires_at > now,
+        )
+        return self.db.execute(statement).scalar_one_or_none()
+    
+    def save(self, record: IdempotencyKey) -> IdempotencyKey:
+        """Store a response and commit it with the rest of the session's transaction
+        
+        An expired row for the same key is replaced. Raises IntegrityError
+        (after rolling back) if a concurrent request stored the key first.
+        """
+        self.db.execute(delete(IdempotencyKey).where(
+            IdempotencyKey.user_id == record.user_id,
+            IdempotencyKey.idempotency_key == record.idempotency_key,
+            IdempotencyKey.expires_at <= datetime.utcnow(),
+        ))
+        self.db.add(record)
+        try:
+            self.db.commit()
+        except IntegrityError:
+            self.db.rollback()
+            raise
+        return record
+    
+    def delete_expired(self, now: datetime, batch_size: int) -> int:
+        """Delete up to batch_size expired keys, returning the number deleted"""
+        statement = delete(IdempotencyKey).where(IdempotencyKey.expires_at <= now)
+        if self.db.get_bind().dialect.name == "mysql":
+            # DELETE ... LIMIT keeps each transaction (and its locks) short
+            statement = statement.with_dialect_options(mysql_limit=batch_size)
+        result = self.db.execute(statement)
+        self.db.commit()
+        return result.rowcount
@@ -1,11 +1,54 @@
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy import Row, bindparam, delete, or_, select, update
+from sqlalchemy.orm import Session, joinedload
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+from datetime import datetime
 from decimal import Decimal
 
+from app.db_routing import read_only, record_write
 from app.models.order import Order
 from app.models.order_item import OrderItem
+from app.models.shipment import Shipment
+from app.query_cache import named
 from app.schemas.order import OrderCreate
 
+# Columns returned by the API, for list endpoints that skip loading ORM objects
+ORDER_COLUMNS = (Order.order_id, Order.user_id, Order.status, Order.order_total, Order.created_at)
+ORDER_COLUMNS_BY_NAME = {column.key: column for column in ORDER_COLUMNS}
+ITEM_COLUMNS = (
+    OrderItem.order_item_id, OrderItem.order_id, OrderItem.product_id,
+    OrderItem.quantity, OrderItem.price_at_order,
+)
+SHIPMENT_COLUMNS = (
+    Shipment.shipment_id, Shipment.order_id, Shipment.carrier,
+    Shipment.tracking_number, Shipment.status, Shipment.shipped_at,
+)
+
+# Hot lookups, built once so each call only binds parameters
+# An order and its items in one query, so building the response never lazy-loads
+ORDER_BY_ID = named(
+    select(Order).options(joinedload(Order.items)).where(Order.order_id == bindparam("order_id")),
+    "orders.get_by_id",
+)
+ORDER_VERSION = named(
+    select(Order.user_id, Order.version).where(Order.order_id == bindparam("order_id")), "orders.get_version"
+)
+
+# An order and its items in one round trip, always fresh from the primary
+ORDER_WITH_ITEMS = named(
+    select(Order)
+    .options(joinedload(Order.items))
+    .where(Order.order_id == bindparam("order_id"))
+    .execution_options(populate_existing=True),
+    "orders.get_with_items",
+)
+
+# Executed at init with parameters that match nothing to warm the compiled cache
+WARM_UP_STATEMENTS = [
+    (ORDER_BY_ID, {"order_id": 0}),
+    (ORDER_VERSION, {"order_id": 0}),
+    (ORDER_WITH_ITEMS, {"order_id": 0}),
+]
+
 
 class OrderRepository:
     """Repository for order database operations"""
@@ -13,22 +56,148 @@ class OrderRepository:
     def __init__(self, db: Session):
         self.db = db
     
+    @read_only
     def get_by_id(self, order_id: int) -> Optional[Order]:
-        """Get an order by ID"""
-        return self.db.query(Order).filter(Order.order_id == order_id).first()
+        """Get an order by ID, with its items"""
+        return self.db.execute(ORDER_BY_ID, {"order_id": order_id}).unique().scalar_one_or_none()
+    
+    @read_only
+    def get_version(self, order_id: int) -> Optional[Row]:
+        """Get an order's user_id and version without loading it, for conditional GETs"""
+        return self.db.execute(ORDER_VERSION, {"order_id": order_id}).one_or_none()
+    
+    @read_only
+    def get_by_user_id(
+        self,
+        user_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        fields: Optional[Sequence[str]] = None,
+        with_items: bool = True,
+        status: Optional[str] = None,
+    ) -> List[Tuple[Row, List[Row]]]:
+        """Get a page of a user's orders as (order row, item rows) pairs
+        
+        fields limits the order columns selected; without with_items the
+        items are not queried and every item list is empty. status, when
+        given, keeps only orders in that status.
+        """
+        statement = (
+            select(*self._order_columns(fields))
+            .where(Order.user_id == user_id, *self._status_filter(status))
+            .order_by(Order.order_id)
+            .offset(skip)
+            .limit(limit)
+        )
+        return self._page(statement, with_items)
+    
+    @read_only
+    def list_orders(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        fields: Optional[Sequence[str]] = None,
+        with_items: bool = True,
+        status: Optional[str] = None,
+    ) -> List[Tuple[Row, List[Row]]]:
+        """Get a page of orders as (order row, item rows) pairs, shaped and filtered as in get_by_user_id"""
+        statement = (
+            select(*self._order_columns(fields))
+            .where(*self._status_filter(status))
+            .order_by(Order.order_id)
+            .offset(skip)
+            .limit(limit)
+        )
+        return self._page(statement, with_items)
+    
+    @read_only
+    def get_by_ids(self, order_ids: List[int], user_id: Optional[str] = None) -> List[Tuple[Row, List[Row]]]:
+        """Get many orders as (order row, item rows) pairs, in two queries
+        
+        user_id, when given, keeps only that user's orders.
+        """
+        statement = select(*ORDER_COLUMNS).where(Order.order_id.in_(order_ids))
+        if user_id is not None:
+            statement = statement.where(Order.user_id == user_id)
+        return self._with_items(self.db.execute(statement).all())
+    
+    @staticmethod
+    def _status_filter(status: Optional[str]) -> list:
+        return [Order.status == status] if status is not None else []
+    
+    @staticmethod
+    def _order_columns(fields: Optional[Sequence[str]]) -> list:
+        """Order columns for a fieldset, always including order_id to page and attach items by"""
+        if fields is None:
+            return list(ORDER_COLUMNS)
+        return [Order.order_id] + [ORDER_COLUMNS_BY_NAME[name] for name in fields if name != "order_id"]
     
-    def get_by_user_id(self, user_id: int, skip: int = 0, limit: int = 100) -> List[Order]:
-        """Get all orders for a specific user"""
-        return self.db.query(Order).filter(Order.user_id == user_id).offset(skip).limit(limit).all()
+    def _page(self, statement, with_items: bool) -> List[Tuple[Row, List[Row]]]:
+        order_rows = self.db.execute(statement).all()
+        if not with_items:
+            return [(row, []) for row in order_rows]
+        return self._with_items(order_rows)
     
-    def list_orders(self, skip: int = 0, limit: int = 100) -> List[Order]:
-        """Get a list of orders with pagination"""
-        return self.db.query(Order).offset(skip).limit(limit).all()
+    def _with_items(self, order_rows: List[Row]) -> List[Tuple[Row, List[Row]]]:
+        """Attach the items of a page of orders, fetched with one IN query"""
+        if not order_rows:
+            return []
+        items: Dict[int, List[Row]] = {row.order_id: [] for row in order_rows}
+        statement = (
+            select(*ITEM_COLUMNS)
+            .where(OrderItem.order_id.in_(list(items)))
+            .order_by(OrderItem.order_item_id)
+        )
+        for item in self.db.execute(statement):
+            items[item.order_id].append(item)
+        return [(row, items[row.order_id]) for row in order_rows]
+    
+    def claim(
+        self,
+        status: str,
+        limit: int,
+        worker_id: str,
+        now: datetime,
+        lease_until: datetime,
+    ) -> List[Tuple[Row, List[Row]]]:
+        """Lease up to limit of the oldest orders in status to worker_id until lease_until
+        
+        Orders whose lease is still running are skipped, and so are rows a
+        concurrent claim has locked (FOR UPDATE SKIP LOCKED) rather than
+        waited on, so concurrent workers get disjoint batches.
+        """
+        order_rows = self.db.execute(
+            select(*ORDER_COLUMNS)
+            .where(
+                Order.status == status,
+                or_(Order.claimed_until.is_(None), Order.claimed_until < now),
+            )
+            .order_by(Order.created_at, Order.order_id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not order_rows:
+            self.db.commit()
+            return []
+        self.db.execute(
+            update(Order)
+            .where(Order.order_id.in_([row.order_id for row in order_rows]))
+            .values(claimed_by=worker_id, claimed_until=lease_until)
+            .execution_options(synchronize_session=False)
+        )
+        record_write(self.db, [row.user_id for row in order_rows])
+        claimed = self._with_items(order_rows)
+        self.db.commit()
+        return claimed
     
-    def create(self, order_data: OrderCreate) -> Order:
-        """Create a new order with order items"""
-        # Calculate order total from items
-        order_total = sum(item.price_at_order * item.quantity for item in order_data.items)
+    def create(self, order_data: OrderCreate, prices: Dict[int, Decimal], commit: bool = True) -> Order:
+        """Create a new order with order items, priced from prices (product_id -> price)
+        
+        With commit=False the order is only flushed, so the caller can add
+        more rows to the same transaction before committing.
+        """
+        # Calculate order total from the resolved prices
+        order_total = sum(prices[item.product_id] * item.quantity for item in order_data.items)
         
         # Create the order
         order = Order(
@@ -45,34 +214,121 @@ class OrderRepository:
                 order_id=order.order_id,
                 product_id=item_data.product_id,
                 quantity=item_data.quantity,
-                price_at_order=item_data.price_at_order
+                price_at_order=prices[item_data.product_id]
             )
             self.db.add(order_item)
         
-        self.db.commit()
+        if commit:
+            self.db.commit()
+        else:
+            self.db.flush()
         self.db.refresh(order)
         return order
     
+    def get_current(self, order_id: int) -> Optional[Order]:
+        """Get a order from the primary, for read-modify-write"""
+        return self.db.get(Order, order_id, populate_existing=True)
+    
+    def get_with_items(self, order_id: int) -> Optional[Order]:
+        """Get an order with its items from the primary in a single query"""
+        return self.db.execute(ORDER_WITH_ITEMS, {"order_id": order_id}).unique().scalar_one_or_none()
+    
+    def transition_status(
+        self,
+        order_id: int,
+        from_status: Optional[str],
+        to_status: str,
+        expected_versions: Optional[Set[int]] = None,
+        user_id: Optional[str] = None,
+    ) -> Tuple[bool, Optional[Order]]:
+        """Set an order's status only if it is still from_status (compare-and-set)
+        
+        Without from_status, any status other than to_status matches. With
+        expected_versions the order must also still be at one of those
+        versions, and with user_id belong to that user. Returns whether the
+        row changed, and the order as it is now, or None if it does not exist.
+        """
+        conditions = [Order.order_id == order_id]
+        if from_status is not None:
+            conditions.append(Order.status == from_status)
+        else:
+            conditions.append(Order.status != to_status)
+        if expected_versions is not None:
+            conditions.append(Order.version.in_(expected_versions))
+        if user_id is not None:
+            conditions.append(Order.user_id == user_id)
+        result = self.db.execute(
+            update(Order)
+            .where(*conditions)
+            .values(status=to_status, version=Order.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        changed = result.rowcount == 1
+        if changed:
+            self.db.commit()
+        order = self.get_with_items(order_id)
+        if changed and order is not None:
+            record_write(self.db, [order.user_id])
+        return changed, order
+    
     def update(self, order_id: int, **kwargs) -> Optional[Order]:
         """Update order attributes"""
-        order = self.get_by_id(order_id)
+        order = self.get_current(order_id)
         if not order:
             return None
         
         for key, value in kwargs.items():
             if hasattr(order, key):
                 setattr(order, key, value)
+        order.version = Order.version + 1
         
         self.db.commit()
         self.db.refresh(order)
         return order
     
-    def delete(self, order_id: int) -> bool:
-        """Delete an order by ID"""
-        order = self.get_by_id(order_id)
-        if not order:
-            return False
+    def delete(self, order_id: int, expected_versions: Optional[Set[int]] = None) -> bool:
+        """Delete an order by ID, if it is at one of expected_versions when given
         
-        self.db.delete(order)
+        Its items are removed by the database's cascade.
+        """
+        if expected_versions is None:
+            return self.delete_by_ids([order_id]) == 1
+        result = self.db.execute(
+            delete(Order)
+            .where(Order.order_id == order_id, Order.version.in_(expected_versions))
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return result.rowcount == 1
+    
+    def delete_by_ids(self, order_ids: List[int]) -> int:
+        """Delete orders in one statement, returning the number deleted"""
+        result = self.db.execute(
+            delete(Order)
+            .where(Order.order_id.in_(order_ids))
+            .execution_options(synchronize_session=False)
+        )
         self.db.commit()
-        return True
+        return result.rowcount
+    
+    def get_shipments(self, order_ids: List[int]) -> Dict[int, List[Row]]:
+        """Get the shipments of many orders with one IN query, keyed by order_id"""
+        shipments: Dict[int, List[Row]] = {order_id: [] for order_id in order_ids}
+        statement = (
+            select(*SHIPMENT_COLUMNS)
+            .where(Shipment.order_id.in_(order_ids))
+            .order_by(Shipment.shipment_id)
+        )
+        for shipment in self.db.execute(statement):
+            shipments[shipment.order_id].append(shipment)
+        return shipments
+    
+    def get_older_than(self, cutoff: datetime, after_id: int, limit: int) -> List[Tuple[Row, List[Row]]]:
+        """Get the next chunk of orders created before cutoff, by order_id after after_id"""
+        statement = (
+            select(*ORDER_COLUMNS)
+            .where(Order.created_at < cutoff, Order.order_id > after_id)
+            .order_by(Order.order_id)
+            .limit(limit)
+        )
+        return self._with_items(self.db.execute(statement).all())
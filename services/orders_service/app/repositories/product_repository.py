@@ -0,0 +1,24 @@
+from decimal import Decimal
+from typing import Dict, Iterable
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.models.product import Product
+
+
+class ProductRepository:
+    """Repository for reading products owned by the products service"""
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def get_prices(self, product_ids: Iterable[int]) -> Dict[int, Decimal]:
+        """Get the current price of each existing product with one IN query
+        
+        Reads the primary, not a replica: checkout charges these prices and
+        caches them, and a refetch after a price change must not get (and
+        cache) the old price back from a lagging replica.
+        """
+        statement = select(Product.product_id, Product.price).where(Product.product_id.in_(list(product_ids)))
+        return {row.product_id: row.price for row in self.db.execute(statement)}
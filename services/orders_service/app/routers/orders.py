@@ -1,103 +1,380 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Body
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Body, Header, Request, Response
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
+from app.conditional import (
+    PreconditionFailedError,
+    if_match_versions,
+    is_not_modified,
+    not_modified,
+    precondition_failed,
+    version_etag,
+)
+from app.config import settings
 from app.models.base import get_db
+from app.responses import FastJSONResponse
+from app.models.idempotency_key import IdempotencyKey
+from app.repositories.idempotency_repository import IdempotencyRepository
 from app.repositories.order_repository import OrderRepository
-from app.services.order_service import OrderService
+from app.repositories.product_repository import ProductRepository
+from app.services.order_service import (
+    IdempotencyKeyReusedError,
+    OrderAccessDeniedError,
+    OrderService,
+    OrderStatusConflictError,
+    UnknownProductError,
+    idempotency_request_hash,
+    parse_fieldset,
+)
 from app.services.notification_service import NotificationService
-from app.schemas.order import OrderCreate, OrderUpdate, OrderResponse
+from app.schemas.order import (
+    OrderBatchLookupRequest,
+    OrderBatchLookupResponse,
+    OrderClaimRequest,
+    OrderClaimResponse,
+    OrderCreate,
+    OrderResponse,
+    OrderStatusTransition,
+    OrderUpdate,
+)
+from app.middleware.auth import (
+    PRIVILEGED_ROLES,
+    authorize_path_user,
+    authorize_privileged,
+    authorize_user,
+    get_current_user,
+    scoped_user_id,
+)
 
 router = APIRouter(tags=["orders"])
 
 
+def fieldset_or_400(fields: Optional[str], expand: Optional[str]):
+    """Parsed ?fields= and ?expand=, or 400 for names an order does not have"""
+    try:
+        return parse_fieldset(fields, expand)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+def authorize_order_owner(request: Request, service: OrderService, order_id: int) -> None:
+    """403 unless the caller may act for the order's user
+    
+    Reads only the order's user_id, and nothing when auth is disabled or the
+    caller is privileged. A missing order is left to the handler's 404.
+    """
+    claims = get_current_user(request)
+    if claims is None or claims.get("role") in PRIVILEGED_ROLES:
+        return
+    current = service.get_order_version(order_id)
+    if current:
+        authorize_user(request, current[0])
+
+
+def require_service_token(request: Request) -> None:
+    """403 unless the caller holds a service or admin token
+    
+    Unlike authorize_privileged, a missing token is only accepted in dev:
+    deployed without AUTH_ENABLED, the endpoint would be open to anyone.
+    """
+    if get_current_user(request) is None and settings.ENVIRONMENT != "dev":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Requires AUTH_ENABLED and a service or admin token"
+        )
+    authorize_privileged(request)
+
+
+def replay_response(record: IdempotencyKey) -> Response:
+    """Return a stored response verbatim, marked as a replay"""
+    return Response(
+        content=record.response_body,
+        status_code=record.status_code,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
 @router.post("", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
 def create_order(
+    request: Request,
     order_data: OrderCreate,
     user_email: str = Body(..., embed=True),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", min_length=1, max_length=255),
     db: Session = Depends(get_db)
 ):
-    """Create a new order"""
+    """Create a new order
+    
+    A retry with the same Idempotency-Key header replays the first response
+    without creating another order or publishing another event.
+    """
+    authorize_user(request, order_data.user_id)
     repository = OrderRepository(db)
     notification_service = NotificationService()
-    service = OrderService(repository, notification_service)
-    return service.create_order(order_data, user_email)
+    service = OrderService(
+        repository,
+        notification_service,
+        idempotency_repository=IdempotencyRepository(db),
+        product_repository=ProductRepository(db),
+    )
+    try:
+        if idempotency_key is None:
+            return service.create_order(order_data, user_email)
+        
+        request_hash = idempotency_request_hash(order_data, user_email)
+        stored = service.get_stored_response(order_data.user_id, idempotency_key, request_hash)
+        if stored:
+            return replay_response(stored)
+        try:
+            return service.create_order(order_data, user_email, idempotency_key, request_hash)
+        except IntegrityError:
+            # Either a concurrent request with the same key committed first,
+            # or the order itself broke a constraint (e.g. an unknown user_id)
+            db.rollback()
+            stored = service.get_stored_response(order_data.user_id, idempotency_key, request_hash)
+            if not stored:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    detail="Order violates a database constraint"
+                )
+            return replay_response(stored)
+    except (UnknownProductError, IdempotencyKeyReusedError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=str(e)
+        )
 
 
 @router.get("", response_model=List[OrderResponse])
 def list_orders(
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
+    fields: Optional[str] = Query(None, description="Comma-separated order fields to return"),
+    expand: Optional[str] = Query(None, description="items to include each order's items"),
+    order_status: Optional[str] = Query(None, alias="status", pattern="^(PENDING|PAID|SHIPPED)$"),
     db: Session = Depends(get_db)
 ):
-    """List all orders"""
+    """List all orders, optionally only those in one status
+    
+    Spans every user, so it needs a service or admin token; customers use
+    GET /orders/user/{user_id}. With fields or expand only the named columns
+    are selected, and items are only loaded when expanded.
+    """
+    authorize_privileged(request)
+    selected, with_items = fieldset_or_400(fields, expand)
     repository = OrderRepository(db)
     service = OrderService(repository)
-    return service.list_orders(skip, limit)
+    return FastJSONResponse(service.list_orders(skip, limit, selected, with_items, order_status))
 
 
-@router.get("/user/{user_id}", response_model=List[OrderResponse])
+@router.post("/claim", response_model=OrderClaimResponse)
+def claim_orders(
+    request: Request,
+    claim: OrderClaimRequest,
+    db: Session = Depends(get_db)
+):
+    """Lease the oldest unclaimed orders in a status to a fulfilment worker
+    
+    Concurrent claims return disjoint batches. A worker moves each order on
+    with POST /orders/{order_id}/transition before its lease runs out;
+    otherwise the order can be claimed again. Needs a service or admin token
+    (see the users service's app/set_role.py).
+    """
+    require_service_token(request)
+    repository = OrderRepository(db)
+    service = OrderService(repository)
+    return FastJSONResponse(
+        service.claim_orders(claim.status, claim.limit, claim.worker_id, claim.lease_seconds)
+    )
+
+
+@router.post("/batch", response_model=OrderBatchLookupResponse)
+def lookup_orders(
+    request: Request,
+    lookup: OrderBatchLookupRequest,
+    db: Session = Depends(get_db)
+):
+    """Look up many orders and their items by id in one request
+    
+    Customers only get their own orders back; another user's order is
+    reported in missing_order_ids, the same as one that does not exist.
+    """
+    repository = OrderRepository(db)
+    service = OrderService(repository)
+    return FastJSONResponse(service.lookup_orders(lookup.order_ids, scoped_user_id(request)))
+
+
+@router.get(
+    "/user/{user_id}",
+    response_model=List[OrderResponse],
+    dependencies=[Depends(authorize_path_user)]
+)
 def get_user_orders(
     user_id: int,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
+    fields: Optional[str] = Query(None, description="Comma-separated order fields to return"),
+    expand: Optional[str] = Query(None, description="items to include each order's items"),
+    order_status: Optional[str] = Query(None, alias="status", pattern="^(PENDING|PAID|SHIPPED)$"),
     db: Session = Depends(get_db)
 ):
-    """Get all orders for a specific user"""
+    """Get all orders for a specific user, shaped and filtered as in list_orders"""
+    selected, with_items = fieldset_or_400(fields, expand)
     repository = OrderRepository(db)
     service = OrderService(repository)
-    return service.get_user_orders(user_id, skip, limit)
+    return FastJSONResponse(service.get_user_orders(user_id, skip, limit, selected, with_items, order_status))
 
 
 @router.get("/{order_id}", response_model=OrderResponse)
 def get_order(
+    request: Request,
+    response: Response,
     order_id: int,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    """Get an order by ID"""
+    """Get an order by ID
+    
+    When If-None-Match holds the current ETag, responds 304 after reading
+    only the order's version, without loading it or its items.
+    """
     repository = OrderRepository(db)
     service = OrderService(repository)
     
-    order = service.get_order(order_id)
-    if not order:
+    if if_none_match:
+        current = service.get_order_version(order_id)
+        if current:
+            user_id, version = current
+            authorize_user(request, user_id)
+            if is_not_modified(if_none_match, version_etag(version)):
+                return not_modified(version_etag(version))
+    
+    result = service.get_order(order_id)
+    if not result:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Order not found"
         )
+    order, version = result
+    authorize_user(request, order.user_id)
+    response.headers["ETag"] = version_etag(version)
     return order
 
 
 @router.put("/{order_id}", response_model=OrderResponse)
 def update_order(
+    request: Request,
+    response: Response,
     order_id: int,
     order_data: OrderUpdate,
     user_email: str = Body(None, embed=True),
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    """Update an order"""
+    """Update an order
+    
+    With If-Match, the update only applies if the order still has that ETag.
+    """
     repository = OrderRepository(db)
     notification_service = NotificationService()
     service = OrderService(repository, notification_service)
     
-    updated_order = service.update_order(order_id, order_data, user_email)
-    if not updated_order:
+    try:
+        result = service.update_order(
+            order_id, order_data, user_email, if_match_versions(if_match), scoped_user_id(request)
+        )
+    except OrderAccessDeniedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=str(e)
+        )
+    except PreconditionFailedError as e:
+        raise precondition_failed(e)
+    except OrderStatusConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    if not result:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Order not found"
         )
+    updated_order, version = result
+    response.headers["ETag"] = version_etag(version)
     return updated_order
 
 
+@router.post("/{order_id}/transition", response_model=OrderResponse)
+def transition_order_status(
+    request: Request,
+    response: Response,
+    order_id: int,
+    transition: OrderStatusTransition,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Change an order's status only if it is still from_status
+    
+    Returns 409 with the current status when another writer got there first,
+    or 412 when If-Match is given and the order no longer has that ETag.
+    """
+    repository = OrderRepository(db)
+    notification_service = NotificationService()
+    service = OrderService(repository, notification_service)
+    
+    try:
+        result = service.transition_status(
+            order_id,
+            transition.from_status,
+            transition.to_status,
+            transition.user_email,
+            if_match_versions(if_match),
+            scoped_user_id(request),
+        )
+    except OrderAccessDeniedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=str(e)
+        )
+    except PreconditionFailedError as e:
+        raise precondition_failed(e)
+    except OrderStatusConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    if not result:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Order not found"
+        )
+    order, version = result
+    response.headers["ETag"] = version_etag(version)
+    return order
+
+
 @router.delete("/{order_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_order(
+    request: Request,
     order_id: int,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    """Delete an order"""
+    """Delete an order, only if it still has the If-Match ETag when one is given"""
     repository = OrderRepository(db)
     service = OrderService(repository)
+    authorize_order_owner(request, service, order_id)
     
-    success = service.delete_order(order_id)
+    try:
+        success = service.delete_order(order_id, if_match_versions(if_match))
+    except PreconditionFailedError as e:
+        raise precondition_failed(e)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1,9 +1,13 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import List, Optional
 from datetime import datetime
 from decimal import Decimal
 
 from app.schemas.order_item import OrderItemCreate, OrderItemResponse
+from app.schemas.shipment import ShipmentResponse
+
+# Maximum number of order ids accepted by one batch lookup
+MAX_BATCH_LOOKUP = 500
 
 
 class OrderBase(BaseModel):
@@ -27,6 +31,19 @@ class OrderUpdate(BaseModel):
     status: Optional[str] = Field(None, pattern="^(PENDING|PAID|SHIPPED)$")
 
 
+class OrderStatusTransition(BaseModel):
+    """Schema for a compare-and-set status change"""
+    from_status: str = Field(pattern="^(PENDING|PAID|SHIPPED)$")
+    to_status: str = Field(pattern="^(PENDING|PAID|SHIPPED)$")
+    user_email: Optional[str] = None
+    
+    @model_validator(mode="after")
+    def check_status_changes(self):
+        if self.from_status == self.to_status:
+            raise ValueError("to_status must differ from from_status")
+        return self
+
+
 class OrderResponse(BaseModel):
     """Schema for order responses"""
     order_id: int
@@ -38,3 +55,34 @@ class OrderResponse(BaseModel):
     
     class Config:
         from_attributes = True
+
+
+class ArchivedOrder(OrderResponse):
+    """Schema for an order written to a retention archive, with its shipments"""
+    shipments: List[ShipmentResponse] = []
+
+
+class OrderBatchLookupRequest(BaseModel):
+    """Schema for looking up many orders by id"""
+    order_ids: List[int] = Field(min_length=1, max_length=MAX_BATCH_LOOKUP)
+
+
+class OrderBatchLookupResponse(BaseModel):
+    """Schema for batch lookup results, in the requested order"""
+    orders: List[OrderResponse]
+    missing_order_ids: List[int]
+
+
+class OrderClaimRequest(BaseModel):
+    """Schema for leasing the oldest orders in a status to a worker"""
+    status: str = Field(pattern="^(PENDING|PAID|SHIPPED)$")
+    limit: int = Field(default=10, ge=1, le=100)
+    worker_id: str = Field(min_length=1, max_length=100)
+    # Defaults to ORDER_CLAIM_LEASE_SECONDS
+    lease_seconds: Optional[int] = Field(default=None, ge=1)
+
+
+class OrderClaimResponse(BaseModel):
+    """Schema for claimed orders, oldest first"""
+    orders: List[OrderResponse]
+    claimed_until: datetime
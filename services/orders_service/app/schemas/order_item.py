@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
 from decimal import Decimal
+from typing import Annotated, Optional
 
 
 class OrderItemBase(BaseModel):
@@ -10,8 +11,13 @@ class OrderItemBase(BaseModel):
 
 
 class OrderItemCreate(OrderItemBase):
-    """Schema for creating an order item"""
-    pass
+    """Schema for creating an order item
+    
+    The price is always resolved from the products table; a price_at_order
+    sent by the client (the price it displayed) only triggers a refetch of a
+    cached price that disagrees with it.
+    """
+    price_at_order: Optional[Annotated[Decimal, Field(gt=0, decimal_places=2)]] = None
 
 
 class OrderItemResponse(OrderItemBase):
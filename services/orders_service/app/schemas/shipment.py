@@ -0,0 +1,16 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Optional
+
+
+class ShipmentResponse(BaseModel):
+    """Schema for a shipment of an order"""
+    shipment_id: int
+    order_id: int
+    carrier: Optional[str] = None
+    tracking_number: Optional[str] = None
+    status: Optional[str] = None
+    shipped_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
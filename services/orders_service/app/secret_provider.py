@@ -0,0 +1,108 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import boto3
+
+logger = logging.getLogger(__name__)
+
+
+class SecretProvider:
+    """Reads a JSON secret from Secrets Manager through a TTL cache
+
+    Values are cached in memory for ``ttl`` seconds. With ``cache_dir`` set
+    they are also written to a private file there (``/tmp`` on Lambda), so an
+    init retry or a fresh process in the same sandbox skips the round trip.
+    refresh() bypasses both caches, for when the database rejects credentials
+    after a rotation.
+    """
+
+    def __init__(
+        self,
+        secret_id: str,
+        ttl: int = 300,
+        cache_dir: Optional[str] = None,
+        min_refresh_interval: float = 5.0,
+        client=None,
+    ):
+        self.secret_id = secret_id
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self._client = client
+        self._value: Optional[Dict[str, Any]] = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self.cache_file = None
+        if cache_dir:
+            digest = hashlib.sha256(secret_id.encode()).hexdigest()[:16]
+            self.cache_file = os.path.join(cache_dir, f"secret-{digest}.json")
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = boto3.session.Session().client(service_name="secretsmanager")
+        return self._client
+
+    def get(self) -> Dict[str, Any]:
+        """Get the secret, from cache when it is fresh enough"""
+        value = self._value
+        if value is not None and time.time() - self._fetched_at < self.ttl:
+            return value
+        with self._lock:
+            if self._value is not None and time.time() - self._fetched_at < self.ttl:
+                return self._value
+            cached = self._read_cache_file()
+            if cached is not None:
+                self._value, self._fetched_at = cached
+                return self._value
+            return self._fetch()
+
+    def refresh(self) -> Dict[str, Any]:
+        """Fetch the secret again, ignoring the caches
+
+        Concurrent callers that fail at the same time share one fetch.
+        """
+        with self._lock:
+            if self._value is not None and time.time() - self._fetched_at < self.min_refresh_interval:
+                return self._value
+            return self._fetch()
+
+    def _fetch(self) -> Dict[str, Any]:
+        start = time.perf_counter()
+        response = self.client.get_secret_value(SecretId=self.secret_id)
+        self._value = json.loads(response["SecretString"])
+        self._fetched_at = time.time()
+        logger.info(f"Fetched secret {self.secret_id} in {(time.perf_counter() - start) * 1000:.0f}ms")
+        self._write_cache_file()
+        return self._value
+
+    def _read_cache_file(self):
+        if not self.cache_file:
+            return None
+        try:
+            with open(self.cache_file) as f:
+                cached = json.load(f)
+            if time.time() - cached["fetched_at"] < self.ttl:
+                return cached["value"], cached["fetched_at"]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable secret cache {self.cache_file}: {e}")
+        return None
+
+    def _write_cache_file(self):
+        if not self.cache_file:
+            return
+        try:
+            # Write privately and atomically so readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.cache_file))
+            with os.fdopen(fd, "w") as f:
+                json.dump({"fetched_at": self._fetched_at, "value": self._value}, f)
+            os.replace(tmp_path, self.cache_file)
+        except Exception as e:
+            logger.warning(f"Could not write secret cache {self.cache_file}: {e}")
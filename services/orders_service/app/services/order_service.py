@@ -1,105 +1,404 @@
-from typing import List, Optional
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional, Set, Tuple
 
+from app.conditional import PreconditionFailedError, version_etag
+from app.config import settings
+from app.models.idempotency_key import IdempotencyKey
+from app.price_cache import ProductPriceCache, product_price_cache
+from app.repositories.idempotency_repository import IdempotencyRepository
 from app.repositories.order_repository import OrderRepository
-from app.schemas.order import OrderCreate, OrderUpdate, OrderResponse
+from app.repositories.product_repository import ProductRepository
+from app.schemas.order import (
+    OrderBatchLookupResponse,
+    OrderClaimResponse,
+    OrderCreate,
+    OrderResponse,
+    OrderUpdate,
+)
+from app.schemas.order_item import OrderItemCreate
+
+logger = logging.getLogger(__name__)
+
+# Order fields a list request can select with ?fields=, besides "items"
+ORDER_FIELDS = ("order_id", "user_id", "status", "order_total", "created_at")
+EXPANDABLE = ("items",)
+
+
+def parse_fieldset(fields: Optional[str], expand: Optional[str]) -> Tuple[Optional[List[str]], bool]:
+    """Order fields and whether to include items, from ?fields= and ?expand=
+    
+    With neither parameter every field and the items are returned. Once
+    either is given, items are only included when named in one of them,
+    and fields defaults to every order field. Raises ValueError for unknown
+    names.
+    """
+    if fields is None and expand is None:
+        return None, True
+    
+    names = [name.strip() for name in (fields or "").split(",") if name.strip()]
+    expanded = [name.strip() for name in (expand or "").split(",") if name.strip()]
+    unknown = [name for name in names if name not in ORDER_FIELDS + EXPANDABLE]
+    unknown += [name for name in expanded if name not in EXPANDABLE]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    
+    selected = list(dict.fromkeys(name for name in names if name in ORDER_FIELDS)) or list(ORDER_FIELDS)
+    return selected, "items" in names or "items" in expanded
+
+
+def build_order_responses(rows) -> List[dict]:
+    """Build OrderResponse-shaped dicts from trusted (order row, item rows) pairs
+    
+    Plain dicts go straight to FastJSONResponse; copying the row mappings is
+    cheaper than constructing (or validating) a model per order and item.
+    """
+    return [
+        {**order._mapping, "items": [dict(item._mapping) for item in items]}
+        for order, items in rows
+    ]
+
+
+def build_sparse_order_responses(rows, fields: List[str], with_items: bool) -> List[dict]:
+    """Build trimmed responses holding only fields, and items when with_items"""
+    responses = []
+    for order, items in rows:
+        response = {name: order._mapping[name] for name in fields}
+        if with_items:
+            response["items"] = [dict(item._mapping) for item in items]
+        responses.append(response)
+    return responses
+
+
+class OrderStatusConflictError(Exception):
+    """Raised when an order's status is not the one a transition expected"""
+    
+    def __init__(self, current_status: str):
+        super().__init__(f"Order status is {current_status}")
+        self.current_status = current_status
+
+
+class OrderAccessDeniedError(Exception):
+    """Raised when a caller scoped to one user targets another user's order"""
+    pass
+
+
+class UnknownProductError(Exception):
+    """Raised when an order references products that do not exist"""
+    
+    def __init__(self, product_ids: List[int]):
+        super().__init__(f"Unknown product ids: {product_ids}")
+        self.product_ids = product_ids
+
+
+class IdempotencyKeyReusedError(Exception):
+    """Raised when an Idempotency-Key is sent again with a different request"""
+    pass
+
+
+def idempotency_request_hash(order_data: OrderCreate, user_email: str) -> str:
+    """Fingerprint of a create request, to detect a key reused for another request"""
+    payload = json.dumps(
+        {"order": order_data.model_dump(mode="json"), "user_email": user_email},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
 
 
 class OrderService:
     """Service for order business logic"""
     
-    def __init__(self, repository: OrderRepository, notification_service=None):
+    def __init__(
+        self,
+        repository: OrderRepository,
+        notification_service=None,
+        idempotency_repository: Optional[IdempotencyRepository] = None,
+        product_repository: Optional[ProductRepository] = None,
+        price_cache: ProductPriceCache = product_price_cache,
+    ):
         self.repository = repository
         self.notification_service = notification_service
+        self.idempotency_repository = idempotency_repository
+        self.product_repository = product_repository
+        self.price_cache = price_cache
+    
+    def get_order_version(self, order_id: int) -> Optional[Tuple[int, int]]:
+        """Get an order's user_id and version without loading its items"""
+        row = self.repository.get_version(order_id)
+        return (row.user_id, row.version) if row else None
     
-    def get_order(self, order_id: int) -> Optional[OrderResponse]:
-        """Get an order by ID"""
+    def get_order(self, order_id: int) -> Optional[Tuple[OrderResponse, int]]:
+        """Get an order by ID, with its version"""
         order = self.repository.get_by_id(order_id)
         if not order:
             return None
-        return OrderResponse.model_validate(order)
+        return OrderResponse.model_validate(order), order.version
     
-    def get_user_orders(self, user_id: int, skip: int = 0, limit: int = 100) -> List[OrderResponse]:
-        """Get all orders for a specific user"""
-        orders = self.repository.get_by_user_id(user_id, skip, limit)
-        return [OrderResponse.model_validate(order) for order in orders]
+    def get_user_orders(
+        self,
+        user_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        fields: Optional[List[str]] = None,
+        with_items: bool = True,
+        status: Optional[str] = None,
+    ) -> list:
+        """Get all orders for a specific user, trimmed to fields and filtered by status when given"""
+        rows = self.repository.get_by_user_id(user_id, skip, limit, fields, with_items, status)
+        if fields is None:
+            return build_order_responses(rows)
+        return build_sparse_order_responses(rows, fields, with_items)
     
-    def list_orders(self, skip: int = 0, limit: int = 100) -> List[OrderResponse]:
-        """Get a list of orders with pagination"""
-        orders = self.repository.list_orders(skip, limit)
-        return [OrderResponse.model_validate(order) for order in orders]
+    def list_orders(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        fields: Optional[List[str]] = None,
+        with_items: bool = True,
+        status: Optional[str] = None,
+    ) -> list:
+        """Get a list of orders with pagination, trimmed to fields and filtered by status when given"""
+        rows = self.repository.list_orders(skip, limit, fields, with_items, status)
+        if fields is None:
+            return build_order_responses(rows)
+        return build_sparse_order_responses(rows, fields, with_items)
     
-    def create_order(self, order_data: OrderCreate, user_email: str) -> OrderResponse:
-        """Create a new order"""
-        order = self.repository.create(order_data)
-        order_response = OrderResponse.model_validate(order)
+    def lookup_orders(self, order_ids: List[int], user_id: Optional[str] = None) -> OrderBatchLookupResponse:
+        """Look up many orders at once, in the requested order, reporting the ids that matched nothing
         
-        # Publish order created event
-        if self.notification_service:
-            items_data = [
-                {
-                    "product_id": item.product_id,
-                    "quantity": item.quantity,
-                    "price_at_order": str(item.price_at_order)
-                }
-                for item in order_response.items
-            ]
-            
-            self.notification_service.publish_order_event(
+        With user_id, only that user's orders match.
+        """
+        requested = list(dict.fromkeys(order_ids))
+        rows = self.repository.get_by_ids(requested, user_id)
+        by_id = {order["order_id"]: order for order in build_order_responses(rows)}
+        return OrderBatchLookupResponse.model_construct(
+            orders=[by_id[order_id] for order_id in requested if order_id in by_id],
+            missing_order_ids=[order_id for order_id in requested if order_id not in by_id],
+        )
+    
+    def claim_orders(
+        self,
+        status: str,
+        limit: int,
+        worker_id: str,
+        lease_seconds: Optional[int] = None,
+    ) -> OrderClaimResponse:
+        """Lease the oldest unclaimed orders in status to a worker
+        
+        The lease is capped at ORDER_CLAIM_MAX_LEASE_SECONDS; orders whose
+        lease runs out without a status change can be claimed again.
+        """
+        if lease_seconds is None:
+            lease_seconds = settings.ORDER_CLAIM_LEASE_SECONDS
+        lease_seconds = min(lease_seconds, settings.ORDER_CLAIM_MAX_LEASE_SECONDS)
+        now = datetime.utcnow()
+        lease_until = now + timedelta(seconds=lease_seconds)
+        
+        claimed = self.repository.claim(status, limit, worker_id, now, lease_until)
+        if claimed:
+            logger.info(f"Worker {worker_id} claimed {len(claimed)} {status} orders until {lease_until.isoformat()}")
+        return OrderClaimResponse.model_construct(
+            orders=build_order_responses(claimed),
+            claimed_until=lease_until,
+        )
+    
+    def resolve_prices(self, items: List[OrderItemCreate]) -> Dict[int, Decimal]:
+        """Current price of every product in an order, with at most one query
+        
+        Raises UnknownProductError if any product does not exist.
+        """
+        prices, missing = self.price_cache.get_many({item.product_id for item in items})
+        # A client price that disagrees with the cache suggests the price changed
+        stale = {
+            item.product_id for item in items
+            if item.price_at_order is not None
+            and item.product_id in prices
+            and prices[item.product_id] != item.price_at_order
+        }
+        missing |= stale
+        if missing:
+            fetched = self.product_repository.get_prices(missing)
+            self.price_cache.set_many(fetched)
+            prices.update(fetched)
+            unknown = sorted(missing - fetched.keys())
+            if unknown:
+                self.price_cache.invalidate(unknown)
+                raise UnknownProductError(unknown)
+        
+        for item in items:
+            if item.price_at_order is not None and item.price_at_order != prices[item.product_id]:
+                logger.info(
+                    f"Client price {item.price_at_order} for product {item.product_id} "
+                    f"replaced by current price {prices[item.product_id]}"
+                )
+        return prices
+    
+    def get_stored_response(self, user_id: int, idempotency_key: str, request_hash: str) -> Optional[IdempotencyKey]:
+        """Get the stored response for an unexpired Idempotency-Key, if any"""
+        record = self.idempotency_repository.get_active(user_id, idempotency_key, datetime.utcnow())
+        if record and record.request_hash != request_hash:
+            raise IdempotencyKeyReusedError("Idempotency-Key was already used for a different request")
+        return record
+    
+    def create_order(
+        self,
+        order_data: OrderCreate,
+        user_email: str,
+        idempotency_key: Optional[str] = None,
+        request_hash: Optional[str] = None,
+    ) -> OrderResponse:
+        """Create a new order
+        
+        With an idempotency key the serialized response is stored in the same
+        transaction as the order, so a retry can replay it. If a concurrent
+        request with the same key commits first, IntegrityError is raised and
+        nothing from this request is persisted.
+        
+        Prices come from the products table (see resolve_prices), not the client.
+        """
+        prices = self.resolve_prices(order_data.items)
+        if idempotency_key is None:
+            order = self.repository.create(order_data, prices)
+            order_response = OrderResponse.model_validate(order)
+        else:
+            order = self.repository.create(order_data, prices, commit=False)
+            order_response = OrderResponse.model_validate(order)
+            self.idempotency_repository.save(IdempotencyKey(
+                user_id=order_data.user_id,
+                idempotency_key=idempotency_key,
+                request_hash=request_hash,
                 order_id=order_response.order_id,
-                user_id=order_response.user_id,
-                user_email=user_email,
-                status=order_response.status,
-                order_total=order_response.order_total,
-                items=items_data,
-                created_at=order_response.created_at.isoformat()
-            )
+                status_code=201,
+                response_body=order_response.model_dump_json(),
+                expires_at=datetime.utcnow() + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL_SECONDS),
+            ))
+        
+        # Publish order created event
+        self._publish_order_event(order_response, user_email)
         
         return order_response
     
-    def update_order(self, order_id: int, order_data: OrderUpdate, user_email: str = None) -> Optional[OrderResponse]:
-        """Update an order's information"""
-        # Get current order to check if status changed
-        current_order = self.repository.get_by_id(order_id)
-        if not current_order:
-            return None
+    def update_order(
+        self,
+        order_id: int,
+        order_data: OrderUpdate,
+        user_email: str = None,
+        expected_versions: Optional[Set[int]] = None,
+        user_id: Optional[str] = None,
+    ) -> Optional[Tuple[OrderResponse, int]]:
+        """Update an order's information, returning it with its new version
         
-        update_data = {k: v for k, v in order_data.model_dump().items() if v is not None}
+        A status change is a single compare-and-set UPDATE, with no read
+        before it: it only applies if the status differs, the order is at one
+        of expected_versions (from If-Match) and belongs to user_id, when
+        those are given. Otherwise it raises OrderAccessDeniedError or
+        PreconditionFailedError, or returns the order unchanged if it is
+        already in that status.
+        """
+        if order_data.status is None:
+            order = self.repository.get_with_items(order_id)
+            if order is None:
+                return None
+            self._check_unchanged_order(order, expected_versions, user_id)
+            return OrderResponse.model_validate(order), order.version
         
-        if not update_data:
-            return OrderResponse.model_validate(current_order)
+        changed, order = self.repository.transition_status(
+            order_id, None, order_data.status, expected_versions, user_id
+        )
+        if order is None:
+            return None
+        if not changed:
+            self._check_unchanged_order(order, expected_versions, user_id)
+            if order.status != order_data.status:
+                # Another writer moved it on between the UPDATE and the read
+                raise OrderStatusConflictError(order.status)
+            return OrderResponse.model_validate(order), order.version
         
-        # Check if status is being updated
-        status_changed = 'status' in update_data and update_data['status'] != current_order.status
+        return self._changed(order, user_email)
+    
+    def transition_status(
+        self,
+        order_id: int,
+        from_status: str,
+        to_status: str,
+        user_email: Optional[str] = None,
+        expected_versions: Optional[Set[int]] = None,
+        user_id: Optional[str] = None,
+    ) -> Optional[Tuple[OrderResponse, int]]:
+        """Move an order from from_status to to_status, returning it with its new version
         
-        updated_order = self.repository.update(order_id, **update_data)
-        if not updated_order:
+        Returns None if the order does not exist, raises
+        OrderAccessDeniedError if it does not belong to user_id (when given),
+        PreconditionFailedError if it is not at one of expected_versions and
+        OrderStatusConflictError if its status is no longer from_status.
+        The status event is only published when the row actually changed.
+        """
+        changed, order = self.repository.transition_status(
+            order_id, from_status, to_status, expected_versions, user_id
+        )
+        if order is None:
             return None
+        if not changed:
+            self._check_unchanged_order(order, expected_versions, user_id)
+            raise OrderStatusConflictError(order.status)
         
-        order_response = OrderResponse.model_validate(updated_order)
-        
-        # Publish order updated event if status changed
-        if status_changed and self.notification_service and user_email:
-            items_data = [
-                {
-                    "product_id": item.product_id,
-                    "quantity": item.quantity,
-                    "price_at_order": str(item.price_at_order)
-                }
-                for item in order_response.items
-            ]
-            
-            self.notification_service.publish_order_event(
-                order_id=order_response.order_id,
-                user_id=order_response.user_id,
-                user_email=user_email,
-                status=order_response.status,
-                order_total=order_response.order_total,
-                items=items_data,
-                created_at=order_response.created_at.isoformat()
-            )
+        return self._changed(order, user_email)
+    
+    @staticmethod
+    def _check_unchanged_order(order, expected_versions: Optional[Set[int]], user_id: Optional[str]):
+        """Raise the reason an order a compare-and-set left alone was not ours to change"""
+        if user_id is not None and str(order.user_id) != user_id:
+            raise OrderAccessDeniedError("Not allowed to access another user's resources")
+        if expected_versions is not None and order.version not in expected_versions:
+            raise PreconditionFailedError(version_etag(order.version))
+    
+    def _changed(self, order, user_email: Optional[str]) -> Tuple[OrderResponse, int]:
+        """Response and version of an order whose status just changed, publishing the event"""
+        order_response = OrderResponse.model_validate(order)
         
-        return order_response
+        # Publish order updated event
+        if user_email:
+            self._publish_order_event(order_response, user_email)
+        
+        return order_response, order.version
     
-    def delete_order(self, order_id: int) -> bool:
-        """Delete an order"""
-        return self.repository.delete(order_id)
+    def _publish_order_event(self, order_response: OrderResponse, user_email: str):
+        """Publish the order's current state to SNS, if notifications are enabled"""
+        if not self.notification_service:
+            return
+        items_data = [
+            {
+                "product_id": item.product_id,
+                "quantity": item.quantity,
+                "price_at_order": str(item.price_at_order)
+            }
+            for item in order_response.items
+        ]
+        
+        self.notification_service.publish_order_event(
+            order_id=order_response.order_id,
+            user_id=order_response.user_id,
+            user_email=user_email,
+            status=order_response.status,
+            order_total=order_response.order_total,
+            items=items_data,
+            created_at=order_response.created_at.isoformat()
+        )
+    
+    def delete_order(self, order_id: int, expected_versions: Optional[Set[int]] = None) -> bool:
+        """Delete an order, if it is at one of expected_versions when given
+        
+        Returns False if it does not exist and raises PreconditionFailedError
+        if it is at another version.
+        """
+        if self.repository.delete(order_id, expected_versions):
+            return True
+        if expected_versions is not None:
+            order = self.repository.get_current(order_id)
+            if order is not None:
+                raise PreconditionFailedError(version_etag(order.version))
+        return False
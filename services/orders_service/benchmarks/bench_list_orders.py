@@ -0,0 +1,224 @@
+"""Benchmark for GET /orders and GET /orders/user/{user_id} with 100-row pages
+
+Seeds a throwaway SQLite database, then compares the stages of building a
+page the old way (ORM orders with lazily loaded items, ``model_validate``,
+FastAPI's response_model validation and JSON encoder) with the current path
+(projected columns with one items query, plain dicts, orjson), and
+times both endpoints end to end, with and without ``?fields=`` (no items).
+
+    python benchmarks/bench_list_orders.py --rows 20000 --iterations 200
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/bench.db"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import Column, Integer, Table, insert  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.models.base import Base, SessionLocal, engine  # noqa: E402
+from app.models.order import Order  # noqa: E402
+from app.models.order_item import OrderItem  # noqa: E402
+from app.models.product import Product  # noqa: E402
+from app.repositories.order_repository import OrderRepository  # noqa: E402
+from app.responses import FastJSONResponse  # noqa: E402
+from app.schemas.order import OrderResponse  # noqa: E402
+from app.services.order_service import build_order_responses  # noqa: E402
+
+PAGE_SIZE = 100
+ITEMS_PER_ORDER = 3
+ORDERS_PER_USER = 200
+# What an order history page needs
+SUMMARY_FIELDS = "order_id,status,order_total,created_at"
+
+# users belong to another service; stub the table so create_all can resolve
+# the foreign key
+Table("users", Base.metadata, Column("user_id", Integer, primary_key=True))
+
+
+def seed(rows: int):
+    Base.metadata.create_all(engine)
+    now = datetime.utcnow()
+    users = max(1, rows // ORDERS_PER_USER)
+    with engine.begin() as conn:
+        conn.execute(insert(Base.metadata.tables["users"]), [{"user_id": i} for i in range(1, users + 1)])
+        conn.execute(insert(Product), [
+            {"product_id": i, "sku": f"SKU-{i}", "name": f"Product {i}", "price": Decimal("19.99")}
+            for i in range(1, 1001)
+        ])
+        orders, items = [], []
+        for order_id in range(1, rows + 1):
+            orders.append({
+                "order_id": order_id,
+                "user_id": order_id % users + 1,
+                "status": "PAID",
+                "order_total": Decimal("59.97"),
+                "created_at": now - timedelta(minutes=order_id),
+            })
+            for position in range(ITEMS_PER_ORDER):
+                items.append({
+                    "order_id": order_id,
+                    "product_id": (order_id * 7 + position) % 1000 + 1,
+                    "quantity": 1,
+                    "price_at_order": Decimal("19.99"),
+                })
+            if len(orders) == 1000:
+                conn.execute(insert(Order).values(orders))
+                conn.execute(insert(OrderItem).values(items))
+                orders, items = [], []
+        if orders:
+            conn.execute(insert(Order).values(orders))
+            conn.execute(insert(OrderItem).values(items))
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def time_it(fn: Callable, iterations: int) -> Dict[str, float]:
+    fn()  # warm-up
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+    }
+
+
+def bench_stages(rows: int, iterations: int) -> Dict[str, Dict[str, float]]:
+    adapter = TypeAdapter(List[OrderResponse])
+    pages = max(1, rows // PAGE_SIZE)
+    counter = iter(range(10 ** 9))
+
+    def next_skip() -> int:
+        return (next(counter) % pages) * PAGE_SIZE
+
+    def old_query():
+        with SessionLocal() as db:
+            orders = db.query(Order).offset(next_skip()).limit(PAGE_SIZE).all()
+            # Touch the lazy relationship like model_validate does: one query per order
+            return [(order, list(order.items)) for order in orders]
+
+    def new_query():
+        with SessionLocal() as db:
+            return OrderRepository(db).list_orders(next_skip(), PAGE_SIZE)
+
+    db = SessionLocal()
+    orm_orders = db.query(Order).order_by(Order.order_id).limit(PAGE_SIZE).all()
+    for order in orm_orders:
+        order.items
+    projected = OrderRepository(db).list_orders(0, PAGE_SIZE)
+    validated = [OrderResponse.model_validate(order) for order in orm_orders]
+    constructed = build_order_responses(projected)
+
+    def old_serialize():
+        # What FastAPI does for response_model=List[OrderResponse]
+        content = adapter.validate_python([order.model_dump() for order in validated])
+        return json.dumps(adapter.dump_python(content, mode="json")).encode()
+
+    assert json.loads(old_serialize()) == json.loads(FastJSONResponse(constructed).body)
+
+    result = {
+        "query (ORM + lazy items)": time_it(old_query, iterations),
+        "query (projected + IN)": time_it(new_query, iterations),
+        "build (model_validate)": time_it(
+            lambda: [OrderResponse.model_validate(order) for order in orm_orders], iterations
+        ),
+        "build (dicts)": time_it(lambda: build_order_responses(projected), iterations),
+        "serialize (response_model)": time_it(old_serialize, iterations),
+        "serialize (orjson)": time_it(lambda: FastJSONResponse(constructed).body, iterations),
+    }
+    db.close()
+    return result
+
+
+def bench_endpoints(rows: int, iterations: int) -> Dict[str, Dict[str, float]]:
+    client = TestClient(app)
+    pages = max(1, rows // PAGE_SIZE)
+    users = max(1, rows // ORDERS_PER_USER)
+    state = {"page": 0, "user": 0}
+
+    def list_orders():
+        state["page"] = (state["page"] + 1) % pages
+        response = client.get("/orders", params={"skip": state["page"] * PAGE_SIZE, "limit": PAGE_SIZE})
+        assert response.status_code == 200 and len(response.json()) == PAGE_SIZE
+
+    def user_orders():
+        state["user"] = state["user"] % users + 1
+        response = client.get(f"/orders/user/{state['user']}", params={"limit": PAGE_SIZE})
+        assert response.status_code == 200
+
+    def list_orders_sparse():
+        state["page"] = (state["page"] + 1) % pages
+        response = client.get("/orders", params={
+            "skip": state["page"] * PAGE_SIZE, "limit": PAGE_SIZE, "fields": SUMMARY_FIELDS,
+        })
+        assert response.status_code == 200 and "items" not in response.json()[0]
+
+    def user_orders_sparse():
+        state["user"] = state["user"] % users + 1
+        response = client.get(
+            f"/orders/user/{state['user']}", params={"limit": PAGE_SIZE, "fields": SUMMARY_FIELDS}
+        )
+        assert response.status_code == 200
+
+    results = {}
+    for name, fn in (
+        ("GET /orders", list_orders),
+        ("GET /orders?fields=", list_orders_sparse),
+        ("GET /orders/user/{id}", user_orders),
+        ("GET /orders/user/{id}?fields=", user_orders_sparse),
+    ):
+        results[name] = time_it(fn, iterations)
+        results[name]["requests_per_sec"] = 1000 / results[name]["mean_ms"]
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the order list endpoints with 100-row pages")
+    parser.add_argument("--rows", type=int, default=10_000, help="Orders to seed (default: 10000)")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    seed(args.rows)
+    result = {
+        "rows": args.rows,
+        "stages": bench_stages(args.rows, args.iterations),
+        "endpoints": bench_endpoints(args.rows, args.iterations),
+    }
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return 0
+    print(f"{'Stage':<30}{'mean':>10}{'p50':>10}{'p95':>10}  (ms per {PAGE_SIZE}-order page)")
+    for stage, timing in result["stages"].items():
+        print(f"{stage:<30}{timing['mean_ms']:>10.3f}{timing['p50_ms']:>10.3f}{timing['p95_ms']:>10.3f}")
+    for name, timing in result["endpoints"].items():
+        print(
+            f"{name:<30}{timing['mean_ms']:>10.3f}{timing['p50_ms']:>10.3f}"
+            f"{timing['p95_ms']:>10.3f}  {timing['requests_per_sec']:.0f} req/s"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
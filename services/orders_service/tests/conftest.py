@@ -0,0 +1,91 @@
+"""Shared fixtures: a throwaway SQLite database and locally minted access tokens
+
+Configuration is read when ``app`` is first imported, so the environment is
+set here before any test module imports it.
+"""
+import json
+import os
+import tempfile
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+
+_signing_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+_jwk = json.loads(RSAAlgorithm.to_jwk(_signing_key.public_key()))
+_jwk.update({"kid": "test-1", "alg": "RS256", "use": "sig"})
+
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/orders-test.db"
+os.environ["AUTH_ENABLED"] = "true"
+os.environ["AUTH_JWKS"] = json.dumps({"keys": [_jwk]})
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import Column, Integer, Table, event, insert  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.models.base import Base, engine  # noqa: E402
+from app.models.product import Product  # noqa: E402
+
+# users belong to another service; stub the table so create_all can resolve
+# the foreign key
+users = Table("users", Base.metadata, Column("user_id", Integer, primary_key=True))
+
+
+@event.listens_for(engine, "connect")
+def enforce_foreign_keys(dbapi_connection, connection_record):
+    # SQLite ignores foreign keys unless asked; MySQL always enforces them
+    dbapi_connection.execute("PRAGMA foreign_keys=ON")
+
+CUSTOMER_A = 1
+CUSTOMER_B = 2
+
+
+def make_token(user_id, role: str = "customer") -> str:
+    now = int(time.time())
+    claims = {
+        "sub": str(user_id),
+        "role": role,
+        "iss": "users-service",
+        "aud": "ecommerce",
+        "iat": now,
+        "exp": now + 300,
+    }
+    return jwt.encode(claims, _signing_key, algorithm="RS256", headers={"kid": "test-1"})
+
+
+def auth_headers(user_id, role: str = "customer") -> dict:
+    return {"Authorization": f"Bearer {make_token(user_id, role)}"}
+
+
+@pytest.fixture(autouse=True)
+def database():
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(users), [{"user_id": CUSTOMER_A}, {"user_id": CUSTOMER_B}])
+        conn.execute(insert(Product), [{"product_id": 1, "sku": "SKU-1", "name": "Product 1", "price": "9.99"}])
+    yield
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def create_order(client):
+    def create(user_id: int) -> dict:
+        response = client.post(
+            "/orders",
+            json={
+                "order_data": {"user_id": user_id, "items": [{"product_id": 1, "quantity": 2}]},
+                "user_email": "customer@example.com",
+            },
+            headers=auth_headers(user_id),
+        )
+        assert response.status_code == 201, response.text
+        return response.json()
+    return create
@@ -0,0 +1,34 @@
+import gzip
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select
+
+from app.archive_orders import archive_orders
+from app.models.base import engine
+from app.models.shipment import Shipment
+from tests.conftest import CUSTOMER_A
+
+
+def test_archive_keeps_shipments_deleted_by_the_cascade(create_order, tmp_path):
+    shipped = create_order(CUSTOMER_A)
+    unshipped = create_order(CUSTOMER_A)
+    with engine.begin() as conn:
+        conn.execute(insert(Shipment), [{
+            "shipment_id": 7, "order_id": shipped["order_id"], "carrier": "UPS",
+            "tracking_number": "1Z999", "status": "DELIVERED", "shipped_at": datetime(2024, 1, 2),
+        }])
+
+    stats = archive_orders(datetime.utcnow() + timedelta(days=1), str(tmp_path), pause=0)
+
+    assert (stats["orders"], stats["shipments"]) == (2, 1)
+    with gzip.open(stats["file"]) as archive:
+        archived = {order["order_id"]: order for order in map(json.loads, archive)}
+    assert archived[shipped["order_id"]]["shipments"] == [{
+        "shipment_id": 7, "order_id": shipped["order_id"], "carrier": "UPS",
+        "tracking_number": "1Z999", "status": "DELIVERED", "shipped_at": "2024-01-02T00:00:00",
+    }]
+    assert archived[unshipped["order_id"]]["shipments"] == []
+    assert len(archived[shipped["order_id"]]["items"]) == 1
+    with engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(Shipment)).scalar() == 0
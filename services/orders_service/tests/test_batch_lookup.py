@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import event
+
+from app.models.base import engine
+from tests.conftest import CUSTOMER_A, CUSTOMER_B, auth_headers
+
+
+@pytest.fixture
+def statements():
+    """SQL statements run while the test is active"""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(engine, "before_cursor_execute", record)
+
+
+def lookup(client, order_ids, headers):
+    return client.post("/orders/batch", json={"order_ids": order_ids}, headers=headers)
+
+
+def test_lookup_keeps_the_requested_order_in_two_queries(client, create_order, statements):
+    first = create_order(CUSTOMER_A)["order_id"]
+    second = create_order(CUSTOMER_A)["order_id"]
+    statements.clear()
+
+    response = lookup(client, [second, 999, first, second], auth_headers(CUSTOMER_A))
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [order["order_id"] for order in body["orders"]] == [second, first]
+    assert all(len(order["items"]) == 1 for order in body["orders"])
+    assert body["missing_order_ids"] == [999]
+    assert len(statements) == 2
+
+
+def test_another_users_order_is_reported_missing(client, create_order):
+    own = create_order(CUSTOMER_A)["order_id"]
+    foreign = create_order(CUSTOMER_B)["order_id"]
+
+    response = lookup(client, [foreign, own], auth_headers(CUSTOMER_A))
+
+    assert response.status_code == 200
+    assert [order["order_id"] for order in response.json()["orders"]] == [own]
+    assert response.json()["missing_order_ids"] == [foreign]
+
+
+def test_service_token_looks_up_any_users_orders(client, create_order):
+    orders = [create_order(CUSTOMER_A)["order_id"], create_order(CUSTOMER_B)["order_id"]]
+
+    response = lookup(client, orders, auth_headers("worker", role="service"))
+
+    assert [order["order_id"] for order in response.json()["orders"]] == orders
+    assert response.json()["missing_order_ids"] == []
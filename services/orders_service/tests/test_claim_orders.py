@@ -0,0 +1,58 @@
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.config import settings
+from app.routers.orders import require_service_token
+from tests.conftest import CUSTOMER_A, CUSTOMER_B, auth_headers
+
+SERVICE = auth_headers("fulfilment", role="service")
+
+
+def pay(client, order_id: int):
+    response = client.post(
+        f"/orders/{order_id}/transition",
+        json={"from_status": "PENDING", "to_status": "PAID"},
+        headers=SERVICE,
+    )
+    assert response.status_code == 200
+
+
+def claim(client, worker_id: str, limit: int = 2, headers=SERVICE):
+    return client.post("/orders/claim", json={"status": "PAID", "limit": limit, "worker_id": worker_id}, headers=headers)
+
+
+def test_service_token_claims_disjoint_batches(client, create_order):
+    order_ids = [create_order(user_id)["order_id"] for user_id in (CUSTOMER_A, CUSTOMER_B, CUSTOMER_A)]
+    for order_id in order_ids:
+        pay(client, order_id)
+
+    first = claim(client, "worker-1")
+    second = claim(client, "worker-2")
+    third = claim(client, "worker-3")
+
+    assert first.status_code == 200
+    assert [order["order_id"] for order in first.json()["orders"]] == order_ids[:2]
+    assert [order["order_id"] for order in second.json()["orders"]] == order_ids[2:]
+    assert third.json()["orders"] == []
+    assert first.json()["orders"][0]["items"]
+
+
+def test_customer_token_cannot_claim(client, create_order):
+    pay(client, create_order(CUSTOMER_A)["order_id"])
+    assert claim(client, "worker-1", headers=auth_headers(CUSTOMER_A)).status_code == 403
+    assert claim(client, "worker-1").json()["orders"]
+
+
+def test_claim_needs_a_token(client):
+    assert claim(client, "worker-1", headers={}).status_code == 401
+
+
+def test_claim_without_auth_is_refused_outside_dev(monkeypatch):
+    request = Request({"type": "http", "state": {}})
+    monkeypatch.setattr(settings, "ENVIRONMENT", "prod")
+    with pytest.raises(HTTPException) as error:
+        require_service_token(request)
+    assert error.value.status_code == 403
+    monkeypatch.setattr(settings, "ENVIRONMENT", "dev")
+    require_service_token(request)
@@ -0,0 +1,94 @@
+from app.services.order_service import OrderService
+from tests.conftest import CUSTOMER_A, CUSTOMER_B, auth_headers
+
+
+def with_headers(user_id, **headers) -> dict:
+    return {**auth_headers(user_id), **headers}
+
+
+def test_get_returns_the_version_etag(client, create_order):
+    order = create_order(CUSTOMER_A)
+    response = client.get(f"/orders/{order['order_id']}", headers=auth_headers(CUSTOMER_A))
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"v1"'
+
+
+def test_get_with_current_etag_is_304_without_loading_the_order(client, create_order, monkeypatch):
+    order = create_order(CUSTOMER_A)
+    etag = client.get(f"/orders/{order['order_id']}", headers=auth_headers(CUSTOMER_A)).headers["ETag"]
+
+    def fail(*args, **kwargs):
+        raise AssertionError("a 304 must not load the order")
+
+    monkeypatch.setattr(OrderService, "get_order", fail)
+    response = client.get(f"/orders/{order['order_id']}", headers=with_headers(CUSTOMER_A, **{"If-None-Match": etag}))
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+
+
+def test_if_none_match_still_checks_ownership(client, create_order):
+    order = create_order(CUSTOMER_B)
+    response = client.get(f"/orders/{order['order_id']}", headers=with_headers(CUSTOMER_A, **{"If-None-Match": '"v1"'}))
+    assert response.status_code == 403
+
+
+def test_get_after_a_change_returns_the_new_etag(client, create_order):
+    order = create_order(CUSTOMER_A)
+    client.put(f"/orders/{order['order_id']}", json={"order_data": {"status": "PAID"}}, headers=auth_headers(CUSTOMER_A))
+
+    response = client.get(f"/orders/{order['order_id']}", headers=with_headers(CUSTOMER_A, **{"If-None-Match": '"v1"'}))
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"v2"'
+    assert response.json()["status"] == "PAID"
+
+
+def test_update_with_current_if_match_bumps_the_version(client, create_order):
+    order = create_order(CUSTOMER_A)
+    response = client.put(
+        f"/orders/{order['order_id']}",
+        json={"order_data": {"status": "PAID"}},
+        headers=with_headers(CUSTOMER_A, **{"If-Match": '"v1"'}),
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"v2"'
+
+
+def test_update_with_stale_if_match_is_412_with_current_etag(client, create_order):
+    order = create_order(CUSTOMER_A)
+    client.put(f"/orders/{order['order_id']}", json={"order_data": {"status": "PAID"}}, headers=auth_headers(CUSTOMER_A))
+
+    response = client.put(
+        f"/orders/{order['order_id']}",
+        json={"order_data": {"status": "SHIPPED"}},
+        headers=with_headers(CUSTOMER_A, **{"If-Match": '"v1"'}),
+    )
+    assert response.status_code == 412
+    assert response.headers["ETag"] == '"v2"'
+    current = client.get(f"/orders/{order['order_id']}", headers=auth_headers(CUSTOMER_A)).json()
+    assert current["status"] == "PAID"
+
+
+def test_transition_with_stale_if_match_is_412(client, create_order):
+    order = create_order(CUSTOMER_A)
+    client.put(f"/orders/{order['order_id']}", json={"order_data": {"status": "PAID"}}, headers=auth_headers(CUSTOMER_A))
+
+    response = client.post(
+        f"/orders/{order['order_id']}/transition",
+        json={"from_status": "PAID", "to_status": "SHIPPED"},
+        headers=with_headers(CUSTOMER_A, **{"If-Match": '"v1"'}),
+    )
+    assert response.status_code == 412
+    assert response.headers["ETag"] == '"v2"'
+
+
+def test_delete_honours_if_match(client, create_order):
+    order = create_order(CUSTOMER_A)
+    client.put(f"/orders/{order['order_id']}", json={"order_data": {"status": "PAID"}}, headers=auth_headers(CUSTOMER_A))
+
+    stale = client.delete(f"/orders/{order['order_id']}", headers=with_headers(CUSTOMER_A, **{"If-Match": '"v1"'}))
+    assert stale.status_code == 412
+    assert stale.headers["ETag"] == '"v2"'
+
+    current = client.delete(f"/orders/{order['order_id']}", headers=with_headers(CUSTOMER_A, **{"If-Match": '"v2"'}))
+    assert current.status_code == 204
+    assert client.get(f"/orders/{order['order_id']}", headers=auth_headers(CUSTOMER_A)).status_code == 404
@@ -0,0 +1,34 @@
+from tests.conftest import CUSTOMER_A, auth_headers
+
+UNKNOWN_USER = 99
+
+
+def post_order(client, user_id, key):
+    return client.post(
+        "/orders",
+        json={
+            "order_data": {"user_id": user_id, "items": [{"product_id": 1, "quantity": 1}]},
+            "user_email": "customer@example.com",
+        },
+        headers={**auth_headers(user_id), "Idempotency-Key": key},
+    )
+
+
+def test_retry_replays_first_response(client):
+    first = post_order(client, CUSTOMER_A, "key-1")
+    assert first.status_code == 201
+
+    retry = post_order(client, CUSTOMER_A, "key-1")
+    assert retry.status_code == 201
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json()["order_id"] == first.json()["order_id"]
+
+
+def test_order_constraint_violation_is_not_treated_as_key_race(client):
+    # The order insert fails on the users foreign key; no key row exists,
+    # so this must be a client error rather than a replay or a 500
+    response = post_order(client, UNKNOWN_USER, "key-2")
+    assert response.status_code == 422
+
+    # The session was rolled back, so the next request on it still works
+    assert post_order(client, CUSTOMER_A, "key-2").status_code == 201
@@ -0,0 +1,72 @@
+from tests.conftest import CUSTOMER_A, CUSTOMER_B, auth_headers
+
+
+def test_customer_cannot_read_another_users_order(client, create_order):
+    order = create_order(CUSTOMER_B)
+    response = client.get(f"/orders/{order['order_id']}", headers=auth_headers(CUSTOMER_A))
+    assert response.status_code == 403
+
+
+def test_customer_cannot_update_another_users_order(client, create_order):
+    order = create_order(CUSTOMER_B)
+    response = client.put(
+        f"/orders/{order['order_id']}", json={"order_data": {"status": "SHIPPED"}}, headers=auth_headers(CUSTOMER_A)
+    )
+    assert response.status_code == 403
+    owner_view = client.get(f"/orders/{order['order_id']}", headers=auth_headers(CUSTOMER_B))
+    assert owner_view.json()["status"] == "PENDING"
+
+
+def test_customer_cannot_transition_another_users_order(client, create_order):
+    order = create_order(CUSTOMER_B)
+    response = client.post(
+        f"/orders/{order['order_id']}/transition",
+        json={"from_status": "PENDING", "to_status": "PAID"},
+        headers=auth_headers(CUSTOMER_A),
+    )
+    assert response.status_code == 403
+
+
+def test_customer_cannot_delete_another_users_order(client, create_order):
+    order = create_order(CUSTOMER_B)
+    response = client.delete(f"/orders/{order['order_id']}", headers=auth_headers(CUSTOMER_A))
+    assert response.status_code == 403
+    assert client.get(f"/orders/{order['order_id']}", headers=auth_headers(CUSTOMER_B)).status_code == 200
+
+
+def test_customer_can_change_own_order(client, create_order):
+    order = create_order(CUSTOMER_A)
+    response = client.post(
+        f"/orders/{order['order_id']}/transition",
+        json={"from_status": "PENDING", "to_status": "PAID"},
+        headers=auth_headers(CUSTOMER_A),
+    )
+    assert response.status_code == 200
+    assert client.delete(f"/orders/{order['order_id']}", headers=auth_headers(CUSTOMER_A)).status_code == 204
+
+
+def test_missing_order_is_404_not_403(client):
+    response = client.put("/orders/999", json={"order_data": {"status": "PAID"}}, headers=auth_headers(CUSTOMER_A))
+    assert response.status_code == 404
+
+
+def test_list_all_orders_needs_privileged_token(client, create_order):
+    create_order(CUSTOMER_A)
+    create_order(CUSTOMER_B)
+    assert client.get("/orders", headers=auth_headers(CUSTOMER_A)).status_code == 403
+    response = client.get("/orders", headers=auth_headers("worker", role="service"))
+    assert response.status_code == 200
+    assert {order["user_id"] for order in response.json()} == {CUSTOMER_A, CUSTOMER_B}
+
+
+def test_service_token_may_update_any_order(client, create_order):
+    order = create_order(CUSTOMER_B)
+    response = client.put(
+        f"/orders/{order['order_id']}", json={"order_data": {"status": "PAID"}}, headers=auth_headers("worker", role="service")
+    )
+    assert response.status_code == 200
+
+
+def test_requests_without_token_are_rejected(client, create_order):
+    order = create_order(CUSTOMER_A)
+    assert client.get(f"/orders/{order['order_id']}").status_code == 401
@@ -0,0 +1,84 @@
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event, insert, update
+
+from app.models.base import engine
+from app.models.product import Product
+from app.price_cache import product_price_cache
+from tests.conftest import CUSTOMER_A, auth_headers
+
+
+@pytest.fixture(autouse=True)
+def empty_price_cache():
+    product_price_cache.invalidate()
+    yield
+    product_price_cache.invalidate()
+
+
+@pytest.fixture
+def product_queries():
+    """Statements run against the products table"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "FROM products" in statement:
+            statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(engine, "before_cursor_execute", record)
+
+
+def post_order(client, *items):
+    return client.post(
+        "/orders",
+        json={
+            "order_data": {"user_id": CUSTOMER_A, "items": list(items)},
+            "user_email": "customer@example.com",
+        },
+        headers=auth_headers(CUSTOMER_A),
+    )
+
+
+def test_client_price_is_replaced_by_the_product_price(client):
+    response = post_order(client, {"product_id": 1, "quantity": 2, "price_at_order": "1.00"})
+    assert response.status_code == 201, response.text
+    order = response.json()
+    assert Decimal(order["items"][0]["price_at_order"]) == Decimal("9.99")
+    assert Decimal(order["order_total"]) == Decimal("19.98")
+
+
+def test_unknown_product_is_422(client):
+    response = post_order(client, {"product_id": 1, "quantity": 1}, {"product_id": 42, "quantity": 1})
+    assert response.status_code == 422
+
+
+def test_all_lines_are_priced_with_one_query(client, product_queries):
+    with engine.begin() as conn:
+        conn.execute(insert(Product), [{"product_id": 2, "sku": "SKU-2", "name": "Product 2", "price": "5.00"}])
+
+    response = post_order(client, {"product_id": 1, "quantity": 1}, {"product_id": 2, "quantity": 3})
+    assert response.status_code == 201, response.text
+    assert Decimal(response.json()["order_total"]) == Decimal("24.99")
+    assert len(product_queries) == 1
+
+
+def test_cached_prices_cost_no_query(client, product_queries):
+    assert post_order(client, {"product_id": 1, "quantity": 1}).status_code == 201
+    product_queries.clear()
+
+    assert post_order(client, {"product_id": 1, "quantity": 1}).status_code == 201
+    assert product_queries == []
+
+
+def test_differing_client_price_refetches_a_changed_price(client, product_queries):
+    assert post_order(client, {"product_id": 1, "quantity": 1}).status_code == 201
+    with engine.begin() as conn:
+        conn.execute(update(Product).where(Product.product_id == 1).values(price="12.00"))
+    product_queries.clear()
+
+    response = post_order(client, {"product_id": 1, "quantity": 1, "price_at_order": "12.00"})
+    assert response.status_code == 201, response.text
+    assert Decimal(response.json()["order_total"]) == Decimal("12.00")
+    assert len(product_queries) == 1
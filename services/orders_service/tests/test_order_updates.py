@@ -0,0 +1,98 @@
+import pytest
+from sqlalchemy import event
+
+from app.models.base import engine
+from app.routers import orders
+from tests.conftest import CUSTOMER_A, CUSTOMER_B, auth_headers
+
+
+class RecordingNotificationService:
+    """Stands in for NotificationService, keeping the published statuses"""
+    published = []
+
+    def publish_order_event(self, **event):
+        self.published.append((event["order_id"], event["status"]))
+
+
+@pytest.fixture
+def published(monkeypatch):
+    RecordingNotificationService.published = []
+    monkeypatch.setattr(orders, "NotificationService", RecordingNotificationService)
+    return RecordingNotificationService.published
+
+
+@pytest.fixture
+def statements():
+    """SQL statements run while the test is active"""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(engine, "before_cursor_execute", record)
+
+
+def put_status(client, order_id, new_status, user_id=CUSTOMER_A):
+    return client.put(
+        f"/orders/{order_id}",
+        json={"order_data": {"status": new_status}, "user_email": "customer@example.com"},
+        headers=auth_headers(user_id),
+    )
+
+
+def transition(client, order_id, from_status, to_status):
+    return client.post(
+        f"/orders/{order_id}/transition",
+        json={"from_status": from_status, "to_status": to_status, "user_email": "customer@example.com"},
+        headers=auth_headers(CUSTOMER_A),
+    )
+
+
+def test_status_update_is_one_update_and_one_read(client, create_order, published, statements):
+    order_id = create_order(CUSTOMER_A)["order_id"]
+    published.clear()
+    statements.clear()
+
+    response = put_status(client, order_id, "PAID")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "PAID"
+    assert response.headers["ETag"] == '"v2"'
+    assert [statement.split()[0] for statement in statements] == ["UPDATE", "SELECT"]
+    assert published == [(order_id, "PAID")]
+
+
+def test_update_to_the_current_status_changes_nothing(client, create_order, published):
+    order_id = create_order(CUSTOMER_A)["order_id"]
+    published.clear()
+
+    response = put_status(client, order_id, "PENDING")
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] == '"v1"'
+    assert published == []
+
+
+def test_transition_that_lost_the_race_is_409_without_an_event(client, create_order, published):
+    order_id = create_order(CUSTOMER_A)["order_id"]
+    published.clear()
+    assert transition(client, order_id, "PENDING", "PAID").status_code == 200
+
+    response = transition(client, order_id, "PENDING", "SHIPPED")
+
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Order status is PAID"
+    assert published == [(order_id, "PAID")]
+
+
+def test_update_of_another_users_order_is_403_and_changes_nothing(client, create_order, published):
+    order_id = create_order(CUSTOMER_B)["order_id"]
+    published.clear()
+
+    assert put_status(client, order_id, "PAID").status_code == 403
+    assert published == []
+    owner_view = client.get(f"/orders/{order_id}", headers=auth_headers(CUSTOMER_B))
+    assert owner_view.json()["status"] == "PENDING"
+    assert owner_view.headers["ETag"] == '"v1"'
@@ -0,0 +1,38 @@
+import logging
+
+from sqlalchemy import create_engine, event, text
+
+from app.models.base import engine
+from app.query_cache import QUERY_NAME_OPTION, warm_statements
+from tests.conftest import CUSTOMER_A, auth_headers
+
+
+def test_warm_up_continues_past_an_unreachable_engine(tmp_path, caplog):
+    unreachable = create_engine(f"sqlite:///{tmp_path}/missing-dir/replica.db")
+    reachable = create_engine(f"sqlite:///{tmp_path}/primary.db")
+    statements = [(text("SELECT :value"), {"value": 1})]
+
+    with caplog.at_level(logging.INFO, logger="app.query_cache"):
+        warm_statements([unreachable, reachable], statements)
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert any("warm-up failed" in message and "replica.db" in message for message in messages)
+    assert any("on 1 engine(s)" in message for message in messages)
+
+
+def test_get_order_loads_its_items_with_one_named_query(client, create_order):
+    order_id = create_order(CUSTOMER_A)["order_id"]
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(context.execution_options.get(QUERY_NAME_OPTION))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.get(f"/orders/{order_id}", headers=auth_headers(CUSTOMER_A))
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == 1
+    assert executed == ["orders.get_by_id"]
@@ -0,0 +1,85 @@
+import tempfile
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine, insert, update
+
+from app.db_routing import configure_routing
+from app.models.base import Base, engine
+from app.models.order import Order
+from app.models.product import Product
+from app.repositories.order_repository import OrderRepository
+from app.repositories.product_repository import ProductRepository
+from tests.conftest import CUSTOMER_A, users
+
+
+@pytest.fixture
+def replica():
+    """A replica that never catches up: it keeps the order as PENDING"""
+    replica_engine = create_engine(f"sqlite:///{tempfile.mkdtemp()}/orders-replica.db")
+    Base.metadata.create_all(replica_engine)
+    with replica_engine.begin() as conn:
+        conn.execute(insert(users), [{"user_id": CUSTOMER_A}])
+        conn.execute(insert(Product), [{"product_id": 1, "sku": "SKU-1", "name": "Product 1", "price": "9.99"}])
+    yield replica_engine
+    replica_engine.dispose()
+
+
+@pytest.fixture
+def order_id(replica):
+    row = {"order_id": 1, "user_id": CUSTOMER_A, "status": "PENDING", "order_total": "9.99"}
+    for db_engine in (engine, replica):
+        with db_engine.begin() as conn:
+            conn.execute(insert(Order), [row])
+    return 1
+
+
+@pytest.fixture
+def session_class(replica):
+    return configure_routing([replica], stickiness_seconds=5)
+
+
+def request_session(session_class, user_id):
+    session = session_class(bind=engine)
+    session.info["user_id"] = str(user_id)
+    return session
+
+
+def test_reads_go_to_the_replica_without_a_write(session_class, order_id):
+    with request_session(session_class, CUSTOMER_A) as db:
+        assert OrderRepository(db).get_by_id(order_id).status == "PENDING"
+
+
+def test_transition_keeps_the_writers_reads_on_the_primary(session_class, order_id):
+    with request_session(session_class, CUSTOMER_A) as db:
+        changed, _ = OrderRepository(db).transition_status(order_id, "PENDING", "PAID")
+        assert changed
+        assert OrderRepository(db).get_by_id(order_id).status == "PAID"
+
+    # The next request from the same user must not see the write vanish
+    with request_session(session_class, CUSTOMER_A) as db:
+        assert OrderRepository(db).get_by_id(order_id).status == "PAID"
+
+
+def test_transition_by_another_caller_keeps_the_owners_reads_on_the_primary(session_class, order_id):
+    with request_session(session_class, "service-worker") as db:
+        assert OrderRepository(db).transition_status(order_id, "PENDING", "PAID")[0]
+
+    with request_session(session_class, CUSTOMER_A) as db:
+        assert OrderRepository(db).get_by_id(order_id).status == "PAID"
+
+
+def test_delete_keeps_the_writers_reads_on_the_primary(session_class, order_id):
+    with request_session(session_class, CUSTOMER_A) as db:
+        assert OrderRepository(db).delete(order_id)
+
+    with request_session(session_class, CUSTOMER_A) as db:
+        assert OrderRepository(db).get_by_id(order_id) is None
+
+
+def test_checkout_prices_are_read_from_the_primary(session_class):
+    with engine.begin() as conn:
+        conn.execute(update(Product).where(Product.product_id == 1).values(price="12.00"))
+
+    with request_session(session_class, CUSTOMER_A) as db:
+        assert ProductRepository(db).get_prices([1]) == {1: Decimal("12.00")}
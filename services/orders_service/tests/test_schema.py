@@ -0,0 +1,106 @@
+"""Run the orders migration against the DDL in scripts/schema.sql"""
+import re
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from app.migrate_orders_schema import migrate, plan
+
+SCHEMA_SQL = Path(__file__).resolve().parents[3] / "scripts" / "schema.sql"
+ADDED_COLUMNS = ("version", "claimed_by", "claimed_until")
+
+
+def ddl_for(table: str) -> list:
+    """The CREATE TABLE and CREATE INDEX statements for a table in schema.sql"""
+    # Comments may contain semicolons, so drop them before splitting statements
+    ddl = re.sub(r"--[^\n]*", "", SCHEMA_SQL.read_text())
+    statements = [s.strip() for s in ddl.split(";")]
+    return [s for s in statements if re.search(rf"CREATE (TABLE|INDEX \w+ ON) {table}\b", s)]
+
+
+def orders_ddl() -> list:
+    """Everything in schema.sql the orders service depends on"""
+    return ddl_for("orders") + ddl_for("idempotency_keys")
+
+
+def original_orders_ddl() -> list:
+    """schema.sql's orders table as it was before the added columns, indexes and tables"""
+    table = next(s for s in ddl_for("orders") if "CREATE TABLE" in s)
+    lines = [line for line in table.splitlines() if line.split()[:1] not in [[c] for c in ADDED_COLUMNS]]
+    return ["\n".join(lines), "CREATE INDEX idx_status ON orders (status)"]
+
+
+def build(statements: list):
+    db_engine = create_engine("sqlite://")
+    with db_engine.begin() as conn:
+        for statement in statements:
+            conn.execute(text(statement))
+    return db_engine
+
+
+def schema_of(db_engine, table: str = "orders"):
+    inspector = inspect(db_engine)
+    if not inspector.has_table(table):
+        return None
+    return (
+        {column["name"]: str(column["type"]) for column in inspector.get_columns(table)},
+        {index["name"] for index in inspector.get_indexes(table)},
+        inspector.get_pk_constraint(table)["constrained_columns"],
+    )
+
+
+def test_schema_sql_needs_no_migration():
+    assert migrate(build(orders_ddl())) == []
+
+
+@pytest.mark.parametrize("with_idx_status", [True, False])
+def test_migration_brings_the_original_table_to_schema_sql(with_idx_status):
+    statements = original_orders_ddl()
+    if not with_idx_status:
+        statements = statements[:1]
+    db_engine = build(statements)
+    assert not set(ADDED_COLUMNS) & set(schema_of(db_engine)[0])
+    assert schema_of(db_engine, "idempotency_keys") is None
+
+    assert migrate(db_engine)
+    reference = build(orders_ddl())
+    for table in ("orders", "idempotency_keys"):
+        assert schema_of(db_engine, table) == schema_of(reference, table)
+    # Running it again changes nothing
+    assert migrate(db_engine) == []
+
+
+def test_dry_run_changes_nothing():
+    db_engine = build(original_orders_ddl())
+    before = schema_of(db_engine)
+    assert migrate(db_engine, dry_run=True)
+    assert schema_of(db_engine) == before
+    assert schema_of(db_engine, "idempotency_keys") is None
+
+
+def test_missing_index_is_added_to_an_existing_idempotency_table():
+    db_engine = build(original_orders_ddl() + [ddl_for("idempotency_keys")[0]])
+    assert migrate(db_engine) == [
+        "ALTER TABLE orders ADD COLUMN version INT NOT NULL DEFAULT 1",
+        "ALTER TABLE orders ADD COLUMN claimed_by VARCHAR(100) NULL",
+        "ALTER TABLE orders ADD COLUMN claimed_until TIMESTAMP NULL",
+        "CREATE INDEX idx_status_created_at ON orders (status, created_at)",
+        "CREATE INDEX idx_idempotency_keys_expires_at ON idempotency_keys (expires_at)",
+        "DROP INDEX idx_status",
+    ]
+
+
+def test_mysql_index_changes_are_online():
+    statements = plan({"order_id", "user_id", "status"}, {"PRIMARY", "idx_status"}, {"orders"}, "mysql")
+    assert statements[:3] == [
+        "ALTER TABLE orders ADD COLUMN version INT NOT NULL DEFAULT 1",
+        "ALTER TABLE orders ADD COLUMN claimed_by VARCHAR(100) NULL",
+        "ALTER TABLE orders ADD COLUMN claimed_until TIMESTAMP NULL",
+    ]
+    assert statements[3].startswith("CREATE TABLE IF NOT EXISTS idempotency_keys (")
+    assert statements[4:] == [
+        "CREATE INDEX idx_status_created_at ON orders (status, created_at) ALGORITHM=INPLACE LOCK=NONE",
+        "CREATE INDEX idx_idempotency_keys_expires_at ON idempotency_keys (expires_at) ALGORITHM=INPLACE LOCK=NONE",
+        "DROP INDEX idx_status ON orders ALGORITHM=INPLACE LOCK=NONE",
+    ]
@@ -0,0 +1,32 @@
+"""add users fulltext search index
+
+Revision ID: 5c1e9a7d3b42
+Revises: 00e0e2af63a3
+Create Date: 2026-10-19 16:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1e9a7d3b42'
+down_revision: Union[str, None] = '00e0e2af63a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_users_name_address_fulltext',
+        'users',
+        ['name', 'address'],
+        unique=False,
+        mysql_prefix='FULLTEXT'
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_users_name_address_fulltext', table_name='users')
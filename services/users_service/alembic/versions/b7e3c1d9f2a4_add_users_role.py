@@ -0,0 +1,29 @@
+"""add users role
+
+Revision ID: b7e3c1d9f2a4
+Revises: 8d2f4b6a1c90
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e3c1d9f2a4'
+down_revision: Union[str, None] = '8d2f4b6a1c90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'users',
+        sa.Column('role', sa.String(length=20), nullable=False, server_default='customer')
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'role')
@@ -0,0 +1,71 @@
+"""ETags and conditional request headers shared by the orders, users and cart services
+
+ETags are derived from a row version (or, in the cart, item timestamps)
+rather than from the response body, so checking ``If-None-Match`` costs a
+single-column read and a 304 skips loading and serializing the resource.
+``If-Match`` on writes is turned into a condition on the same version, so
+a lost update fails with 412 instead of overwriting a concurrent change.
+"""
+import re
+from typing import List, Optional, Set
+
+from fastapi import HTTPException, Response, status
+
+_VERSION_ETAG = re.compile(r'"v(\d+)"')
+
+
+class PreconditionFailedError(Exception):
+    """Raised when an If-Match header does not name the current version"""
+
+    def __init__(self, etag: Optional[str]):
+        super().__init__("Resource has been modified")
+        self.etag = etag
+
+
+def version_etag(version: int) -> str:
+    """Strong ETag for a row version"""
+    return f'"v{version}"'
+
+
+def parse_etags(header: str) -> List[str]:
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+
+def is_not_modified(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether If-None-Match names the current representation (weak comparison)"""
+    if not if_none_match:
+        return False
+    tags = parse_etags(if_none_match)
+    return "*" in tags or etag.removeprefix("W/") in {tag.removeprefix("W/") for tag in tags}
+
+
+def if_match_etags(if_match: Optional[str]) -> Optional[Set[str]]:
+    """Strong ETags an If-Match header accepts, or None if any version will do"""
+    if not if_match:
+        return None
+    tags = parse_etags(if_match)
+    if "*" in tags:
+        return None
+    # Weak tags never match under If-Match's strong comparison
+    return {tag for tag in tags if not tag.startswith("W/")}
+
+
+def if_match_versions(if_match: Optional[str]) -> Optional[Set[int]]:
+    """Row versions an If-Match header accepts, or None if any version will do"""
+    tags = if_match_etags(if_match)
+    if tags is None:
+        return None
+    return {int(match.group(1)) for match in map(_VERSION_ETAG.fullmatch, tags) if match}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+
+def precondition_failed(e: PreconditionFailedError) -> HTTPException:
+    """412 carrying the current ETag, so the client can refetch or retry"""
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail=str(e),
+        headers={"ETag": e.etag} if e.etag else None,
+    )
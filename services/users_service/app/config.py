@@ -1,16 +1,74 @@
 import os
-import json
 import logging
-import boto3
+from typing import Any, Dict, List, Optional
+
 from botocore.exceptions import ClientError
 
+from app.secret_provider import SecretProvider
+
 logger = logging.getLogger(__name__)
 
 class Settings:
     """Application settings loaded from environment variables"""
     ENVIRONMENT: str = os.environ.get("ENVIRONMENT", "dev")
     LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
-    
+
+    # Database credentials from Secrets Manager (used when DB_* variables are not all set)
+    DB_SECRET_CACHE_TTL: int = int(os.environ.get("DB_SECRET_CACHE_TTL", "300"))
+    # On Lambda, cache the secret in /tmp so init retries skip the round trip
+    DB_SECRET_CACHE_DIR: str = os.environ.get(
+        "DB_SECRET_CACHE_DIR", "/tmp" if os.environ.get("AWS_LAMBDA_FUNCTION_NAME") else ""
+    )
+    db_secret: Optional[SecretProvider] = None
+
+    # Explicit primary URL (e.g. sqlite:///primary.db for local testing) and
+    # comma-separated read replica URLs
+    DATABASE_URL: str = os.environ.get("DATABASE_URL", "")
+    DB_REPLICA_URLS: List[str] = [
+        url.strip() for url in os.environ.get("DB_REPLICA_URLS", "").split(",") if url.strip()
+    ]
+    # Reads stay on the primary this long after a write by the same user
+    DB_READ_STICKINESS_SECONDS: float = float(os.environ.get("DB_READ_STICKINESS_SECONDS", "5"))
+
+    # Connection management: "pool" for containers, "lambda" for one connection
+    # per Lambda container, "auto" picks "lambda" when running on Lambda
+    DB_CONNECTION_MODE: str = os.environ.get("DB_CONNECTION_MODE", "auto")
+    DB_POOL_SIZE: int = int(os.environ.get("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.environ.get("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_RECYCLE: int = int(os.environ.get("DB_POOL_RECYCLE", "300"))
+    DB_POOL_TIMEOUT: int = int(os.environ.get("DB_POOL_TIMEOUT", "30"))
+    DB_PING_IDLE_SECONDS: float = float(os.environ.get("DB_PING_IDLE_SECONDS", "60"))
+    # Run hot statements once at init so their compiled SQL is cached before the first request
+    DB_WARM_UP: bool = os.environ.get(
+        "DB_WARM_UP", "true" if os.environ.get("AWS_LAMBDA_FUNCTION_NAME") else "false"
+    ).lower() == "true"
+    DB_POOL_STATS_INTERVAL: float = float(os.environ.get("DB_POOL_STATS_INTERVAL", "300"))
+
+    # Password hashing
+    BCRYPT_ROUNDS: int = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+    HASH_EXECUTOR: str = os.environ.get("HASH_EXECUTOR", "process")  # process or thread
+    HASH_POOL_WORKERS: int = int(os.environ.get("HASH_POOL_WORKERS", "0"))  # 0 = available cores
+    HASH_QUEUE_LIMIT: int = int(os.environ.get("HASH_QUEUE_LIMIT", "0"))  # 0 = 4 jobs per worker
+    HASH_QUEUE_TIMEOUT: float = float(os.environ.get("HASH_QUEUE_TIMEOUT", "2.0"))
+
+    # Per-request Server-Timing header and timing log line
+    SERVER_TIMING_ENABLED: bool = os.environ.get("SERVER_TIMING_ENABLED", "false").lower() == "true"
+
+    # GET /metrics (Prometheus text format); on Lambda, where nothing scrapes
+    # containers, set METRICS_EMF_ENABLED to log metrics in CloudWatch EMF instead
+    METRICS_ENABLED: bool = os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_EMF_ENABLED: bool = os.environ.get("METRICS_EMF_ENABLED", "false").lower() == "true"
+    METRICS_NAMESPACE: str = os.environ.get("METRICS_NAMESPACE", "ECommerce/Users")
+    # Seconds between EMF flushes (0 = after every request)
+    METRICS_EMF_INTERVAL: float = float(os.environ.get("METRICS_EMF_INTERVAL", "0"))
+
+    # Access tokens
+    AUTH_PRIVATE_KEY: str = os.environ.get("AUTH_PRIVATE_KEY", "")
+    AUTH_PRIVATE_KEY_FILE: str = os.environ.get("AUTH_PRIVATE_KEY_FILE", "")
+    AUTH_KEY_ID: str = os.environ.get("AUTH_KEY_ID", "users-1")
+    AUTH_ISSUER: str = os.environ.get("AUTH_ISSUER", "users-service")
+    AUTH_AUDIENCE: str = os.environ.get("AUTH_AUDIENCE", "ecommerce")
+    AUTH_TOKEN_TTL_SECONDS: int = int(os.environ.get("AUTH_TOKEN_TTL_SECONDS", "3600"))
 
     def __init__(self):
         if self.ENVIRONMENT == "dev":
@@ -26,51 +84,71 @@ class Settings:
         self.DB_PASSWORD = os.environ.get("DB_PASSWORD", "2003")
 
     def load_prod_env_variables(self):
-        # load from secrets manager
+        if self.DATABASE_URL:
+            logger.info("Using database configuration from DATABASE_URL")
+            return
+        self.DB_HOST = os.environ.get("DB_HOST")
+        self.DB_PORT = os.environ.get("DB_PORT")
+        self.DB_NAME = os.environ.get("DB_NAME")
+        self.DB_USER = os.environ.get("DB_USER")
+        self.DB_PASSWORD = os.environ.get("DB_PASSWORD")
+        
+        # If any of the required database settings are missing, use Secrets Manager.
+        # The secret is fetched lazily on the first connection, not at import time.
+        if not all([self.DB_HOST, self.DB_PORT, self.DB_NAME, self.DB_USER, self.DB_PASSWORD]):
+            secret_name = os.environ.get("DB_SECRET_NAME", f"{self.ENVIRONMENT}/rds/credentials")
+            logger.info(f"Database credentials will be read from Secrets Manager secret {secret_name}")
+            self.db_secret = SecretProvider(
+                secret_name,
+                ttl=self.DB_SECRET_CACHE_TTL,
+                cache_dir=self.DB_SECRET_CACHE_DIR or None,
+            )
+        else:
+            logger.info("Using database configuration from environment variables")
+    
+    def db_connect_args(self, refresh: bool = False) -> Dict[str, Any]:
+        """DBAPI connection arguments from the Secrets Manager secret"""
         try:
-            # First try to get from environment variables
-            self.DB_HOST = os.environ.get("DB_HOST")
-            self.DB_PORT = os.environ.get("DB_PORT")
-            self.DB_NAME = os.environ.get("DB_NAME")
-            self.DB_USER = os.environ.get("DB_USER")
-            self.DB_PASSWORD = os.environ.get("DB_PASSWORD")
-            
-            # If any of the required database settings are missing, fetch from Secrets Manager
-            if not all([self.DB_HOST, self.DB_PORT, self.DB_NAME, self.DB_USER, self.DB_PASSWORD]):
-                logger.info("Some database settings not found in environment variables, fetching from Secrets Manager")
-                
-                # Create a Secrets Manager client
-                session = boto3.session.Session()
-                client = session.client(service_name='secretsmanager')
-                
-                # Get the secret value
-                secret_name = f"{self.ENVIRONMENT}/rds/credentials"
-                response = client.get_secret_value(SecretId=secret_name)
-                
-                # Parse the secret JSON
-                secret = json.loads(response['SecretString'])
-                
-                # Set database connection parameters from secrets
-                self.DB_HOST = secret.get('host', 'localhost')
-                self.DB_PORT = str(secret.get('port', '3306'))
-                self.DB_NAME = secret.get('dbname', 'ecommerce')
-                self.DB_USER = secret.get('username', 'admin')
-                self.DB_PASSWORD = secret.get('password', '')
-                
-                logger.info(f"Successfully loaded database configuration from Secrets Manager for {self.ENVIRONMENT} environment")
-            else:
-                logger.info("Using database configuration from environment variables")
-                
+            secret = self.db_secret.refresh() if refresh else self.db_secret.get()
         except ClientError as e:
             logger.error(f"Failed to retrieve secret from Secrets Manager: {e}")
             raise
-        except Exception as e:
-            logger.error(f"Error loading production environment variables: {e}")
-            raise
+        return {
+            "host": secret.get('host', 'localhost'),
+            "port": int(secret.get('port', 3306)),
+            "database": secret.get('dbname', 'ecommerce'),
+            "user": secret.get('username', 'admin'),
+            "password": secret.get('password', ''),
+        }
         
+    @property
+    def auth_private_key(self) -> str:
+        """PEM signing key from AUTH_PRIVATE_KEY or AUTH_PRIVATE_KEY_FILE"""
+        if self.AUTH_PRIVATE_KEY:
+            return self.AUTH_PRIVATE_KEY
+        if self.AUTH_PRIVATE_KEY_FILE:
+            with open(self.AUTH_PRIVATE_KEY_FILE) as f:
+                return f.read()
+        return ""
+
+    @property
+    def db_connection_mode(self) -> str:
+        """Resolved connection mode: pool or lambda"""
+        if self.DB_CONNECTION_MODE == "auto":
+            return "lambda" if os.environ.get("AWS_LAMBDA_FUNCTION_NAME") else "pool"
+        return self.DB_CONNECTION_MODE
+
     @property
     def database_url(self) -> str:
-        """Construct database URL for MySQL"""
+        """Construct database URL for MySQL
+        
+        With a Secrets Manager secret the credentials are supplied per
+        connection by the engine's do_connect hook, so only the driver is named.
+        """
+        if self.DATABASE_URL:
+            return self.DATABASE_URL
+        if self.db_secret is not None:
+            return "mysql+pymysql://"
         return f"mysql+pymysql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
 # Create a global settings object
@@ -0,0 +1,182 @@
+"""Connection pool configuration and instrumentation
+
+Two connection modes are supported:
+
+- ``pool``: a regular QueuePool for long-running containers serving many
+  concurrent requests.
+- ``lambda``: one persistent connection per container. A Lambda container
+  handles a single request at a time, so a bigger pool only holds idle RDS
+  connections. Instead of pinging on every checkout, the connection is
+  pinged only after it has been idle for ``ping_idle_seconds``, which is
+  when RDS or RDS Proxy may have closed it. No session state is set on
+  connect, so RDS Proxy can multiplex the connection without pinning.
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, List
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+from app.metrics import DB_CHECKOUT_WAIT, MetricFamily
+
+logger = logging.getLogger(__name__)
+
+
+class PoolStats:
+    """Thread-safe counters for checkouts, wait times and connections"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.connects = 0
+            self.pings = 0
+            self.ping_failures = 0
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def increment(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "wait_avg_ms": self.wait_total / self.checkouts * 1000 if self.checkouts else 0.0,
+                "wait_max_ms": self.wait_max * 1000,
+                "connects": self.connects,
+                "pings": self.pings,
+                "ping_failures": self.ping_failures,
+            }
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waits for a connection"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            pool_stats.record_wait(waited)
+            DB_CHECKOUT_WAIT.observe(waited)
+
+
+def pool_options(mode: str, pool_size: int, max_overflow: int, pool_recycle: int, pool_timeout: int) -> Dict[str, Any]:
+    """create_engine keyword arguments for a connection mode"""
+    options = {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_pre_ping": True,
+        "pool_recycle": pool_recycle,
+        "pool_timeout": pool_timeout,
+    }
+    if mode == "lambda":
+        # One request at a time per container: a single connection, checked by idle time
+        options.update(pool_size=1, max_overflow=0, pool_pre_ping=False)
+    return options
+
+
+def _ping(dbapi_connection) -> bool:
+    try:
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        finally:
+            cursor.close()
+        return True
+    except Exception:
+        return False
+
+
+def instrument_engine(engine: Engine, ping_idle_seconds: float = 0, stats_interval: float = 0):
+    """Count connections, ping idle connections on checkout and log pool stats
+
+    With ``ping_idle_seconds`` set, a checked-out connection that has been idle
+    for longer is pinged first; a dead one is replaced transparently.
+    """
+    last_report = [time.monotonic()]
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        pool_stats.increment("connects")
+        connection_record.info["last_used"] = time.monotonic()
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        now = time.monotonic()
+        connection_record.info["last_used"] = now
+        if stats_interval and now - last_report[0] >= stats_interval:
+            last_report[0] = now
+            logger.info(f"Database pool stats: {get_pool_stats(engine)}")
+
+    if ping_idle_seconds:
+        @event.listens_for(engine, "checkout")
+        def on_checkout(dbapi_connection, connection_record, connection_proxy):
+            idle = time.monotonic() - connection_record.info.get("last_used", 0.0)
+            if idle < ping_idle_seconds:
+                return
+            pool_stats.increment("pings")
+            if not _ping(dbapi_connection):
+                pool_stats.increment("ping_failures")
+                logger.info(f"Replacing database connection that died after {idle:.0f}s idle")
+                # The pool discards this connection and checks out a new one
+                raise exc.DisconnectionError()
+
+
+def get_pool_stats(engine: Engine) -> Dict[str, Any]:
+    """Current pool occupancy plus cumulative checkout and connection counters"""
+    pool = engine.pool
+    stats = pool_stats.snapshot()
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        })
+    return stats
+
+
+def pool_metrics(engines: Dict[str, Engine]) -> List[MetricFamily]:
+    """Pool occupancy per engine and connection counters, for /metrics"""
+    gauges = {
+        "db_pool_size": "Configured pool size",
+        "db_pool_checked_out": "Connections in use",
+        "db_pool_checked_in": "Idle connections in the pool",
+        "db_pool_overflow": "Connections opened beyond the pool size",
+    }
+    samples: Dict[str, list] = {name: [] for name in gauges}
+    for name, engine in engines.items():
+        pool = engine.pool
+        if isinstance(pool, QueuePool):
+            samples["db_pool_size"].append(({"engine": name}, pool.size()))
+            samples["db_pool_checked_out"].append(({"engine": name}, pool.checkedout()))
+            samples["db_pool_checked_in"].append(({"engine": name}, pool.checkedin()))
+            samples["db_pool_overflow"].append(({"engine": name}, max(0, pool.overflow())))
+    stats = pool_stats.snapshot()
+    return [MetricFamily(name, "gauge", help, samples[name]) for name, help in gauges.items()] + [
+        MetricFamily("db_pool_connects_total", "counter", "Database connections opened", [({}, stats["connects"])]),
+        MetricFamily("db_pool_pings_total", "counter", "Idle connection pings", [({}, stats["pings"])]),
+        MetricFamily(
+            "db_pool_ping_failures_total", "counter", "Idle connections found dead", [({}, stats["ping_failures"])]
+        ),
+    ]
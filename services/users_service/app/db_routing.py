@@ -0,0 +1,123 @@
+"""Read-replica routing for ORM sessions
+
+Repository methods decorated with ``read_only`` run their queries on a
+replica engine; everything else, including flushes and commits, uses the
+primary. Reads fall back to the primary for a short stickiness window so
+clients always see their own writes despite replica lag:
+
+- for the rest of a session (request) once it has flushed a write, and
+- for ``window`` seconds after a write by or for the same user, keyed by the
+  authenticated caller and by the ``user_id`` of written rows.
+
+The per-user window is tracked in process memory, so it only covers requests
+served by the same container.
+"""
+import functools
+import inspect
+import random
+import threading
+import time
+from typing import Dict, Hashable, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+
+class WriteTracker:
+    """Remembers which users wrote recently"""
+
+    def __init__(self, window: float = 5.0, max_entries: int = 100_000):
+        self.window = window
+        self.max_entries = max_entries
+        self._writes: Dict[Hashable, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: Hashable):
+        now = time.monotonic()
+        with self._lock:
+            self._writes[key] = now
+            if len(self._writes) > self.max_entries:
+                self._writes = {k: t for k, t in self._writes.items() if now - t < self.window}
+
+    def is_recent(self, key: Optional[Hashable]) -> bool:
+        if key is None:
+            return False
+        written_at = self._writes.get(key)
+        return written_at is not None and time.monotonic() - written_at < self.window
+
+
+class RoutingSession(Session):
+    """Session that sends read_only repository queries to a replica
+
+    The session's own bind is the primary. Set ``replicas`` and
+    ``write_tracker`` on a subclass (see ``configure_routing``). A session
+    sticks to one replica so a request sees a consistent snapshot.
+    """
+
+    replicas: List[Engine] = []
+    write_tracker: WriteTracker = WriteTracker()
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.replicas and self.info.get("read_only") and not self._flushing and self._can_read_replica():
+            replica = self.info.get("replica")
+            if replica is None:
+                replica = self.info["replica"] = random.choice(self.replicas)
+            return replica
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
+
+    def _can_read_replica(self) -> bool:
+        if self.info.get("wrote"):
+            return False
+        tracker = self.write_tracker
+        return not (
+            tracker.is_recent(self.info.get("user_id"))
+            or tracker.is_recent(self.info.get("read_user_id"))
+        )
+
+
+def configure_routing(replicas: List[Engine], stickiness_seconds: float) -> type:
+    """Build a RoutingSession subclass reading from the given replicas"""
+    session_class = type(
+        "AppSession",
+        (RoutingSession,),
+        {"replicas": replicas, "write_tracker": WriteTracker(stickiness_seconds)},
+    )
+
+    @event.listens_for(session_class, "after_flush")
+    def record_writes(session, flush_context):
+        session.info["wrote"] = True
+        tracker = session_class.write_tracker
+        if session.info.get("user_id") is not None:
+            tracker.record(session.info["user_id"])
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            user_id = getattr(obj, "user_id", None)
+            if user_id is not None:
+                tracker.record(str(user_id))
+
+    return session_class
+
+
+def read_only(method):
+    """Mark a repository method as safe to serve from a read replica
+
+    If the method takes a ``user_id`` argument, that user's recent writes
+    keep the read on the primary.
+    """
+    signature = inspect.signature(method)
+    takes_user_id = "user_id" in signature.parameters
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        info = self.db.info
+        previous = info.get("read_only"), info.get("read_user_id")
+        info["read_only"] = True
+        if takes_user_id:
+            user_id = signature.bind(self, *args, **kwargs).arguments["user_id"]
+            info["read_user_id"] = str(user_id)
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            info["read_only"], info["read_user_id"] = previous
+
+    return wrapper
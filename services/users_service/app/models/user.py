@@ -1,10 +1,10 @@
-from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, func
-from passlib.context import CryptContext
+from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, DDL, Index, event, func
 
 from app.models.base import Base
+from app.services.password_hasher import password_hasher
 
-# Simple password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Token roles; service and admin may act on any user's orders and carts
+USER_ROLES = ("customer", "service", "admin")
 
 
 class User(Base):
@@ -19,12 +19,49 @@ class User(Base):
     hashed_password = Column(Text, nullable=False)
     address = Column(Text, nullable=True)
     created_at = Column(TIMESTAMP, server_default=func.current_timestamp())
+    # Bumped on every change; the ETag of GET /users/{user_id}
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Issued as the token's role claim; only changed with app/set_role.py
+    role = Column(String(20), nullable=False, default="customer", server_default="customer")
+
+    __table_args__ = (
+        # Backs GET /users/search on MySQL; SQLite uses the users_fts table below
+        Index(
+            "ix_users_name_address_fulltext", "name", "address", mysql_prefix="FULLTEXT"
+        ).ddl_if(dialect="mysql"),
+    )
 
     @classmethod
     def hash_password(cls, password: str) -> str:
-        """Hash a password"""
-        return pwd_context.hash(password)
+        """Hash a password on the hashing pool (blocks until done)"""
+        return password_hasher.hash(password)
     
     def verify_password(self, password: str) -> bool:
-        """Verify password against hash"""
-        return pwd_context.verify(password, self.hashed_password)
+        """Verify password against hash on the hashing pool (blocks until done)"""
+        return password_hasher.verify(password, self.hashed_password)
+
+
+# SQLite equivalent of the FULLTEXT index for local testing: an external-content
+# FTS5 table kept in sync with users by triggers
+_SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5("
+    "name, address, content='users', content_rowid='user_id')",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_ai AFTER INSERT ON users BEGIN "
+    "INSERT INTO users_fts(rowid, name, address) VALUES (new.user_id, new.name, new.address); END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_ad AFTER DELETE ON users BEGIN "
+    "INSERT INTO users_fts(users_fts, rowid, name, address) "
+    "VALUES ('delete', old.user_id, old.name, old.address); END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_au AFTER UPDATE ON users BEGIN "
+    "INSERT INTO users_fts(users_fts, rowid, name, address) "
+    "VALUES ('delete', old.user_id, old.name, old.address); "
+    "INSERT INTO users_fts(rowid, name, address) VALUES (new.user_id, new.name, new.address); END",
+]
+
+for _statement in _SQLITE_SEARCH_DDL:
+    event.listen(User.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+
+event.listen(
+    User.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS users_fts").execute_if(dialect="sqlite"),
+)
@@ -1,9 +1,112 @@
+import re
+from sqlalchemy import Row, TextClause, bindparam, or_, select, text
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
 
+from app.conditional import PreconditionFailedError, version_etag
+from app.db_routing import read_only
 from app.models.user import User
+from app.query_cache import named
 from app.schemas.user import UserCreate
 
+# Columns returned by the API; hashed_password is never needed to build a response
+RESPONSE_COLUMNS = (
+    User.user_id, User.name, User.email, User.phone_number,
+    User.image_url, User.address, User.created_at,
+)
+
+# Hot lookups, built once so each call only binds parameters
+USER_BY_ID = named(select(User).where(User.user_id == bindparam("user_id")), "users.get_by_id")
+USER_BY_EMAIL = named(select(User).where(User.email == bindparam("email")), "users.get_by_email")
+USER_VERSION = named(select(User.version).where(User.user_id == bindparam("user_id")), "users.get_version")
+
+# Executed at init with parameters that match nothing to warm the compiled cache
+WARM_UP_STATEMENTS = [
+    (USER_BY_ID, {"user_id": 0}),
+    (USER_BY_EMAIL, {"email": ""}),
+    (USER_VERSION, {"user_id": 0}),
+]
+
+# Score given to email prefix matches so they rank above name/address matches
+EMAIL_PREFIX_SCORE = 100.0
+# Candidates taken from each index for a page, to bound work on huge tables
+SEARCH_MAX_CANDIDATES = 1000
+
+
+def search_statement(
+    query: str,
+    limit: int,
+    after: Optional[Tuple[float, int]],
+    dialect_name: str,
+) -> Tuple[TextClause, Dict[str, Any]]:
+    """Ranked (user_id, score) search query and its parameters for a dialect
+    
+    A user's score is EMAIL_PREFIX_SCORE if the email matches the prefix, plus
+    the full-text score of name/address. Full-text matches are scored in full
+    by the text branch; the email branch only adds email matches without a
+    text match. The branches are disjoint and each applies the cursor before
+    taking its candidates, so every page is complete however deep it is.
+    
+    The LIKE escape character is ``!`` rather than a backslash, which MySQL
+    would read as escaping the closing quote of ``ESCAPE '\\'``.
+    """
+    query = query.strip().lower()
+    tokens = re.findall(r"\w+", query)[:8]
+    params = {
+        "email_prefix": re.sub(r"([!%_])", r"!\1", query) + "%",
+        "email_score": EMAIL_PREFIX_SCORE,
+        "cap": SEARCH_MAX_CANDIDATES,
+        "limit": limit,
+    }
+    email_match = "email LIKE :email_prefix ESCAPE '!'"
+    email_bonus = f"CASE WHEN {email_match} THEN :email_score ELSE 0 END"
+    
+    def after_cursor(score: str) -> str:
+        if after is None:
+            return ""
+        return f" AND ({score} < :after_score OR ({score} = :after_score AND user_id > :after_id))"
+    
+    if after is not None:
+        params["after_score"], params["after_id"] = after
+    
+    email_only = ""
+    candidates = []
+    if tokens:
+        if dialect_name == "sqlite":
+            params["terms"] = " OR ".join(f'"{token}"*' for token in tokens)
+            text_scores = (
+                f"SELECT users.user_id AS user_id, -bm25(users_fts) + {email_bonus} AS score "
+                "FROM users_fts JOIN users ON users.user_id = users_fts.rowid "
+                "WHERE users_fts MATCH :terms"
+            )
+            email_only = " AND user_id NOT IN (SELECT rowid FROM users_fts WHERE users_fts MATCH :terms)"
+        else:
+            params["terms"] = " ".join(f"{token}*" for token in tokens)
+            text_scores = (
+                f"SELECT user_id, MATCH(name, address) AGAINST (:terms IN BOOLEAN MODE) + {email_bonus} AS score "
+                "FROM users WHERE MATCH(name, address) AGAINST (:terms IN BOOLEAN MODE)"
+            )
+            email_only = " AND NOT MATCH(name, address) AGAINST (:terms IN BOOLEAN MODE)"
+        candidates.append(
+            "SELECT user_id, score FROM ("
+            f"SELECT user_id, score FROM ({text_scores}) AS text_scores "
+            f"WHERE 1 = 1{after_cursor('score')} "
+            "ORDER BY score DESC, user_id ASC LIMIT :cap) AS text_matches"
+        )
+    candidates.append(
+        "SELECT user_id, score FROM ("
+        "SELECT user_id, :email_score AS score FROM users "
+        f"WHERE {email_match}{email_only}{after_cursor(':email_score')} "
+        "ORDER BY user_id LIMIT :cap) AS email_matches"
+    )
+    
+    ranked_sql = (
+        "SELECT user_id, score FROM ("
+        + " UNION ALL ".join(candidates) +
+        ") AS candidates ORDER BY score DESC, user_id ASC LIMIT :limit"
+    )
+    return text(ranked_sql), params
+
 
 class UserRepository:
     """Repository for user database operations"""
@@ -11,32 +114,90 @@ class UserRepository:
     def __init__(self, db: Session):
         self.db = db
     
+    @read_only
     def get_by_id(self, user_id: int) -> Optional[User]:
         """Get a user by ID"""
-        return self.db.query(User).filter(User.user_id == user_id).first()
+        return self.db.execute(USER_BY_ID, {"user_id": user_id}).scalar_one_or_none()
+    
+    @read_only
+    def get_version(self, user_id: int) -> Optional[int]:
+        """Get a user's version without loading the row, for conditional GETs"""
+        return self.db.execute(USER_VERSION, {"user_id": user_id}).scalar_one_or_none()
     
+    @read_only
     def get_by_email(self, email: str) -> Optional[User]:
         """Get a user by email"""
-        return self.db.query(User).filter(User.email == email).first()
+        return self.db.execute(USER_BY_EMAIL, {"email": email}).scalar_one_or_none()
+    
+    @read_only
+    def get_by_ids_or_emails(self, user_ids: List[int], emails: List[str]) -> List[User]:
+        """Get all users matching any of the ids or emails in a single query"""
+        conditions = []
+        if user_ids:
+            conditions.append(User.user_id.in_(user_ids))
+        if emails:
+            conditions.append(User.email.in_(emails))
+        if not conditions:
+            return []
+        return self.db.query(User).filter(or_(*conditions)).all()
+    
+    @read_only
+    def search_users(
+        self,
+        query: str,
+        limit: int = 20,
+        after: Optional[Tuple[float, int]] = None
+    ) -> List[Tuple[User, float]]:
+        """Rank users by email prefix and name/address full-text match
+        
+        Results are ordered by (score DESC, user_id ASC); ``after`` is the
+        (score, user_id) of the last row of the previous page.
+        """
+        statement, params = search_statement(query, limit, after, self.db.get_bind().dialect.name)
+        ranked = self.db.execute(statement, params).all()
+        if not ranked:
+            return []
+        
+        users = {
+            user.user_id: user
+            for user in self.db.query(User).filter(User.user_id.in_([row.user_id for row in ranked]))
+        }
+        return [(users[row.user_id], float(row.score)) for row in ranked if row.user_id in users]
     
-    def list_users(self, skip: int = 0, limit: int = 100) -> List[User]:
-        """Get a list of users with pagination"""
-        return self.db.query(User).offset(skip).limit(limit).all()
+    @read_only
+    def list_users(self, skip: int = 0, limit: int = 100) -> List[Row]:
+        """Get a page of users as rows holding only the response columns"""
+        statement = select(*RESPONSE_COLUMNS).order_by(User.user_id).offset(skip).limit(limit)
+        return self.db.execute(statement).all()
     
-    def create(self, user_data: UserCreate) -> User:
+    def create(self, user_data: UserCreate, hashed_password: Optional[str] = None) -> User:
         """Create a new user"""
         # Extract data from user_data but exclude password
         user_dict = user_data.model_dump(exclude={"password"})
         user = User(**user_dict)
-        # Set the hashed password separately
-        user.hashed_password = User.hash_password(user_data.password)
+        # Set the hashed password separately; callers normally hash it
+        # up front on the hashing pool
+        user.hashed_password = hashed_password or User.hash_password(user_data.password)
         self.db.add(user)
         self.db.commit()
         self.db.refresh(user)
         return user
-    def update(self, user_id: int, **kwargs) -> Optional[User]:
+    
+    def get_current(self, user_id: int, expected_versions: Optional[Set[int]] = None) -> Optional[User]:
+        """Get a user from the primary, for read-modify-write
+        
+        With expected_versions the row is locked until commit and
+        PreconditionFailedError is raised unless it is at one of them.
+        """
+        user = self.db.get(User, user_id, populate_existing=True, with_for_update=expected_versions is not None)
+        if user is not None and expected_versions is not None and user.version not in expected_versions:
+            self.db.rollback()
+            raise PreconditionFailedError(version_etag(user.version))
+        return user
+    
+    def update(self, user_id: int, expected_versions: Optional[Set[int]] = None, **kwargs) -> Optional[User]:
         """Update user attributes"""
-        user = self.get_by_id(user_id)
+        user = self.get_current(user_id, expected_versions)
         if not user:
             return None
         
@@ -45,14 +206,15 @@ class UserRepository:
                 user.hashed_password = User.hash_password(value)
             elif hasattr(user, key):
                 setattr(user, key, value)
+        user.version = User.version + 1
         
         self.db.commit()
         self.db.refresh(user)
         return user
     
-    def delete(self, user_id: int) -> bool:
+    def delete(self, user_id: int, expected_versions: Optional[Set[int]] = None) -> bool:
         """Delete a user by ID"""
-        user = self.get_by_id(user_id)
+        user = self.get_current(user_id, expected_versions)
         if not user:
             return False
         
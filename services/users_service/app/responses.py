@@ -0,0 +1,30 @@
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+from app.middleware.timing import timed
+
+
+def _default(obj: Any) -> Any:
+    """Serialize types orjson does not handle natively, matching Pydantic's JSON output"""
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, BaseModel):
+        # Response models built with model_construct hold plain field values
+        return obj.__dict__
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(ORJSONResponse):
+    """orjson response for read endpoints that return pre-built response models
+
+    Returning it from a route skips FastAPI's response_model validation and
+    jsonable_encoder pass, so only return trusted, already-shaped data.
+    """
+
+    def render(self, content: Any) -> bytes:
+        with timed("serialize"):
+            return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
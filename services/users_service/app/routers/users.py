@@ -1,24 +1,107 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status, Query
+from fastapi.concurrency import run_in_threadpool
+from pydantic import EmailStr
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
+from app.conditional import (
+    PreconditionFailedError,
+    if_match_versions,
+    is_not_modified,
+    not_modified,
+    precondition_failed,
+    version_etag,
+)
+from app.middleware.timing import timed
 from app.models.base import get_db
+from app.responses import FastJSONResponse
 from app.repositories.user_repository import UserRepository
 from app.services.user_service import UserService
-from app.schemas.user import UserCreate, UserUpdate, UserResponse
+from app.services.password_hasher import password_hasher, HashingQueueFullError
+from app.services.token_service import get_token_service
+from app.schemas.user import (
+    UserCreate, UserUpdate, UserResponse, AuthenticateRequest, TokenResponse,
+    UserBatchLookupRequest, UserBatchLookupResponse, UserSearchResponse
+)
 
 router = APIRouter(tags=["users"])
 
 
+def hashing_unavailable() -> HTTPException:
+    """503 returned when the password hashing pool is saturated"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many concurrent password operations, please retry",
+        headers={"Retry-After": "1"}
+    )
+
+
+async def hash_password_or_503(password: str) -> str:
+    """Hash a password on the hashing pool, shedding load when it is saturated"""
+    try:
+        with timed("hash"):
+            return await password_hasher.hash_async(password)
+    except HashingQueueFullError:
+        raise hashing_unavailable()
+
+
+async def verify_password_or_503(password: str, hashed_password: str) -> bool:
+    """Verify a password on the hashing pool, shedding load when it is saturated"""
+    try:
+        with timed("hash"):
+            return await password_hasher.verify_async(password, hashed_password)
+    except HashingQueueFullError:
+        raise hashing_unavailable()
+
+
+_dummy_hash = None
+
+
+def get_dummy_hash() -> str:
+    """Hash verified for unknown emails so both paths cost one bcrypt check"""
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = password_hasher.hash("not-a-real-password")
+    return _dummy_hash
+
+
+@router.post("/authenticate", response_model=TokenResponse)
+async def authenticate(
+    credentials: AuthenticateRequest,
+    db: Session = Depends(get_db)
+):
+    """Verify a user's password and issue a signed access token"""
+    repository = UserRepository(db)
+    user = await run_in_threadpool(repository.get_by_email, credentials.email)
+    
+    hashed_password = user.hashed_password if user else await run_in_threadpool(get_dummy_hash)
+    password_ok = await verify_password_or_503(credentials.password, hashed_password)
+    if not user or not password_ok:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid email or password",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return get_token_service().issue_token(user)
+
+
+@router.get("/jwks")
+def get_jwks():
+    """Public keys for verifying access tokens"""
+    return get_token_service().jwks()
+
+
 @router.post("", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def create_user(
+async def create_user(
     user_data: UserCreate,
     db: Session = Depends(get_db)
 ):
     """Create a new user"""
+    # Hash first so no threadpool slot is held while bcrypt runs
+    hashed_password = await hash_password_or_503(user_data.password)
     repository = UserRepository(db)
     service = UserService(repository)
-    return service.create_user(user_data)
+    return await run_in_threadpool(service.create_user, user_data, hashed_password)
 
 
 @router.get("", response_model=List[UserResponse])
@@ -28,61 +111,138 @@ def list_users(
     db: Session = Depends(get_db)
 ):
     """List all users"""
-    print("Listing users")
     repository = UserRepository(db)
     service = UserService(repository)
-    users = service.list_users(skip, limit)
-    print(f"users {users}")
-    return users
+    return FastJSONResponse(service.list_users(skip, limit))
+
+
+@router.get("/search", response_model=UserSearchResponse)
+def search_users(
+    q: str = Query(..., min_length=2, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """Search users by email prefix and name/address text, ranked by relevance"""
+    repository = UserRepository(db)
+    service = UserService(repository)
+    try:
+        return service.search_users(q, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.post("/batch", response_model=UserBatchLookupResponse)
+def lookup_users(
+    lookup: UserBatchLookupRequest,
+    db: Session = Depends(get_db)
+):
+    """Look up many users by id and/or email in one request"""
+    repository = UserRepository(db)
+    service = UserService(repository)
+    return service.lookup_users(lookup.user_ids, lookup.emails)
+
+
+@router.get("/by-email", response_model=UserResponse)
+def get_user_by_email(
+    email: EmailStr = Query(...),
+    db: Session = Depends(get_db)
+):
+    """Get a user by email"""
+    repository = UserRepository(db)
+    service = UserService(repository)
+    
+    user = service.get_user_by_email(email)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    return user
 
 
 @router.get("/{user_id}", response_model=UserResponse)
 def get_user(
+    response: Response,
     user_id: int,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    """Get a user by ID"""
+    """Get a user by ID
+    
+    When If-None-Match holds the current ETag, responds 304 after reading
+    only the user's version.
+    """
     repository = UserRepository(db)
     service = UserService(repository)
     
-    user = service.get_user(user_id)
-    if not user:
+    if if_none_match:
+        version = service.get_user_version(user_id)
+        if version is not None and is_not_modified(if_none_match, version_etag(version)):
+            return not_modified(version_etag(version))
+    
+    result = service.get_user(user_id)
+    if not result:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
+    user, version = result
+    response.headers["ETag"] = version_etag(version)
     return user
 
 
 @router.put("/{user_id}", response_model=UserResponse)
-def update_user(
+async def update_user(
+    response: Response,
     user_id: int,
     user_data: UserUpdate,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    """Update a user"""
+    """Update a user
+    
+    With If-Match, the update only applies if the user still has that ETag.
+    """
+    hashed_password = None
+    if user_data.password:
+        hashed_password = await hash_password_or_503(user_data.password)
     repository = UserRepository(db)
     service = UserService(repository)
     
-    updated_user = service.update_user(user_id, user_data)
-    if not updated_user:
+    try:
+        result = await run_in_threadpool(
+            service.update_user, user_id, user_data, hashed_password, if_match_versions(if_match)
+        )
+    except PreconditionFailedError as e:
+        raise precondition_failed(e)
+    if not result:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
+    updated_user, version = result
+    response.headers["ETag"] = version_etag(version)
     return updated_user
 
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_user(
     user_id: int,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    """Delete a user"""
+    """Delete a user, only if it still has the If-Match ETag when one is given"""
     repository = UserRepository(db)
     service = UserService(repository)
     
-    success = service.delete_user(user_id)
+    try:
+        success = service.delete_user(user_id, if_match_versions(if_match))
+    except PreconditionFailedError as e:
+        raise precondition_failed(e)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1,7 +1,10 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field, model_validator
+from typing import List, Optional
 from datetime import datetime
 
+# Maximum number of ids + emails accepted by one batch lookup
+MAX_BATCH_LOOKUP = 500
+
 
 class UserBase(BaseModel):
     """Base user schema"""
@@ -35,3 +38,45 @@ class UserResponse(UserBase):
     
     class Config:
         from_attributes = True
+
+
+class AuthenticateRequest(BaseModel):
+    """Schema for authenticating a user"""
+    email: EmailStr
+    password: str
+
+
+class TokenResponse(BaseModel):
+    """Schema for issued access tokens"""
+    access_token: str
+    token_type: str = "bearer"
+    expires_in: int
+    user_id: int
+
+
+class UserBatchLookupRequest(BaseModel):
+    """Schema for looking up many users by id and/or email"""
+    user_ids: List[int] = Field(default_factory=list)
+    emails: List[EmailStr] = Field(default_factory=list)
+
+    @model_validator(mode="after")
+    def check_size(self):
+        total = len(self.user_ids) + len(self.emails)
+        if total == 0:
+            raise ValueError("Provide at least one user id or email")
+        if total > MAX_BATCH_LOOKUP:
+            raise ValueError(f"At most {MAX_BATCH_LOOKUP} ids and emails per request")
+        return self
+
+
+class UserBatchLookupResponse(BaseModel):
+    """Schema for batch lookup results"""
+    users: List[UserResponse]
+    missing_user_ids: List[int]
+    missing_emails: List[str]
+
+
+class UserSearchResponse(BaseModel):
+    """Schema for a page of search results"""
+    users: List[UserResponse]
+    next_cursor: Optional[str] = None
@@ -9,17 +9,20 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from app.models.user import User
 from app.models.base import SessionLocal
+from app.services.password_hasher import password_hasher
 
 faker = Faker()
 
 def seed_users(db: Session):
     """Seed the database with users"""
     print("Seeding users...")
+    # Hash all passwords in parallel on the hashing pool
+    hashed_passwords = password_hasher.hash_many([faker.password() for _ in range(10)])
     for i in range(10):  # Reduced to 10 users for faster seeding
         user = User(
             name=faker.name(),
             email=faker.email(),
-            hashed_password=User.hash_password(faker.password()),
+            hashed_password=hashed_passwords[i],
             phone_number=faker.phone_number(),
             image_url=faker.image_url(),
             address=faker.address()
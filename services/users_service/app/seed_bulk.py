@@ -0,0 +1,393 @@
+"""Bulk data generator for performance testing
+
+Generates users, products, orders and order items at millions-of-rows scale.
+Rows are built by a pool of Faker worker processes and written with
+multi-row ``INSERT ... VALUES`` batches; ids are assigned up front so order
+items can reference orders without reading anything back. Passwords come
+from a small pool of precomputed bcrypt hashes: user N's password is
+``<password-prefix><N % password-pool>``.
+
+Order placement follows a Zipf distribution, so a few users and products
+account for most orders, like real traffic.
+
+    python app/seed_bulk.py --users 1000000 --products 50000 --orders 5000000
+    python app/seed_bulk.py --users 10000 --orders 50000 --workers 4 --batch-size 1000
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from faker import Faker
+from sqlalchemy import MetaData, Table, func, select, text
+from sqlalchemy.engine import Engine
+
+# Add the parent directory to sys.path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.models.base import engine
+from app.services.password_hasher import available_cores, password_hasher
+
+TABLES = ["users", "products", "orders", "order_items"]
+ORDER_STATUSES = {"PENDING": 2, "PAID": 3, "SHIPPED": 5}
+PRODUCT_CATEGORIES = ["Home", "Garden", "Toys", "Books", "Sports", "Electronics", "Beauty", "Grocery"]
+
+# Generation settings shared with worker processes (set by _init_worker)
+_worker: Dict[str, Any] = {}
+
+
+def zipf_rank(rng: random.Random, n: int, s: float) -> int:
+    """Draw a rank in [0, n) from an approximate Zipf distribution in O(1)
+
+    Inverts the continuous power-law CDF, so no per-rank weight table is
+    needed even for millions of users.
+    """
+    u = rng.random()
+    if abs(s - 1.0) < 1e-9:
+        rank = n ** u
+    else:
+        rank = ((n ** (1 - s) - 1) * u + 1) ** (1 / (1 - s))
+    return min(n - 1, int(rank) - 1)
+
+
+def scatter(rank: int, n: int) -> int:
+    """Map a popularity rank to an offset so popular rows are spread across ids"""
+    # 2654435761 is prime; offsets stay unique as long as n is not a multiple of it
+    return (rank * 2654435761) % n
+
+
+def _init_worker(settings: Dict[str, Any]):
+    _worker.clear()
+    _worker.update(settings)
+    _worker["faker"] = Faker()
+
+
+def _chunk_rng(kind: str, chunk_start: int) -> random.Random:
+    """Deterministic RNG for a chunk so runs with the same seed produce the same data"""
+    seed = zlib.crc32(f"{_worker['seed']}:{kind}:{chunk_start}".encode())
+    _worker["faker"].seed_instance(seed)
+    return random.Random(seed)
+
+
+def _random_timestamp(rng: random.Random, now: datetime, days: int) -> datetime:
+    # Squaring the uniform draw weights timestamps towards the recent end
+    return now - timedelta(seconds=int(days * 86400 * rng.random() ** 2))
+
+
+def generate_users(first_id: int, count: int) -> List[Dict[str, Any]]:
+    """Build user rows with ids [first_id, first_id + count)"""
+    rng = _chunk_rng("users", first_id)
+    faker = _worker["faker"]
+    hashes = _worker["password_hashes"]
+    now = _worker["now"]
+    rows = []
+    for user_id in range(first_id, first_id + count):
+        rows.append({
+            "user_id": user_id,
+            "name": faker.name(),
+            # The id suffix keeps emails unique without checking the table
+            "email": f"{faker.user_name()}.{user_id}@{faker.free_email_domain()}",
+            "hashed_password": hashes[user_id % len(hashes)],
+            "phone_number": faker.phone_number(),
+            "image_url": faker.image_url(),
+            "address": faker.address(),
+            "created_at": _random_timestamp(rng, now, _worker["days"]),
+        })
+    return rows
+
+
+def generate_products(first_id: int, count: int) -> List[Dict[str, Any]]:
+    """Build product rows with ids [first_id, first_id + count)"""
+    rng = _chunk_rng("products", first_id)
+    faker = _worker["faker"]
+    now = _worker["now"]
+    rows = []
+    for product_id in range(first_id, first_id + count):
+        category = rng.choice(PRODUCT_CATEGORIES)
+        rows.append({
+            "product_id": product_id,
+            "sku": f"{category[:3].upper()}-{product_id:08d}",
+            "name": f"{faker.color_name()} {faker.word().title()} {category}",
+            "description": faker.sentence(nb_words=12),
+            "price": product_price(product_id),
+            "created_at": _random_timestamp(rng, now, _worker["days"]),
+        })
+    return rows
+
+
+def product_price(product_id: int) -> float:
+    """Deterministic, long-tailed price for a product id
+
+    Derived from the id alone so order workers know prices without sharing
+    the product table.
+    """
+    rng = random.Random(f"{_worker['seed']}:price:{product_id}")
+    return round(min(2000.0, math.exp(rng.gauss(3.2, 1.0))) + 0.99, 2)
+
+
+def generate_orders(first_id: int, count: int) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Build order rows with ids [first_id, first_id + count) and their items"""
+    rng = _chunk_rng("orders", first_id)
+    now = _worker["now"]
+    first_user, user_count = _worker["user_range"]
+    first_product, product_count = _worker["product_range"]
+    skew = _worker["skew"]
+    max_items = _worker["max_items"]
+    statuses = list(ORDER_STATUSES)
+    weights = list(ORDER_STATUSES.values())
+    prices = _worker.setdefault("prices", {})
+
+    # Item ids are derived from the order id so chunks never overlap
+    orders, items = [], []
+    for order_id in range(first_id, first_id + count):
+        user_id = first_user + scatter(zipf_rank(rng, user_count, skew), user_count)
+        # Geometric-ish basket size: most orders have one or two items
+        item_count = min(max_items, 1 + int(rng.expovariate(0.8)))
+        total = 0.0
+        seen = set()
+        for position in range(item_count):
+            product_id = first_product + scatter(zipf_rank(rng, product_count, skew), product_count)
+            if product_id in seen:
+                continue
+            seen.add(product_id)
+            price = prices.get(product_id)
+            if price is None:
+                price = prices[product_id] = product_price(product_id)
+            quantity = 1 + int(rng.expovariate(1.5))
+            total += price * quantity
+            items.append({
+                "order_item_id": _worker["first_item_id"] + (order_id - _worker["first_order_id"]) * max_items + position,
+                "order_id": order_id,
+                "product_id": product_id,
+                "quantity": quantity,
+                "price_at_order": price,
+            })
+        orders.append({
+            "order_id": order_id,
+            "user_id": user_id,
+            "status": rng.choices(statuses, weights)[0],
+            "order_total": round(total, 2),
+            "created_at": _random_timestamp(rng, now, _worker["days"]),
+        })
+    return orders, items
+
+
+def bounded_map(executor: ProcessPoolExecutor, fn: Callable, tasks: Iterable[Tuple], window: int) -> Iterator[Any]:
+    """Like executor.map, but keeps at most ``window`` chunks in flight
+
+    Stops fast generators from buffering the whole dataset in memory while
+    the database falls behind.
+    """
+    pending = deque()
+    for task in tasks:
+        pending.append(executor.submit(fn, *task))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def chunks(first_id: int, total: int, size: int) -> Iterator[Tuple[int, int]]:
+    for start in range(first_id, first_id + total, size):
+        yield start, min(size, first_id + total - start)
+
+
+class Progress:
+    """Tracks inserted rows per table and prints rows/sec"""
+
+    def __init__(self, interval: float = 5.0):
+        self.interval = interval
+        self.counts: Dict[str, int] = {}
+        self.elapsed: Dict[str, float] = {}
+        self._started: Dict[str, float] = {}
+        self._last_report = time.monotonic()
+
+    def start(self, table: str):
+        self._started[table] = time.monotonic()
+        self.counts.setdefault(table, 0)
+
+    def add(self, table: str, rows: int):
+        self.counts[table] += rows
+        now = time.monotonic()
+        self.elapsed[table] = now - self._started[table]
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            print(f"  {table}: {self.counts[table]:,} rows ({self.rate(table):,.0f} rows/sec)", flush=True)
+
+    def rate(self, table: str) -> float:
+        elapsed = self.elapsed.get(table, 0.0)
+        return self.counts[table] / elapsed if elapsed else 0.0
+
+    def summary(self):
+        print(f"{'Table':<14}{'Rows':>14}{'Seconds':>10}{'Rows/sec':>12}")
+        for table in self.counts:
+            print(
+                f"{table:<14}{self.counts[table]:>14,}{self.elapsed.get(table, 0.0):>10.1f}"
+                f"{self.rate(table):>12,.0f}"
+            )
+        total_rows = sum(self.counts.values())
+        total_time = sum(self.elapsed.values())
+        if total_time:
+            print(f"{'total':<14}{total_rows:>14,}{total_time:>10.1f}{total_rows / total_time:>12,.0f}")
+
+
+class BulkSeeder:
+    """Writes generated rows to the database in multi-row INSERT batches"""
+
+    def __init__(self, db_engine: Engine, batch_size: int = 2000, workers: int = 0, progress: Optional[Progress] = None):
+        self.engine = db_engine
+        self.batch_size = batch_size
+        self.workers = workers or available_cores()
+        self.progress = progress or Progress()
+        metadata = MetaData()
+        try:
+            self.tables = {name: Table(name, metadata, autoload_with=db_engine) for name in TABLES}
+        except Exception as e:
+            raise RuntimeError(f"Tables {', '.join(TABLES)} must exist before seeding: {e}")
+
+    def next_id(self, table: str) -> int:
+        """First free id in a table; generated rows carry explicit ids from here"""
+        table_obj = self.tables[table]
+        pk = list(table_obj.primary_key.columns)[0]
+        with self.engine.connect() as conn:
+            return (conn.execute(select(func.max(pk))).scalar() or 0) + 1
+
+    def insert(self, table: str, rows: List[Dict[str, Any]]):
+        """Insert rows as multi-row INSERT statements of at most batch_size rows"""
+        table_obj = self.tables[table]
+        with self.engine.connect() as conn:
+            # Ids are generated consistently, so per-row FK checks are redundant.
+            # The setting is per session and the connection goes back to the
+            # pool afterwards, so it must be restored even if an insert fails.
+            relax_fk_checks = conn.dialect.name == "mysql"
+            if relax_fk_checks:
+                conn.execute(text("SET foreign_key_checks = 0"))
+                conn.commit()
+            try:
+                with conn.begin():
+                    for start in range(0, len(rows), self.batch_size):
+                        conn.execute(table_obj.insert().values(rows[start:start + self.batch_size]))
+            finally:
+                if relax_fk_checks:
+                    conn.execute(text("SET foreign_key_checks = 1"))
+                    conn.commit()
+        self.progress.add(table, len(rows))
+
+    def run(
+        self,
+        users: int,
+        products: int,
+        orders: int,
+        max_items: int = 5,
+        skew: float = 0.9,
+        days: int = 365,
+        seed: int = 42,
+        password_pool: int = 64,
+        password_prefix: str = "loadtest-",
+    ):
+        if orders and not (users and products):
+            raise ValueError("Orders reference generated users and products, so --users and --products must be > 0")
+
+        print(f"Precomputing {password_pool} password hashes...")
+        password_hashes = password_hasher.hash_many(
+            [f"{password_prefix}{i}" for i in range(password_pool)]
+        )
+
+        first_user = self.next_id("users")
+        first_product = self.next_id("products")
+        first_order = self.next_id("orders")
+        settings = {
+            "seed": seed,
+            "days": days,
+            "now": datetime.utcnow(),
+            "skew": skew,
+            "max_items": max_items,
+            "password_hashes": password_hashes,
+            "user_range": (first_user, users),
+            "product_range": (first_product, products),
+            "first_order_id": first_order,
+            "first_item_id": self.next_id("order_items"),
+        }
+
+        window = self.workers * 2
+        with ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_worker, initargs=(settings,)
+        ) as executor:
+            for table, generator, count, first_id in (
+                ("users", generate_users, users, first_user),
+                ("products", generate_products, products, first_product),
+            ):
+                if not count:
+                    continue
+                print(f"Generating {count:,} {table} with {self.workers} workers...")
+                self.progress.start(table)
+                for rows in bounded_map(executor, generator, chunks(first_id, count, self.batch_size), window):
+                    self.insert(table, rows)
+
+            if orders:
+                print(f"Generating {orders:,} orders with {self.workers} workers...")
+                self.progress.start("orders")
+                self.progress.start("order_items")
+                for order_rows, item_rows in bounded_map(
+                    executor, generate_orders, chunks(first_order, orders, self.batch_size), window
+                ):
+                    self.insert("orders", order_rows)
+                    self.insert("order_items", item_rows)
+
+        self.progress.summary()
+        if users:
+            print(
+                f"User passwords: '{password_prefix}<user_id % {password_pool}>' "
+                f"(user ids {first_user}-{first_user + users - 1})"
+            )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-generate users, products, orders and order items")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--products", type=int, default=10_000)
+    parser.add_argument("--orders", type=int, default=500_000)
+    parser.add_argument("--max-items", type=int, default=5, help="Maximum items per order (default: 5)")
+    parser.add_argument("--skew", type=float, default=0.9,
+                        help="Zipf exponent for users and products per order (default: 0.9)")
+    parser.add_argument("--days", type=int, default=365, help="Spread created_at over this many days")
+    parser.add_argument("--batch-size", type=int, default=2000, help="Rows per INSERT statement (default: 2000)")
+    parser.add_argument("--workers", type=int, default=0, help="Generator processes (default: one per core)")
+    parser.add_argument("--password-pool", type=int, default=64, help="Distinct bcrypt hashes to reuse")
+    parser.add_argument("--password-prefix", default="loadtest-")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    seeder = BulkSeeder(engine, batch_size=args.batch_size, workers=args.workers)
+    try:
+        seeder.run(
+            users=args.users,
+            products=args.products,
+            orders=args.orders,
+            max_items=args.max_items,
+            skew=args.skew,
+            days=args.days,
+            seed=args.seed,
+            password_pool=args.password_pool,
+            password_prefix=args.password_prefix,
+        )
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+    finally:
+        password_hasher.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from passlib.context import CryptContext
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_contexts: Dict[int, CryptContext] = {}
+
+
+def _get_context(rounds: int) -> CryptContext:
+    """Get the bcrypt context for a cost factor (cached per process)"""
+    context = _contexts.get(rounds)
+    if context is None:
+        context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+        _contexts[rounds] = context
+    return context
+
+
+def _hash_password(password: str, rounds: int) -> str:
+    """Hash a password (runs inside the hashing pool)"""
+    return _get_context(rounds).hash(password)
+
+
+def _verify_password(password: str, hashed_password: str, rounds: int) -> bool:
+    """Verify a password (runs inside the hashing pool)"""
+    return _get_context(rounds).verify(password, hashed_password)
+
+
+def available_cores() -> int:
+    """Number of CPUs this process may run on"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+class HashingQueueFullError(Exception):
+    """Raised when the hashing pool already has its maximum of queued jobs"""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a dedicated, bounded executor
+
+    bcrypt costs hundreds of milliseconds of CPU per call. Running it on the
+    request threadpool starves every other endpoint while signups spike, so
+    hashing goes to a process pool sized to the available cores. A semaphore
+    caps the number of queued jobs; callers that cannot get a slot within
+    ``queue_timeout`` seconds get HashingQueueFullError instead of piling up.
+
+    Where worker processes cannot be started (AWS Lambda has no /dev/shm for
+    multiprocessing primitives) it falls back to a thread pool; the bcrypt C
+    extension releases the GIL, so threads still hash in parallel.
+    """
+
+    def __init__(
+        self,
+        rounds: int = settings.BCRYPT_ROUNDS,
+        executor_type: str = settings.HASH_EXECUTOR,
+        max_workers: int = settings.HASH_POOL_WORKERS,
+        queue_limit: int = settings.HASH_QUEUE_LIMIT,
+        queue_timeout: float = settings.HASH_QUEUE_TIMEOUT,
+    ):
+        self.rounds = rounds
+        self.executor_type = executor_type
+        self.max_workers = max_workers or available_cores()
+        self.queue_limit = queue_limit or self.max_workers * 4
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(self.queue_limit)
+        self._executor: Optional[Executor] = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self) -> Executor:
+        """Create the executor on first use"""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = self._create_executor()
+        return self._executor
+
+    def _create_executor(self) -> Executor:
+        if self.executor_type == "process":
+            try:
+                executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                logger.info(f"Password hashing uses a process pool with {self.max_workers} workers")
+                return executor
+            except (OSError, NotImplementedError) as e:
+                logger.warning(f"Process pool unavailable ({e}), hashing on a thread pool instead")
+        logger.info(f"Password hashing uses a thread pool with {self.max_workers} workers")
+        return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+
+    def _start(self, fn, *args) -> Future:
+        """Submit a job once a queue slot is held; the slot frees when it finishes"""
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _submit(self, fn, *args, timeout: Optional[float] = -1) -> Future:
+        """Submit a job if a queue slot frees up in time"""
+        timeout = self.queue_timeout if timeout == -1 else timeout
+        if not self._slots.acquire(timeout=timeout):
+            raise HashingQueueFullError("Password hashing queue is full")
+        return self._start(fn, *args)
+
+    async def _submit_async(self, fn, *args) -> Future:
+        """Like _submit, but waits for a slot off the event loop"""
+        if not self._slots.acquire(blocking=False):
+            waiter = asyncio.ensure_future(
+                asyncio.to_thread(self._slots.acquire, True, self.queue_timeout)
+            )
+            try:
+                # The acquiring thread cannot be interrupted, so shield it and
+                # hand back any slot it takes after the caller has gone away
+                acquired = await asyncio.shield(waiter)
+            except asyncio.CancelledError:
+                waiter.add_done_callback(self._release_abandoned_slot)
+                raise
+            if not acquired:
+                raise HashingQueueFullError("Password hashing queue is full")
+        return self._start(fn, *args)
+
+    def _release_abandoned_slot(self, waiter: asyncio.Future):
+        """Release a slot acquired on behalf of a cancelled caller"""
+        if not waiter.cancelled() and waiter.exception() is None and waiter.result():
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        """Hash a password, blocking the caller until the pool returns"""
+        return self._submit(_hash_password, password, self.rounds).result()
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        """Verify a password, blocking the caller until the pool returns"""
+        return self._submit(_verify_password, password, hashed_password, self.rounds).result()
+
+    async def hash_async(self, password: str) -> str:
+        """Hash a password without holding a worker thread while waiting"""
+        future = await self._submit_async(_hash_password, password, self.rounds)
+        return await asyncio.wrap_future(future)
+
+    async def verify_async(self, password: str, hashed_password: str) -> bool:
+        """Verify a password without holding a worker thread while waiting"""
+        future = await self._submit_async(_verify_password, password, hashed_password, self.rounds)
+        return await asyncio.wrap_future(future)
+
+    def hash_many(self, passwords: List[str]) -> List[str]:
+        """Hash several passwords in parallel across the pool (for batch jobs)"""
+        futures = [
+            self._submit(_hash_password, password, self.rounds, timeout=None)
+            for password in passwords
+        ]
+        return [future.result() for future in futures]
+
+    def shutdown(self):
+        """Stop the worker pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+# Global hasher shared by the application
+password_hasher = PasswordHasher()
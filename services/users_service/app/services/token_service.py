@@ -0,0 +1,90 @@
+import json
+import logging
+import time
+from typing import Any, Dict, Optional
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jwt.algorithms import RSAAlgorithm
+
+from app.config import settings
+from app.models.user import User
+from app.schemas.user import TokenResponse
+
+logger = logging.getLogger(__name__)
+
+ALGORITHM = "RS256"
+
+
+class TokenService:
+    """Issues RS256 access tokens that other services verify with the public key
+
+    Downstream services only need the JWKS (served at /users/jwks or shipped
+    as configuration) to check a token locally, without calling this service
+    or the database.
+    """
+
+    def __init__(
+        self,
+        private_key_pem: Optional[str] = None,
+        key_id: str = settings.AUTH_KEY_ID,
+        issuer: str = settings.AUTH_ISSUER,
+        audience: str = settings.AUTH_AUDIENCE,
+        ttl_seconds: int = settings.AUTH_TOKEN_TTL_SECONDS,
+    ):
+        self.key_id = key_id
+        self.issuer = issuer
+        self.audience = audience
+        self.ttl_seconds = ttl_seconds
+        self._private_key = self._load_private_key(private_key_pem)
+
+    def _load_private_key(self, private_key_pem: Optional[str]):
+        if private_key_pem:
+            return serialization.load_pem_private_key(private_key_pem.encode(), password=None)
+        if settings.ENVIRONMENT != "dev":
+            raise ValueError("AUTH_PRIVATE_KEY must be configured outside the dev environment")
+        # Dev convenience: tokens are only valid for the lifetime of the process
+        logger.warning("No AUTH_PRIVATE_KEY configured, generating an ephemeral signing key")
+        return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+    def issue_token(self, user: User) -> TokenResponse:
+        """Issue an access token for an authenticated user, carrying the user's role"""
+        now = int(time.time())
+        claims = {
+            "sub": str(user.user_id),
+            "email": user.email,
+            "role": user.role,
+            "iss": self.issuer,
+            "aud": self.audience,
+            "iat": now,
+            "exp": now + self.ttl_seconds,
+        }
+        token = jwt.encode(
+            claims,
+            self._private_key,
+            algorithm=ALGORITHM,
+            headers={"kid": self.key_id},
+        )
+        return TokenResponse(
+            access_token=token,
+            expires_in=self.ttl_seconds,
+            user_id=user.user_id,
+        )
+
+    def jwks(self) -> Dict[str, Any]:
+        """Public verification keys in JWKS format"""
+        jwk = json.loads(RSAAlgorithm.to_jwk(self._private_key.public_key()))
+        jwk.update({"kid": self.key_id, "alg": ALGORITHM, "use": "sig"})
+        return {"keys": [jwk]}
+
+
+_token_service: Optional[TokenService] = None
+
+
+def get_token_service() -> TokenService:
+    """Get the process-wide token service, loading the signing key once"""
+    global _token_service
+    if _token_service is None:
+        _token_service = TokenService(private_key_pem=settings.auth_private_key)
+    return _token_service
@@ -1,7 +1,25 @@
-from typing import List, Optional
+import base64
+import json
+from typing import List, Optional, Set, Tuple
 
 from app.repositories.user_repository import UserRepository
-from app.schemas.user import UserCreate, UserUpdate, UserResponse
+from app.schemas.user import (
+    UserCreate, UserUpdate, UserResponse, UserBatchLookupResponse, UserSearchResponse
+)
+
+
+def encode_search_cursor(score: float, user_id: int) -> str:
+    """Opaque keyset cursor for the next search page"""
+    return base64.urlsafe_b64encode(json.dumps([score, user_id]).encode()).decode()
+
+
+def decode_search_cursor(cursor: str) -> Tuple[float, int]:
+    """Decode a search cursor, raising ValueError if it is malformed"""
+    try:
+        score, user_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(score), int(user_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
 
 
 class UserService:
@@ -10,12 +28,16 @@ class UserService:
     def __init__(self, repository: UserRepository):
         self.repository = repository
     
-    def get_user(self, user_id: int) -> Optional[UserResponse]:
-        """Get a user by ID"""
+    def get_user_version(self, user_id: int) -> Optional[int]:
+        """Get a user's version without loading the user"""
+        return self.repository.get_version(user_id)
+    
+    def get_user(self, user_id: int) -> Optional[Tuple[UserResponse, int]]:
+        """Get a user by ID, with its version"""
         user = self.repository.get_by_id(user_id)
         if not user:
             return None
-        return UserResponse.model_validate(user)
+        return UserResponse.model_validate(user), user.version
     
     def get_user_by_email(self, email: str) -> Optional[UserResponse]:
         """Get a user by email"""
@@ -24,30 +46,84 @@ class UserService:
             return None
         return UserResponse.model_validate(user)
     
+    def lookup_users(self, user_ids: List[int], emails: List[str]) -> UserBatchLookupResponse:
+        """Look up many users at once, reporting the ids and emails that matched nobody"""
+        users = self.repository.get_by_ids_or_emails(user_ids, emails)
+        
+        by_id = {user.user_id: user for user in users}
+        # Email matching in MySQL is case-insensitive, so compare lowercased
+        by_email = {user.email.lower(): user for user in users}
+        
+        # Keep the requested order: ids first, then emails, without duplicates
+        ordered = []
+        seen = set()
+        for user in [by_id.get(user_id) for user_id in user_ids] + \
+                [by_email.get(email.lower()) for email in emails]:
+            if user is not None and user.user_id not in seen:
+                seen.add(user.user_id)
+                ordered.append(user)
+        
+        return UserBatchLookupResponse(
+            users=[UserResponse.model_validate(user) for user in ordered],
+            missing_user_ids=[user_id for user_id in user_ids if user_id not in by_id],
+            missing_emails=[email for email in emails if email.lower() not in by_email],
+        )
+    
+    def search_users(self, query: str, limit: int = 20, cursor: Optional[str] = None) -> UserSearchResponse:
+        """Search users by email prefix and name/address, one keyset page at a time"""
+        after = decode_search_cursor(cursor) if cursor else None
+        # Fetch one extra row to know whether another page exists
+        results = self.repository.search_users(query, limit + 1, after)
+        
+        next_cursor = None
+        if len(results) > limit:
+            results = results[:limit]
+            last_user, last_score = results[-1]
+            next_cursor = encode_search_cursor(last_score, last_user.user_id)
+        
+        return UserSearchResponse(
+            users=[UserResponse.model_validate(user) for user, _ in results],
+            next_cursor=next_cursor,
+        )
+    
     def list_users(self, skip: int = 0, limit: int = 100) -> List[UserResponse]:
         """Get a list of users with pagination"""
-        users = self.repository.list_users(skip, limit)
-        return [UserResponse.model_validate(user) for user in users]
+        rows = self.repository.list_users(skip, limit)
+        # Rows come straight from the database, so validation can be skipped
+        return [UserResponse.model_construct(**row._mapping) for row in rows]
     
-    def create_user(self, user_data: UserCreate) -> UserResponse:
+    def create_user(self, user_data: UserCreate, hashed_password: Optional[str] = None) -> UserResponse:
         """Create a new user"""
-        user = self.repository.create(user_data)
+        user = self.repository.create(user_data, hashed_password)
         return UserResponse.model_validate(user)
     
-    def update_user(self, user_id: int, user_data: UserUpdate) -> Optional[UserResponse]:
-        """Update a user's information"""
+    def update_user(
+        self,
+        user_id: int,
+        user_data: UserUpdate,
+        hashed_password: Optional[str] = None,
+        expected_versions: Optional[Set[int]] = None,
+    ) -> Optional[Tuple[UserResponse, int]]:
+        """Update a user's information, returning it with its new version
+        
+        With expected_versions (from If-Match) it raises
+        PreconditionFailedError unless the user is at one of them.
+        """
         update_data = {k: v for k, v in user_data.model_dump().items() if v is not None}
+        if hashed_password:
+            update_data.pop('password', None)
+            update_data['hashed_password'] = hashed_password
         
         if not update_data:
-            user = self.repository.get_by_id(user_id)
-            return UserResponse.model_validate(user) if user else None
+            user = self.repository.get_current(user_id, expected_versions)
+            return (UserResponse.model_validate(user), user.version) if user else None
         
-        updated_user = self.repository.update(user_id, **update_data)
+        updated_user = self.repository.update(user_id, expected_versions, **update_data)
         if not updated_user:
             return None
-        return UserResponse.model_validate(updated_user)
+        return UserResponse.model_validate(updated_user), updated_user.version
     
-    def delete_user(self, user_id: int) -> bool:
-        """Delete a user"""
-        return self.repository.delete(user_id)
+    def delete_user(self, user_id: int, expected_versions: Optional[Set[int]] = None) -> bool:
+        """Delete a user, if it is at one of expected_versions when given"""
+        return self.repository.delete(user_id, expected_versions)
     
@@ -0,0 +1,51 @@
+"""Set the token role of a user account
+
+Fulfilment workers and other services authenticate as ordinary users whose
+role is ``service``; their tokens may then act on any user's orders and
+carts. Roles are never set through the API, only with this script:
+
+    python -m app.set_role worker@example.com service
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import update  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+from app.models.base import SessionLocal  # noqa: E402
+from app.models.user import USER_ROLES, User  # noqa: E402
+
+
+def set_role(db: Session, email: str, role: str) -> bool:
+    """Set the role of the user with email, returning whether one exists"""
+    if role not in USER_ROLES:
+        raise ValueError(f"Unknown role {role!r}, expected one of {', '.join(USER_ROLES)}")
+    result = db.execute(
+        update(User)
+        .where(User.email == email)
+        .values(role=role, version=User.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Set the token role of a user account")
+    parser.add_argument("email")
+    parser.add_argument("role", choices=USER_ROLES)
+    args = parser.parse_args(argv)
+
+    with SessionLocal() as db:
+        if not set_role(db, args.email, args.role):
+            print(f"No user with email {args.email}", file=sys.stderr)
+            return 1
+    print(f"{args.email} now has role {args.role}; tokens issued from now on carry it")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+"""Benchmark for GET /users with 100-row pages
+
+Seeds a throwaway SQLite database, then compares the stages of building a
+page the old way (full ORM rows, ``model_validate``, FastAPI's response_model
+validation and JSON encoder) with the current path (projected columns,
+``model_construct``, orjson), and times the endpoint end to end.
+
+    python benchmarks/bench_list_users.py --rows 20000 --iterations 200
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/bench.db"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from fastapi.testclient import TestClient  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.models.base import Base, SessionLocal, engine  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.repositories.user_repository import UserRepository  # noqa: E402
+from app.responses import FastJSONResponse  # noqa: E402
+from app.schemas.user import UserResponse  # noqa: E402
+
+PAGE_SIZE = 100
+
+
+def seed(rows: int):
+    Base.metadata.create_all(engine)
+    now = datetime.utcnow()
+    # A realistic bcrypt hash length, so full-row loads carry the real payload
+    hashed_password = "$2b$12$" + "x" * 53
+    batch = []
+    with engine.begin() as conn:
+        for user_id in range(1, rows + 1):
+            batch.append({
+                "user_id": user_id,
+                "name": f"User {user_id}",
+                "email": f"user{user_id}@example.com",
+                "hashed_password": hashed_password,
+                "phone_number": f"+1-555-{user_id:07d}",
+                "image_url": f"https://example.com/avatars/{user_id}.png",
+                "address": f"{user_id} Main Street\nSpringfield, IL 62701",
+                "created_at": now - timedelta(minutes=user_id),
+            })
+            if len(batch) == 1000:
+                conn.execute(insert(User).values(batch))
+                batch = []
+        if batch:
+            conn.execute(insert(User).values(batch))
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def time_it(fn: Callable, iterations: int) -> Dict[str, float]:
+    fn()  # warm-up
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "mean_ms": statistics.fmean(samples),
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+    }
+
+
+def bench_stages(rows: int, iterations: int) -> Dict[str, Dict[str, float]]:
+    adapter = TypeAdapter(List[UserResponse])
+    pages = max(1, rows // PAGE_SIZE)
+    counter = iter(range(10 ** 9))
+
+    def next_skip() -> int:
+        return (next(counter) % pages) * PAGE_SIZE
+
+    def old_query():
+        with SessionLocal() as db:
+            return db.query(User).offset(next_skip()).limit(PAGE_SIZE).all()
+
+    def new_query():
+        with SessionLocal() as db:
+            return UserRepository(db).list_users(next_skip(), PAGE_SIZE)
+
+    with SessionLocal() as db:
+        orm_users = db.query(User).limit(PAGE_SIZE).all()
+        projected = UserRepository(db).list_users(0, PAGE_SIZE)
+    validated = [UserResponse.model_validate(user) for user in orm_users]
+    constructed = [UserResponse.model_construct(**row._mapping) for row in projected]
+
+    def old_serialize():
+        # What FastAPI does for response_model=List[UserResponse]
+        content = adapter.validate_python([user.model_dump() for user in validated])
+        return json.dumps(adapter.dump_python(content, mode="json")).encode()
+
+    assert json.loads(old_serialize()) == json.loads(FastJSONResponse(constructed).body)
+
+    return {
+        "query (ORM rows)": time_it(old_query, iterations),
+        "query (projected)": time_it(new_query, iterations),
+        "build (model_validate)": time_it(
+            lambda: [UserResponse.model_validate(user) for user in orm_users], iterations
+        ),
+        "build (model_construct)": time_it(
+            lambda: [UserResponse.model_construct(**row._mapping) for row in projected], iterations
+        ),
+        "serialize (response_model)": time_it(old_serialize, iterations),
+        "serialize (orjson)": time_it(lambda: FastJSONResponse(constructed).body, iterations),
+    }
+
+
+def bench_endpoint(rows: int, iterations: int) -> Dict[str, float]:
+    client = TestClient(app)
+    pages = max(1, rows // PAGE_SIZE)
+    state = {"page": 0}
+
+    def request():
+        state["page"] = (state["page"] + 1) % pages
+        response = client.get("/users", params={"skip": state["page"] * PAGE_SIZE, "limit": PAGE_SIZE})
+        assert response.status_code == 200 and len(response.json()) == PAGE_SIZE
+
+    result = time_it(request, iterations)
+    result["requests_per_sec"] = 1000 / result["mean_ms"]
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark GET /users with 100-row pages")
+    parser.add_argument("--rows", type=int, default=10_000, help="Users to seed (default: 10000)")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    seed(args.rows)
+    result = {
+        "rows": args.rows,
+        "stages": bench_stages(args.rows, args.iterations),
+        "endpoint": bench_endpoint(args.rows, args.iterations),
+    }
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return 0
+    print(f"{'Stage':<30}{'mean':>10}{'p50':>10}{'p95':>10}  (ms per {PAGE_SIZE}-row page)")
+    for stage, timing in result["stages"].items():
+        print(f"{stage:<30}{timing['mean_ms']:>10.3f}{timing['p50_ms']:>10.3f}{timing['p95_ms']:>10.3f}")
+    endpoint = result["endpoint"]
+    print(
+        f"{'GET /users (end to end)':<30}{endpoint['mean_ms']:>10.3f}{endpoint['p50_ms']:>10.3f}"
+        f"{endpoint['p95_ms']:>10.3f}  {endpoint['requests_per_sec']:.0f} req/s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""Microbenchmark for the pre-built hot-path statements
+
+Times ``UserRepository.get_by_id`` / ``get_by_email`` against the previous
+``db.query(User).filter(...).first()`` form on an in-memory SQLite database,
+and prints the compiled cache hit statistics the repository calls produced.
+
+    python benchmarks/bench_statement_cache.py --iterations 20000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ["DATABASE_URL"] = "sqlite://"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from sqlalchemy import insert  # noqa: E402
+
+from app.models.base import Base, SessionLocal, engine  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.query_cache import statement_cache_stats  # noqa: E402
+from app.repositories.user_repository import UserRepository  # noqa: E402
+
+USERS = 1000
+
+
+def seed():
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User).values([
+            {
+                "user_id": user_id,
+                "name": f"User {user_id}",
+                "email": f"user{user_id}@example.com",
+                "hashed_password": "x",
+                "phone_number": "555",
+            }
+            for user_id in range(1, USERS + 1)
+        ]))
+
+
+def per_call_us(fn: Callable[[int], object], iterations: int, repeats: int) -> Dict[str, float]:
+    runs: List[float] = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for i in range(iterations):
+            fn(i % USERS + 1)
+        runs.append((time.perf_counter() - start) / iterations * 1_000_000)
+    return {"best_us": min(runs), "median_us": statistics.median(runs)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark pre-built statements against ad-hoc queries")
+    parser.add_argument("--iterations", type=int, default=10_000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    seed()
+    # One long-lived connection so pool checkout does not dominate the timings
+    db = SessionLocal()
+    repository = UserRepository(db)
+
+    def query_by_id(user_id):
+        db.expunge_all()
+        return db.query(User).filter(User.user_id == user_id).first()
+
+    def query_by_email(user_id):
+        db.expunge_all()
+        return db.query(User).filter(User.email == f"user{user_id}@example.com").first()
+
+    def cached_by_id(user_id):
+        db.expunge_all()
+        return repository.get_by_id(user_id)
+
+    def cached_by_email(user_id):
+        db.expunge_all()
+        return repository.get_by_email(f"user{user_id}@example.com")
+
+    statement_cache_stats.reset()
+    results = {
+        "get_by_id   db.query().filter()": per_call_us(query_by_id, args.iterations, args.repeats),
+        "get_by_id   pre-built select()": per_call_us(cached_by_id, args.iterations, args.repeats),
+        "get_by_email db.query().filter()": per_call_us(query_by_email, args.iterations, args.repeats),
+        "get_by_email pre-built select()": per_call_us(cached_by_email, args.iterations, args.repeats),
+    }
+    db.close()
+
+    print(f"{'Query':<36}{'best':>10}{'median':>10}  (us per call)")
+    for name, timing in results.items():
+        print(f"{name:<36}{timing['best_us']:>10.1f}{timing['median_us']:>10.1f}")
+    print("\nCompiled cache:")
+    for name, counts in statement_cache_stats.snapshot().items():
+        print(f"  {name:<24} hits={counts['hits']} misses={counts['misses']} ratio={counts['hit_ratio']:.4f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,9 @@
 from mangum import Mangum
+from app.config import settings
 from app.main import app
+from app.middleware.timing import time_lambda_handler
 
 # AWS Lambda handler
 handler = Mangum(app)
+if settings.SERVER_TIMING_ENABLED:
+    handler = time_lambda_handler(handler)
@@ -0,0 +1,50 @@
+"""Shared fixtures: a throwaway SQLite database and cheap password hashing
+
+Configuration is read when ``app`` is first imported, so the environment is
+set here before any test module imports it.
+"""
+import os
+import tempfile
+
+import pytest
+
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/users-test.db"
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["HASH_EXECUTOR"] = "thread"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.models.base import Base, SessionLocal, engine  # noqa: E402
+from app.models import user  # noqa: E402,F401
+
+
+@pytest.fixture(autouse=True)
+def database():
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    yield
+
+
+@pytest.fixture
+def db():
+    with SessionLocal() as session:
+        yield session
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def create_user(client):
+    def create(email: str, password: str = "correct-horse", name: str = "Test User") -> dict:
+        response = client.post(
+            "/users",
+            json={"name": name, "email": email, "password": password, "phone_number": "555-0100"},
+        )
+        assert response.status_code == 201, response.text
+        return response.json()
+    return create
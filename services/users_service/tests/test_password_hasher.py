@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from app.services.password_hasher import HashingQueueFullError, PasswordHasher
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(rounds=4, executor_type="thread", max_workers=1, queue_limit=1, queue_timeout=0.5)
+    yield hasher
+    hasher.shutdown()
+
+
+def free_slots(hasher: PasswordHasher) -> int:
+    """Count the free queue slots, leaving them free afterwards"""
+    taken = 0
+    while hasher._slots.acquire(blocking=False):
+        taken += 1
+    for _ in range(taken):
+        hasher._slots.release()
+    return taken
+
+
+def test_slots_are_released_when_jobs_finish(hasher):
+    hashed = asyncio.run(hasher.hash_async("correct-horse"))
+    assert asyncio.run(hasher.verify_async("correct-horse", hashed))
+    assert hasher.verify("correct-horse", hasher.hash("correct-horse"))
+    assert free_slots(hasher) == 1
+
+
+def test_full_queue_raises_after_the_timeout(hasher):
+    hasher._slots.acquire()
+    with pytest.raises(HashingQueueFullError):
+        asyncio.run(hasher.hash_async("correct-horse"))
+    hasher._slots.release()
+    assert free_slots(hasher) == 1
+
+
+def test_cancelled_waiter_does_not_leak_its_slot(hasher):
+    async def scenario():
+        hasher._slots.acquire()
+        waiting = asyncio.create_task(hasher.hash_async("correct-horse"))
+        await asyncio.sleep(0.05)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        # The waiting thread takes the slot only once it is released here
+        hasher._slots.release()
+        await asyncio.sleep(0.1)
+        return await hasher.hash_async("correct-horse")
+
+    assert asyncio.run(scenario())
+    assert free_slots(hasher) == 1
+
+
+def test_saturated_pool_returns_503_with_retry_after(client, hasher, monkeypatch):
+    monkeypatch.setattr("app.routers.users.password_hasher", hasher)
+    hasher._slots.acquire()
+    try:
+        response = client.post(
+            "/users",
+            json={"name": "Busy", "email": "busy@example.com", "password": "correct-horse", "phone_number": "555-0100"},
+        )
+    finally:
+        hasher._slots.release()
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,39 @@
+import jwt
+import pytest
+
+from app.set_role import set_role
+
+
+def token_claims(client, email: str, password: str = "correct-horse") -> dict:
+    response = client.post("/users/authenticate", json={"email": email, "password": password})
+    assert response.status_code == 200, response.text
+    return jwt.decode(response.json()["access_token"], options={"verify_signature": False})
+
+
+def test_new_users_get_customer_tokens(client, create_user):
+    created = create_user("customer@example.com")
+    claims = token_claims(client, "customer@example.com")
+    assert claims["role"] == "customer"
+    assert claims["sub"] == str(created["user_id"])
+
+
+def test_service_account_tokens_carry_service_role(client, db, create_user):
+    create_user("worker@example.com")
+    assert set_role(db, "worker@example.com", "service")
+    assert token_claims(client, "worker@example.com")["role"] == "service"
+
+
+def test_set_role_rejects_unknown_roles(db, create_user):
+    create_user("someone@example.com")
+    with pytest.raises(ValueError):
+        set_role(db, "someone@example.com", "superuser")
+
+
+def test_set_role_reports_missing_user(db):
+    assert not set_role(db, "nobody@example.com", "admin")
+
+
+def test_role_is_not_settable_through_the_api(client, create_user):
+    created = create_user("sneaky@example.com")
+    client.put(f"/users/{created['user_id']}", json={"role": "admin"})
+    assert token_claims(client, "sneaky@example.com")["role"] == "customer"
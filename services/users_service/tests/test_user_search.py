@@ -0,0 +1,70 @@
+from sqlalchemy.dialects import mysql
+
+from app.repositories import user_repository
+from app.repositories.user_repository import search_statement
+
+
+def mysql_string_literals_terminate(sql: str) -> bool:
+    """Whether every '...' literal closes under MySQL's default backslash escaping"""
+    in_string = escaped = False
+    for char in sql:
+        if escaped:
+            escaped = False
+        elif in_string and char == "\\":
+            escaped = True
+        elif char == "'":
+            in_string = not in_string
+    return not in_string
+
+
+def test_search_statement_compiles_for_mysql():
+    statement, params = search_statement("jo_hn%", 20, (100.0, 7), "mysql")
+    sql = str(statement.compile(dialect=mysql.dialect()))
+
+    assert "ESCAPE '!'" in sql
+    assert "MATCH(name, address) AGAINST" in sql
+    assert mysql_string_literals_terminate(sql)
+    assert params["email_prefix"] == "jo!_hn!%%"
+
+
+def test_email_prefix_wildcards_match_literally(client, create_user):
+    create_user("a_b@example.com")
+    create_user("axb@example.com")
+    create_user("c!d@example.com")
+
+    response = client.get("/users/search", params={"q": "a_b"})
+    assert [user["email"] for user in response.json()["users"]] == ["a_b@example.com"]
+
+    response = client.get("/users/search", params={"q": "c!d"})
+    assert [user["email"] for user in response.json()["users"]] == ["c!d@example.com"]
+
+
+def test_pages_continue_past_the_candidate_cap(client, create_user, monkeypatch):
+    monkeypatch.setattr(user_repository, "SEARCH_MAX_CANDIDATES", 3)
+    expected = set()
+    for i in range(7):
+        expected.add(create_user(f"jo{i}@example.com")["user_id"])  # email only
+    for i in range(5):
+        expected.add(create_user(f"x{i}@example.com", name=f"Jo Smith {i}")["user_id"])  # name only
+    for i in range(4):
+        expected.add(create_user(f"jo.b{i}@example.com", name=f"Jo Brown {i}")["user_id"])  # both
+    create_user("someone@example.com")
+
+    seen, cursor = [], None
+    while True:
+        params = {"q": "jo", "limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/users/search", params=params).json()
+        seen += [user["user_id"] for user in page["users"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(seen) == len(set(seen))
+    assert set(seen) == expected
+    # Email and name matches first, then email-only, then name-only matches
+    emails = {user_id: email for user_id, email in (
+        (u["user_id"], u["email"]) for u in client.get("/users", params={"limit": 100}).json()
+    )}
+    kinds = ["both" if emails[u].startswith("jo.b") else "email" if emails[u].startswith("jo") else "name"
+             for u in seen]
+    assert kinds == ["both"] * 4 + ["email"] * 7 + ["name"] * 5